@@ -10,14 +10,20 @@ import lxml     # As used in alpino2folia.xml
 import urllib
 import urllib.request
 import json
+import http.client
+import threading
+import gzip
+import zlib
 try:
     from urlparse import urlparse
 except ImportError:
     from urllib.parse import urlparse
 
 # ----------------------------------------------------------------------------------
+# Default endpoints; they can be changed with the environment variables of the same name
 NEDERLAB_BROKER = "http://www.nederlab.nl/broker2/search/"
 NEDERLAB_OPENSKOS = "https://openskos.meertens.knaw.nl/nederlab/archief/get/"
+DOWNLOAD_CHUNK = 65536
 
 # ----------------------------------------------------------------------------------
 # Name :    foliareq
@@ -29,23 +35,39 @@ class broker:
     """Methods to communicate with the broker"""
 
     # ======================= CLASS INITIALIZER ========================================
-    def __init__(self, oErr):
+    def __init__(self, oErr, sBroker = None, sOpenskos = None):
         # Set the error handler
         self.errHandle = oErr
+        # Endpoints: arguments first, then the environment, then the defaults
+        self.sBroker = sBroker or os.environ.get('NEDERLAB_BROKER') or NEDERLAB_BROKER
+        self.sOpenskos = sOpenskos or os.environ.get('NEDERLAB_OPENSKOS') or NEDERLAB_OPENSKOS
         self.oInt = util.interaction()
         self.iSu = 0
         self.quick = False
         self.reHref = re.compile(r"href=['\"]?([^'\"]+)")
+        # Connections per thread, and limits on the concurrent requests per host
+        self.oLocal = threading.local()
+        self.oLock = threading.Lock()
+        self.oHostLimit = {}
+        self.iPerHost = 4
+        # Number of times a failed broker request is tried again
+        self.iRequestRetries = 2
+        # Optional cache of broker responses (see cache.py)
+        self.oCache = None
+        # Duration in seconds of every successful request, per phase
+        self.oTimes = {'select': [], 'download': []}
 
     # ----------------------------------------------------------------------------------
     # Name :    task2request
     # Goal :    Convert one task object into a broker request
     #           Task object: 
     #             {"genre": "verhalen", "start": 1990, "end": 1995, "number": 50}
+    #           Optionally only ask for the page of [iNumber] documents from [iFirst] on
     # History:
     # 20/dec/2016    ERK Created
+    # 19/oct/2026    ERK Pages
     # ----------------------------------------------------------------------------------
-    def task2request(self, oTask):
+    def task2request(self, oTask, iFirst = 0, iNumber = None):
         """Convert a broker task to a request"""
 
         # Validate data we receive
@@ -53,6 +75,9 @@ class broker:
             # Return the None object
             return None
 
+        # Figure out the page
+        if iNumber == None: iNumber = oTask["number"]
+
         # Figure out start and end
         iStart = oTask["start"]
         if "end" in oTask:
@@ -73,7 +98,7 @@ class broker:
                   },
                   "response": {
                     "documents": {
-                        "number": oTask["number"], "start": 0,
+                        "number": iNumber, "start": iFirst,
                         "fields": [
                             "NLCore_NLIdentification_nederlabID",
                             "NLCore_NLAdministrative_sourceCollection",
@@ -96,71 +121,253 @@ class broker:
     # ----------------------------------------------------------------------------------
     # Name :    request
     # Goal :    Make a request for information to the broker and return the result
+    #           With a cache, a request that has been answered before is not sent again
     # History:
     # 20/dec/2016    ERK Created
+    # 19/oct/2026    ERK Response cache
+    # 19/oct/2026    ERK Try again on server and network errors
     # ----------------------------------------------------------------------------------
     def request(self, oData):
         """ Issue a request to the broker"""
 
+        if self.oCache != None:
+            oResult = self.oCache.get(oData)
+            if oResult != None: return oResult
+
         # data = urllib.parse.urlencode(oData).encode('ascii')
         # data = str(oData).replace("'", '"').encode('ascii')
         data = json.dumps(oData).encode('ascii')
-        strUri = NEDERLAB_BROKER      
+        strUri = self.sBroker
         oPost = {'Accept':'application/json', 
                'Content-Type': 'application/x-www-form-urlencoded'}
         # Prepare a POST request
         req = urllib.request.Request(strUri, headers=oPost, data=data, method='POST')
 
-        try:
-            # Perform the actual request
-            with urllib.request.urlopen(req, timeout = 20) as response:
-                # Get the response as a text
-                sResult = response.read().decode('utf-8')
-                # First check the result myself
-                if sResult == "" or sResult[:1] != "{":
-                    # The result is empty, or at least not JSON
-                    oResult = {}
-                else:
-                    # Convert the response text to an object, interpreting it as JSON
-                    oResult = json.loads(sResult)
-                
-        except urllib.error.URLError as e:
-            # Show the user what is wrong
-            self.errHandle.Status('URLopen URL error: {}\n{}\ndata: {}\n url: {}\n'.format(
-                e.reason, str(oData), str(data), strUri))
-            # Return failure
-            return None
+        for iTry in range(self.iRequestRetries + 1):
+            try:
+                fStart = time.perf_counter()
+                # Perform the actual request
+                with urllib.request.urlopen(req, timeout = 20) as response:
+                    # Get the response as a text
+                    sResult = response.read().decode('utf-8')
+                    # First check the result myself
+                    if sResult == "" or sResult[:1] != "{":
+                        # The result is empty, or at least not JSON
+                        oResult = {}
+                    else:
+                        # Convert the response text to an object, interpreting it as JSON
+                        oResult = json.loads(sResult)
+                break
+            except urllib.error.URLError as e:
+                # Server-side trouble and network trouble are worth another try
+                bRetry = not isinstance(e, urllib.error.HTTPError) or e.code >= 500 or e.code == 429
+                if bRetry and iTry < self.iRequestRetries:
+                    self.errHandle.Status('Broker error: {} (trying again)'.format(e.reason))
+                    time.sleep(2 ** iTry)
+                    continue
+                # Show the user what is wrong
+                self.errHandle.Status('URLopen URL error: {}\n{}\ndata: {}\n url: {}\n'.format(
+                    e.reason, str(oData), str(data), strUri))
+                # Return failure
+                return None
        
         # Getting here means that we have a valid [oResult] object
+        self.addTime('select', time.perf_counter() - fStart)
+        if self.oCache != None: self.oCache.put(oData, oResult)
         return oResult
 
+    # ----------------------------------------------------------------------------------
+    # Name :    getConnection
+    # Goal :    Get a (kept-alive) connection to [sHost] for the current thread
+    #           Connections are re-used by all requests of a thread to the same host
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def getConnection(self, sScheme, sHost, bNew = False):
+        if not hasattr(self.oLocal, 'conns'): self.oLocal.conns = {}
+        sKey = sScheme + "://" + sHost
+        if bNew and sKey in self.oLocal.conns:
+            self.oLocal.conns[sKey].close()
+            del self.oLocal.conns[sKey]
+        if not sKey in self.oLocal.conns:
+            if sScheme == "https":
+                self.oLocal.conns[sKey] = http.client.HTTPSConnection(sHost, timeout=20)
+            else:
+                self.oLocal.conns[sKey] = http.client.HTTPConnection(sHost, timeout=20)
+        return self.oLocal.conns[sKey]
+
+    # ----------------------------------------------------------------------------------
+    # Name :    hostLimit
+    # Goal :    Get the semaphore that limits the number of concurrent requests to [sHost]
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def hostLimit(self, sHost):
+        with self.oLock:
+            if not sHost in self.oHostLimit:
+                self.oHostLimit[sHost] = threading.BoundedSemaphore(self.iPerHost)
+            return self.oHostLimit[sHost]
+
+    # ----------------------------------------------------------------------------------
+    # Name :    addTime
+    # Goal :    Record the duration of a successful request in phase [sPhase]
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def addTime(self, sPhase, fSeconds):
+        with self.oLock:
+            self.oTimes[sPhase].append(fSeconds)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    lastError
+    # Goal :    The reason why the last getFolia() of this thread failed, as a tuple 
+    #           (message, retry), where [retry] says whether trying again makes sense
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def lastError(self):
+        return getattr(self.oLocal, 'error', ("", False))
+
+    # ----------------------------------------------------------------------------------
+    # Name :    getFolia
+    # Goal :    Retrieve the folia file and save it
+    #           The file is streamed to [flOutput].part, which is renamed to [flOutput]
+    #           only after its size and gzip integrity have been checked. An interrupted
+    #           .part file is continued with an HTTP Range request if the server allows it.
+    #           May be called from several threads at the same time
+    # History:
+    # 20/dec/2016    ERK Created
+    # 19/oct/2026    ERK Re-use connections, limit the number of requests per host
+    # 19/oct/2026    ERK Stream to a temporary file, resume, verify and rename
+    # ----------------------------------------------------------------------------------
     def getFolia(self, sFoliaId, flOutput):
         """Retrieve the folia file and save it"""
 
-        strUri = NEDERLAB_OPENSKOS + sFoliaId
-        # Prepare a request
-        req = urllib.request.Request(strUri, method='GET')
+        strUri = self.sOpenskos + sFoliaId
+        fStart = time.perf_counter()
+        self.oLocal.error = ("", False)
 
         # Make sure the output is GZ
         if not flOutput.endswith(".gz"):
             flOutput += ".gz"
+        flPart = flOutput + ".part"
 
         try:
-            with urllib.request.urlopen(req, timeout=20) as response:
-                # Read the response
-                with open(flOutput,"wb") as fOut:
-                    fOut.write(response.read())
-
-            # Return positively
-            return True
-        except urllib.error.URLError as e:
+            # Follow a limited number of redirections
+            for iRedirect in range(5):
+                oUrl = urlparse(strUri)
+                sPath = oUrl.path
+                if oUrl.query != "": sPath += "?" + oUrl.query
+                # Continue an interrupted download
+                iHave = os.path.getsize(flPart) if os.path.exists(flPart) else 0
+                oHeaders = {}
+                if iHave > 0: oHeaders['Range'] = 'bytes={}-'.format(iHave)
+                with self.hostLimit(oUrl.netloc):
+                    # A kept-alive connection may have been closed by the server: try a new one once
+                    for bNew in (False, True):
+                        conn = self.getConnection(oUrl.scheme, oUrl.netloc, bNew)
+                        try:
+                            conn.request('GET', sPath, headers=oHeaders)
+                            response = conn.getresponse()
+                            break
+                        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                            if bNew: raise
+                    if response.status in (301, 302, 303, 307, 308):
+                        response.read()
+                        strUri = urllib.parse.urljoin(strUri, response.getheader('Location'))
+                        continue
+                    if response.status == 416:
+                        # The part we have does not fit (any more): start from scratch next time
+                        response.read()
+                        os.remove(flPart)
+                        self.oLocal.error = ('Range not satisfiable: restarting', True)
+                        return False
+                    if response.status not in (200, 206):
+                        response.read()
+                        # Server-side trouble and throttling are worth another try
+                        bRetry = (response.status >= 500 or response.status == 429)
+                        self.oLocal.error = ('HTTP error {} {}'.format(response.status, response.reason), bRetry)
+                        self.errHandle.Status('URLopen HTTP error: {}\nURI: {}\n'.format(
+                            response.status, strUri))
+                        return False
+                    # Find out how large the whole file should be
+                    iExpected = -1
+                    if response.status == 206:
+                        # Content-Range: bytes <from>-<to>/<total>
+                        sRange = response.getheader('Content-Range', '')
+                        if not sRange.startswith('bytes {}-'.format(iHave)):
+                            # Not the part we asked for: start from scratch
+                            response.read()
+                            os.remove(flPart)
+                            self.oLocal.error = ('Unexpected Content-Range: ' + sRange, True)
+                            return False
+                        sTotal = sRange.rsplit('/', 1)[-1]
+                        if sTotal.isdigit(): iExpected = int(sTotal)
+                        sMode = "ab"
+                    else:
+                        # The server sends the whole file
+                        sLength = response.getheader('Content-Length', '')
+                        if sLength.isdigit(): iExpected = int(sLength)
+                        sMode = "wb"
+                    # Stream the response to the .part file
+                    with open(flPart, sMode) as fOut:
+                        while True:
+                            bChunk = response.read(DOWNLOAD_CHUNK)
+                            if not bChunk: break
+                            fOut.write(bChunk)
+                # Verify before the file counts as complete
+                iSize = os.path.getsize(flPart)
+                if iExpected >= 0 and iSize != iExpected:
+                    self.oLocal.error = ('Incomplete: {} of {} bytes'.format(iSize, iExpected), True)
+                    return False
+                if not self.isValidGzip(flPart):
+                    os.remove(flPart)
+                    self.oLocal.error = ('Not a valid gzip file', True)
+                    return False
+                os.replace(flPart, flOutput)
+                self.addTime('download', time.perf_counter() - fStart)
+                # Return positively
+                return True
+            self.oLocal.error = ('Too many redirections', False)
+            return False
+        except (OSError, http.client.HTTPException) as e:
+            # Network trouble: drop the connection, so that a next try starts fresh
+            self.getConnection(oUrl.scheme, oUrl.netloc, True)
+            self.oLocal.error = ('Connection error: {}'.format(e), True)
             # Show the user what is wrong
             self.errHandle.Status('URLopen URL error: {}\nURI: {}\n'.format(
-                e.reason, strUri))
+                e, strUri))
             # Return failure
             return False
         except:
             # Show the user what is wrong
             self.errHandle.DoError("Could not retrieve a file")
+            self.oLocal.error = ('Could not retrieve a file: {}'.format(sys.exc_info()[1]), False)
             # Return failure
             return False
+
+    # ----------------------------------------------------------------------------------
+    # Name :    isValidGzip
+    # Goal :    Check that [flFile] is a complete gzip file, by decompressing it in chunks
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def isValidGzip(self, flFile):
+        try:
+            with gzip.open(flFile, "rb") as fIn:
+                while fIn.read(DOWNLOAD_CHUNK * 16):
+                    pass
+            return True
+        except (OSError, EOFError, zlib.error):
+            return False
+
+    # ----------------------------------------------------------------------------------
+    # Name :    isComplete
+    # Goal :    Check whether the folia file for [flOutput] has been downloaded completely
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def isComplete(self, flOutput):
+        if not flOutput.endswith(".gz"):
+            flOutput += ".gz"
+        return os.path.exists(flOutput) and self.isValidGzip(flOutput)
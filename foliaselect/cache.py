@@ -0,0 +1,101 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import json
+import hashlib
+import threading
+import time
+
+# ----------------------------------------------------------------------------------
+# Name :    cache
+# Goal :    On-disk cache of broker responses
+#           The key is the SHA-256 of the canonical JSON of the request (sorted keys,
+#           no whitespace), as made by broker.task2request(). A response is kept as:
+#             <dir>/<key[:2]>/<key>.json
+#           Only successful responses are cached. With a TTL (seconds), older entries
+#           are ignored; with [bBypass] the cache is not read, but it is refreshed.
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class cache:
+    """Cache of broker responses"""
+
+    # ======================= CLASS INITIALIZER ========================================
+    def __init__(self, oErr, sDir, iTtl = None, bBypass = False):
+        # Set the error handler
+        self.errHandle = oErr
+        self.sDir = os.path.abspath(sDir)
+        if not os.path.exists(self.sDir): os.makedirs(self.sDir)
+        self.iTtl = iTtl
+        self.bBypass = bBypass
+        self.oLock = threading.Lock()
+        # Statistics
+        self.iHits = 0
+        self.iMisses = 0
+        self.iStored = 0
+
+    # ----------------------------------------------------------------------------------
+    # Name :    key
+    # Goal :    The canonical hash of a broker request
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def key(self, oData):
+        sCanon = json.dumps(oData, sort_keys=True, separators=(',', ':'), ensure_ascii=True)
+        return hashlib.sha256(sCanon.encode('ascii')).hexdigest()
+
+    def path(self, sKey):
+        return os.path.join(self.sDir, sKey[:2], sKey + ".json")
+
+    # ----------------------------------------------------------------------------------
+    # Name :    get
+    # Goal :    The cached response to [oData], or None if there is no valid one
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def get(self, oData):
+        oResult = None
+        if not self.bBypass:
+            flCache = self.path(self.key(oData))
+            try:
+                if self.iTtl == None or time.time() - os.path.getmtime(flCache) <= self.iTtl:
+                    with open(flCache, "r", encoding="utf-8") as fIn:
+                        oResult = json.load(fIn)
+            except (OSError, ValueError):
+                # Not there, or damaged: ask the broker
+                oResult = None
+        with self.oLock:
+            if oResult == None:
+                self.iMisses += 1
+            else:
+                self.iHits += 1
+        return oResult
+
+    # ----------------------------------------------------------------------------------
+    # Name :    put
+    # Goal :    Store the broker response [oResult] to request [oData]
+    #           The file is written under a temporary name and then renamed, so that
+    #           an interrupted run never leaves a partial entry behind
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def put(self, oData, oResult):
+        if oResult == None or oResult.get('status') != 'ok': return
+        flCache = self.path(self.key(oData))
+        try:
+            os.makedirs(os.path.dirname(flCache), exist_ok=True)
+            flTmp = "{}.{}.{}.tmp".format(flCache, os.getpid(), threading.get_ident())
+            with open(flTmp, "w", encoding="utf-8") as fOut:
+                json.dump(oResult, fOut)
+            os.replace(flTmp, flCache)
+            with self.oLock: self.iStored += 1
+        except OSError:
+            # A cache that cannot be written is no reason to stop
+            self.errHandle.Status("Could not write cache entry: " + flCache)
+
+    def close(self):
+        self.errHandle.Status("Broker cache: hits={} misses={} stored={}".format(
+            self.iHits, self.iMisses, self.iStored))
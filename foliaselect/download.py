@@ -0,0 +1,150 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import time
+import random
+import threading
+import hashlib
+from concurrent import futures
+
+# ----------------------------------------------------------------------------------
+# Name :    downloader
+# Goal :    Download FoLiA documents through the broker with a bounded number of
+#           concurrent downloads, and retries with jittered exponential backoff
+#           A failed document is recorded, it does not stop the other downloads
+#           With a [store], every document is downloaded only once (see store.py)
+#           With a [manifest], the outcome of every download is recorded there
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class downloader:
+    """Concurrent download of FoLiA documents"""
+
+    # ======================= CLASS INITIALIZER ========================================
+    def __init__(self, oErr, oBroker, iWorkers = 8, iRetries = 3, fBackoff = 1.0, oStore = None, oManifest = None):
+        # Set the error handler
+        self.errHandle = oErr
+        self.oBroker = oBroker
+        self.oStore = oStore
+        self.oManifest = oManifest
+        self.iWorkers = max(1, iWorkers)
+        self.iRetries = iRetries
+        self.fBackoff = fBackoff
+        self.oPool = futures.ThreadPoolExecutor(max_workers=self.iWorkers)
+        self.lPending = []          # Futures that have not been collected yet
+        self.lFailed = []           # One object per document that could not be downloaded
+        self.iOkay = 0
+        self.oLock = threading.Lock()
+
+    # ----------------------------------------------------------------------------------
+    # Name :    fetch
+    # Goal :    Download one document, trying again on errors that may be temporary
+    #           Runs in a worker thread
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def fetch(self, sFoliaId, flOutput, oKey = None):
+        sError = ""
+        for iTry in range(self.iRetries + 1):
+            if iTry > 0:
+                # Exponential backoff with jitter, so that retries do not come in waves
+                time.sleep(self.fBackoff * (2 ** (iTry - 1)) * random.uniform(0.5, 1.5))
+            if self.oStore != None:
+                bOkay = self.oStore.fetch(self.oBroker, sFoliaId, flOutput)
+            else:
+                bOkay = self.oBroker.getFolia(sFoliaId, flOutput)
+            if bOkay:
+                oResult = {'id': sFoliaId, 'file': flOutput, 'status': 'ok', 'tries': iTry + 1, 'key': oKey}
+                if self.oManifest != None:
+                    (oResult['size'], oResult['checksum']) = self.fileInfo(sFoliaId, flOutput)
+                return oResult
+            (sError, bRetry) = self.oBroker.lastError()
+            if not bRetry: break
+        return {'id': sFoliaId, 'file': flOutput, 'status': 'failed', 'error': sError, 'tries': iTry + 1, 'key': oKey}
+
+    # ----------------------------------------------------------------------------------
+    # Name :    fileInfo
+    # Goal :    Size and SHA-256 checksum of a downloaded document
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def fileInfo(self, sFoliaId, flOutput):
+        if not flOutput.endswith(".gz"):
+            flOutput += ".gz"
+        iSize = os.path.getsize(flOutput)
+        if self.oStore != None:
+            # The store already knows the checksum
+            oFound = self.oStore.lookup(sFoliaId)
+            if oFound != None: return (iSize, oFound[0])
+        oHash = hashlib.sha256()
+        with open(flOutput, "rb") as fIn:
+            for bChunk in iter(lambda: fIn.read(1048576), b""):
+                oHash.update(bChunk)
+        return (iSize, oHash.hexdigest())
+
+    # ----------------------------------------------------------------------------------
+    # Name :    submit
+    # Goal :    Schedule the download of one document
+    #           When too many downloads are waiting, this waits for some of them to
+    #           finish first, so that the caller cannot run ahead too far
+    #           [oKey] identifies the document in the manifest
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def submit(self, sFoliaId, flOutput, oKey = None):
+        with self.oLock:
+            self.lPending.append(self.oPool.submit(self.fetch, sFoliaId, flOutput, oKey))
+            bFull = (len(self.lPending) >= 4 * self.iWorkers)
+        if bFull:
+            self.collect(2 * self.iWorkers)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    collect
+    # Goal :    Wait until at most [iLeft] downloads are pending, and process the results
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def collect(self, iLeft = 0):
+        while True:
+            with self.oLock:
+                lPending = list(self.lPending)
+            if len(lPending) <= iLeft: return
+            (lDone, lNotDone) = futures.wait(lPending, return_when=futures.FIRST_COMPLETED)
+            with self.oLock:
+                for oFuture in lDone:
+                    if not oFuture in self.lPending: continue
+                    self.lPending.remove(oFuture)
+                    self.result(oFuture)
+
+    def result(self, oFuture):
+        try:
+            oResult = oFuture.result()
+        except:
+            oResult = {'status': 'failed', 'error': str(sys.exc_info()[1]), 'key': None}
+        if oResult['status'] == 'ok':
+            self.iOkay += 1
+        else:
+            self.lFailed.append(oResult)
+            self.errHandle.Status("Download failed: {} ({})".format(oResult.get('file', ''), oResult['error']))
+        if self.oManifest != None and oResult['key'] != None:
+            if oResult['status'] == 'ok':
+                self.oManifest.update(oResult['key'], 'done', oResult['size'], oResult['checksum'])
+            else:
+                self.oManifest.update(oResult['key'], 'failed', sError=oResult['error'])
+
+    # ----------------------------------------------------------------------------------
+    # Name :    finish
+    # Goal :    Wait for all downloads and stop the worker threads
+    # Return:   The list of failures
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def finish(self):
+        self.collect(0)
+        self.oPool.shutdown(wait=True)
+        self.errHandle.Status("Downloads: ok={} failed={}".format(self.iOkay, len(self.lFailed)))
+        if self.oStore != None: self.oStore.close()
+        return self.lFailed
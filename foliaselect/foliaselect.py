@@ -7,7 +7,13 @@
 import sys, getopt, os.path, importlib
 import util
 import broker
+import download
+import store
+import manifest
+import cache
 import json
+import csv
+from concurrent import futures
 
 # ============================= LOCAL VARIABLES ====================================
 errHandle = util.ErrHandle()
@@ -23,17 +29,30 @@ def main(prgName, argv) :
     flOutput = ''       # output file name
     flStat = ''         # statistics file name
     sMethod = ''        # Method to be used
+    iWorkers = 8        # Number of concurrent downloads
+    iPerHost = 4        # Maximum number of concurrent requests per host
+    iRetries = 3        # Number of retries of a failed download
+    iPage = 100         # Number of documents per broker request
+    iQueries = 4        # Number of concurrent broker queries
+    sStore = ''         # Directory of the content-addressed document store (optional)
+    flManifest = ''     # Download manifest (default: <outputfile>.db)
+    sCache = ''         # Directory of the broker response cache (optional)
+    iTtl = None         # Maximum age in seconds of a cached response
+    bBypass = False     # Do not read the cache, only refresh it
+    sBroker = ''        # URL of the broker search (default: NEDERLAB_BROKER)
+    sOpenskos = ''      # URL of the FoLiA archive (default: NEDERLAB_OPENSKOS)
 
     try:
         # Adapt the program name to exclude the directory
         index = prgName.rfind("\\")
         if (index > 0) :
             prgName = prgName[index+1:]
-        sSyntax = prgName + ' [-s <statfile>] -i <inputfile> -o <outputfile>'
+        sSyntax = prgName + ' [-s <statfile>] [-m resume] [-n <downloads>] [-l <per host>] [-r <retries>] [-p <page size>] [-q <queries>] [-c <storedir>] [-d <manifest>] [-k <cachedir> [-t <ttl>] [-b]] [-u <broker url>] [-f <folia url>] -i <inputfile> -o <outputfile>\n' + \
+                  prgName + ' -m report|export [-d <manifest>] -o <outputfile>'
         # get all the arguments
         try:
             # Get arguments and options
-            opts, args = getopt.getopt(argv, "hs:i:o:m:", ["-statfile=","-inputfile=","-outputfile=", "-method="])
+            opts, args = getopt.getopt(argv, "hs:i:o:m:n:l:r:p:q:c:d:k:t:bu:f:", ["-statfile=","-inputfile=","-outputfile=", "-method=", "-downloads=", "-perhost=", "-retries=", "-page=", "-queries=", "-store=", "-manifest=", "-cache=", "-ttl=", "-bypass", "-broker=", "-folia="])
         except getopt.GetoptError:
               print(sSyntax)
               sys.exit(2)
@@ -50,6 +69,39 @@ def main(prgName, argv) :
                 flOutput = arg
             elif opt in ("-m", "--method"):
                 sMethod = arg
+            elif opt in ("-n", "--downloads"):
+                iWorkers = int(arg)
+            elif opt in ("-l", "--perhost"):
+                iPerHost = int(arg)
+            elif opt in ("-r", "--retries"):
+                iRetries = int(arg)
+            elif opt in ("-p", "--page"):
+                iPage = int(arg)
+            elif opt in ("-q", "--queries"):
+                iQueries = int(arg)
+            elif opt in ("-c", "--store"):
+                sStore = arg
+            elif opt in ("-d", "--manifest"):
+                flManifest = arg
+            elif opt in ("-k", "--cache"):
+                sCache = arg
+            elif opt in ("-t", "--ttl"):
+                iTtl = int(arg)
+            elif opt in ("-b", "--bypass"):
+                bBypass = True
+            elif opt in ("-u", "--broker"):
+                sBroker = arg
+            elif opt in ("-f", "--folia"):
+                sOpenskos = arg
+        # The manifest belongs to the output file, unless specified otherwise
+        if flManifest == '' and flOutput != '':
+            flManifest = os.path.splitext(flOutput)[0] + ".db"
+        # Reporting and exporting only need the manifest
+        if sMethod in ('report', 'export'):
+            if flManifest == '':
+                errHandle.DoError(sSyntax)
+                return False
+            return useManifest(sMethod, flManifest)
         # Check if all arguments are there
         if (flInput == '' or flOutput == '' or flStat == ''):
             errHandle.DoError(sSyntax)
@@ -58,9 +110,22 @@ def main(prgName, argv) :
         errHandle.Status('Output is "' + flOutput + '"')
         errHandle.Status('Statistics: "' + flStat + '"')
         # Call the function that converst input into output
-        kwargs = {"input": flInput, "output": flOutput, "stat": flStat}
+        kwargs = {"input": flInput, "output": flOutput, "stat": flStat,
+                  "workers": iWorkers, "perhost": iPerHost, "retries": iRetries, "page": iPage,
+                  "queries": iQueries}
         if sMethod != '':
             kwargs['method'] = sMethod
+        if sStore != '':
+            kwargs['store'] = sStore
+        kwargs['manifest'] = flManifest
+        if sBroker != '':
+            kwargs['broker'] = sBroker
+        if sOpenskos != '':
+            kwargs['openskos'] = sOpenskos
+        if sCache != '':
+            kwargs['cache'] = sCache
+            kwargs['ttl'] = iTtl
+            kwargs['bypass'] = bBypass
         if (foliaselect(**kwargs)) :
             errHandle.Status("Ready")
         else :
@@ -88,7 +153,20 @@ def foliaselect(**kwargs):
         if "method" in kwargs: sMethod = kwargs['method']
 
         # Start a broker communication instance
-        oBroker = broker.broker(errHandle)
+        oBroker = broker.broker(errHandle, kwargs.get('broker'), kwargs.get('openskos'))
+        if "perhost" in kwargs: oBroker.iPerHost = kwargs['perhost']
+        # Broker responses can be re-used by later runs with (partly) the same selection
+        if "cache" in kwargs:
+            oBroker.oCache = cache.cache(errHandle, kwargs['cache'], kwargs.get('ttl'), kwargs.get('bypass', False))
+        # Documents that occur in several gathers are downloaded once into the store
+        oStore = None
+        if "store" in kwargs: oStore = store.store(errHandle, kwargs['store'])
+        # All documents and their download state are recorded in the manifest
+        flManifest = kwargs.get('manifest', os.path.splitext(flOutput)[0] + ".db")
+        oManifest = manifest.manifest(errHandle, flManifest)
+        # Downloads run concurrently while the gathers are being processed
+        oDown = download.downloader(errHandle, oBroker, kwargs.get('workers', 8), kwargs.get('retries', 3),
+                                    oStore=oStore, oManifest=oManifest)
 
         # Read the specification of the genres and dates we are looking for
         if not os.path.isfile(flInput):
@@ -98,67 +176,44 @@ def foliaselect(**kwargs):
         # Read the input file as JSON
         with open(flInput, "r") as fIn:
             oInput = json.load(fIn)
-        sDate = oInput['date']
         iTotal = 0
+        iResults = 0
         # Derive an output directory
         sDirOut = os.path.dirname(flOutput)
-        # Load the collection array
-        lstCollection = oInput['collection']
-        # Walk the collections
-        for oCol in lstCollection:
-            # Treat this collection
-            sTitle = oCol['title']
-            lstGather = oCol['gather']
-            # Walk all gather elements
-            for iGather, oGather in enumerate(lstGather):
-                # Get the information from this object
-                oRequest = oBroker.task2request(oGather)
-                oResponse = oBroker.request(oRequest)
-                # Interpret the response
-                if oResponse == None:
-                    errHandle.DoError("Could not get a response from the broker")
-                    return False
-                elif oResponse['status'] != 'ok':
-                    errHandle.DoError("Broker returned error: " + oResponse['status'])
-                    return False
-
-                # Process the documents we received
-                iResults = oResponse['stats']['total']
-                oGather['results'] = iResults
-                oGather['documents'] = oResponse['documents']
+        # List all gather elements of all collections, in the order of the input
+        lstTask = []
+        for oCol in oInput['collection']:
+            for iGather, oGather in enumerate(oCol['gather']):
+                lstTask.append((oCol, iGather, oGather))
+        # Query the broker for several gathers at the same time; each query hands
+        #   its documents to the downloader as soon as a page comes in
+        # Every gather only changes its own element of [oInput], and the manifest is
+        #   keyed on (dir, gather, num), so the output does not depend on the timing
+        with futures.ThreadPoolExecutor(max_workers=max(1, kwargs.get('queries', 4))) as oPool:
+            lstFuture = [oPool.submit(selectGather, oBroker, oDown, oManifest, oCol, iGather, oGather, sDirOut, **kwargs)
+                         for (oCol, iGather, oGather) in lstTask]
+            for oFuture in lstFuture:
+                iResults = oFuture.result()
+                if iResults == None:
+                    # Do not start the queries that are still waiting
+                    for oOther in lstFuture: oOther.cancel()
+                    break
                 # Keep track of how much we get
                 iTotal += iResults
-                # Show what we are doing
-                if "end" in oGather:
-                    iEnd = oGather['end']
-                else:
-                    iEnd = oGather['start'] + 1
-                errHandle.Status("{} collection[{}] genre[{}] years: [{}-{}]: {}".format(
-                    sDate, sTitle, oGather['genre'], oGather['start'], iEnd, iResults))
-
-                # Create a directory for these results
-                sResDir = os.path.join(os.path.abspath(sDirOut), oCol['dir'])
-                if not os.path.exists(sResDir): os.mkdir(sResDir)
-                sResDir = os.path.join(os.path.abspath(sResDir), str(iGather) )
-                if not os.path.exists(sResDir): os.mkdir(sResDir)
-
-                # Walk through the results
-                for iRes, oRes in enumerate(oGather['documents']):
-                    # Create a file name
-                    sResBase = os.path.join(sResDir, str(iRes) )
-                    sResFolia = sResBase + ".folia.xml"
-                    sResJson = sResBase + ".json"
-
-                    # Save the meta information
-                    with open(sResJson, "w") as fMeta:
-                        json.dump(oRes, fMeta, indent=2)
-
-                    # Resumption?
-                    if sMethod != 'resume' or not os.path.exists(sResFolia + ".gz"):
-                        # Get and save the folia file
-                        print("Downloading: {}".format(sResFolia))
-                        oBroker.getFolia(oRes['NLCore_NLIdentification_nederlabID'], sResFolia)
+        if oBroker.oCache != None: oBroker.oCache.close()
+        if iResults == None:
+            oDown.finish()
+            oManifest.close()
+            return False
 
+        # Wait for the downloads that are still running
+        lFailed = oDown.finish()
+        oManifest.close()
+        # The caller may want to know how long the requests took (see selectbench.py)
+        if "timings" in kwargs: kwargs['timings'].update(oBroker.oTimes)
+        if len(lFailed) > 0:
+            # The documents that could not be downloaded are in the manifest: a 'resume' run can get them
+            errHandle.Status("Failed downloads: {} (see: -m report -d {})".format(len(lFailed), flManifest))
         # Save all the document details
         errHandle.Status("saving to: " + flOutput)
         with open(flOutput, "w") as fOut:
@@ -173,6 +228,113 @@ def foliaselect(**kwargs):
         return False
 
 
+# ----------------------------------------------------------------------------------
+# Name :    useManifest
+# Goal :    Report on the manifest, or export it to one .json file per document
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def useManifest(sMethod, flManifest):
+
+    try:
+        if not os.path.isfile(flManifest):
+            errHandle.DoError("Could not find the manifest [{}]".format(flManifest))
+            return False
+        oManifest = manifest.manifest(errHandle, flManifest)
+        if sMethod == 'report':
+            wOut = csv.writer(sys.stdout, delimiter='\t', lineterminator='\n')
+            for oRow in oManifest.report():
+                wOut.writerow(oRow)
+            for oFailed in oManifest.failed():
+                errHandle.Status("Failed: {} {} ({})".format(oFailed['id'], oFailed['file'], oFailed['error']))
+        elif sMethod == 'export':
+            iCount = oManifest.export()
+            errHandle.Status("Exported: {} documents".format(iCount))
+        oManifest.close()
+        return True
+    except:
+        errHandle.DoError("useManifest")
+        return False
+
+# ----------------------------------------------------------------------------------
+# Name :    selectGather
+# Goal :    Walk the broker results of one gather element in pages of [page] documents
+#           The documents of each page are recorded in the manifest and handed to the 
+#           downloader right away, so that no page needs to be kept once it has been processed
+# Return:   The number of results the broker has for this gather, or None on failure
+# History:
+# 20/dec/2016    ERK Created (as part of foliaselect)
+# 19/oct/2026    ERK Separate function, paginated
+# 19/oct/2026    ERK May run for several gathers at the same time
+# 19/oct/2026    ERK Resume checks the files the manifest has as downloaded
+# ----------------------------------------------------------------------------------
+def selectGather(oBroker, oDown, oManifest, oCol, iGather, oGather, sDirOut, **kwargs):
+    sMethod = kwargs.get('method', '')
+    iPage = kwargs.get('page', 100)
+    iWanted = oGather['number']
+    iStart = 0
+    iResults = 0
+
+    try:
+        # Create a directory for these results
+        sResDir = os.path.join(os.path.abspath(sDirOut), oCol['dir'])
+        #   (other gathers of the same collection may be doing the same at this moment)
+        sResDir = os.path.join(sResDir, str(iGather) )
+        os.makedirs(sResDir, exist_ok=True)
+        # Resumption? Documents the manifest has as downloaded are skipped,
+        #   as long as their file is still there and complete (see broker.isComplete)
+        oDone = set()
+        if sMethod == 'resume': oDone = oManifest.doneSet(oCol['dir'], iGather)
+
+        while iStart < iWanted:
+            # Get the information from this object: one page at a time
+            oRequest = oBroker.task2request(oGather, iStart, min(iPage, iWanted - iStart))
+            oResponse = oBroker.request(oRequest)
+            # Interpret the response
+            if oResponse == None:
+                errHandle.DoError("Could not get a response from the broker")
+                return None
+            elif oResponse['status'] != 'ok':
+                errHandle.DoError("Broker returned error: " + oResponse['status'])
+                return None
+
+            # Process the documents we received
+            iResults = oResponse['stats']['total']
+            lDocuments = oResponse['documents']
+
+            # Save the meta information
+            oManifest.addPage(oCol['dir'], iGather, iStart, lDocuments, sResDir)
+
+            # Walk through the results
+            for iRes, oRes in enumerate(lDocuments, iStart):
+                # Create a file name
+                sResFolia = os.path.join(sResDir, str(iRes) ) + ".folia.xml"
+                if iRes in oDone:
+                    if oBroker.isComplete(sResFolia): continue
+                    errHandle.Status("Incomplete, downloading again: {}".format(sResFolia))
+                # Get and save the folia file
+                print("Downloading: {}".format(sResFolia))
+                oDown.submit(oRes['NLCore_NLIdentification_nederlabID'], sResFolia, (oCol['dir'], iGather, iRes))
+
+            iStart += len(lDocuments)
+            # Stop when the broker has nothing more
+            if len(lDocuments) == 0 or iStart >= iResults: break
+
+        oGather['results'] = iResults
+        oGather['documents'] = iStart
+        # Show what we are doing
+        if "end" in oGather:
+            iEnd = oGather['end']
+        else:
+            iEnd = oGather['start'] + 1
+        errHandle.Status("collection[{}] genre[{}] years: [{}-{}]: {} (documents: {})".format(
+            oCol['title'], oGather['genre'], oGather['start'], iEnd, iResults, iStart))
+        return iResults
+    except:
+        errHandle.DoError("selectGather")
+        return None
+
+
 # ----------------------------------------------------------------------------------
 # Goal :  If user calls this as main, then follow up on it
 # ----------------------------------------------------------------------------------
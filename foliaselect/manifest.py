@@ -0,0 +1,141 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import json
+import sqlite3
+import threading
+import time
+
+# ----------------------------------------------------------------------------------
+# Name :    manifest
+# Goal :    One transactional SQLite database with all documents of a selection:
+#           the broker metadata, the download state ('pending', 'done', 'failed'),
+#           size, checksum, error and timestamps of each document.
+#           Documents are identified by (dir, gather, num): the same triple that
+#           determines the file name <dir>/<gather>/<num>.folia.xml.gz
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class manifest:
+    """Download manifest of a FoLiA selection"""
+
+    # ======================= CLASS INITIALIZER ========================================
+    def __init__(self, oErr, flDbase):
+        # Set the error handler
+        self.errHandle = oErr
+        self.flDbase = flDbase
+        self.oLock = threading.Lock()
+        self.conn = sqlite3.connect(flDbase, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    dir TEXT, gather INTEGER, num INTEGER, nederlabid TEXT, path TEXT, meta TEXT,
+                    state TEXT, size INTEGER, checksum TEXT, error TEXT, created REAL, updated REAL,
+                    PRIMARY KEY (dir, gather, num));
+                CREATE INDEX IF NOT EXISTS idx_documents_state ON documents (state);
+                CREATE INDEX IF NOT EXISTS idx_documents_id ON documents (nederlabid);
+                """)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    addPage
+    # Goal :    Record one page of broker documents, starting at number [iFirst]
+    #           Documents that are already known keep their download state
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def addPage(self, sDir, iGather, iFirst, lDocuments, sResDir):
+        fNow = time.time()
+        lRows = []
+        for iNum, oRes in enumerate(lDocuments, iFirst):
+            sPath = os.path.join(sResDir, str(iNum) + ".folia.xml.gz")
+            lRows.append((sDir, iGather, iNum, oRes['NLCore_NLIdentification_nederlabID'], sPath,
+                          json.dumps(oRes), 'pending', fNow, fNow))
+        with self.oLock:
+            with self.conn:
+                self.conn.executemany("""
+                    INSERT INTO documents (dir, gather, num, nederlabid, path, meta, state, created, updated)
+                    VALUES (?,?,?,?,?,?,?,?,?)
+                    ON CONFLICT (dir, gather, num) DO UPDATE SET
+                        nederlabid=excluded.nederlabid, path=excluded.path, meta=excluded.meta,
+                        state=CASE WHEN documents.nederlabid=excluded.nederlabid THEN documents.state ELSE 'pending' END,
+                        updated=excluded.updated""", lRows)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    doneSet
+    # Goal :    The numbers of the documents of one gather that have been downloaded
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def doneSet(self, sDir, iGather):
+        with self.oLock:
+            lRows = self.conn.execute("SELECT num FROM documents WHERE dir=? AND gather=? AND state='done'",
+                                      (sDir, iGather)).fetchall()
+        return set(x[0] for x in lRows)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    update
+    # Goal :    Record the outcome of a download
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def update(self, oKey, sState, iSize = None, sChecksum = None, sError = None):
+        (sDir, iGather, iNum) = oKey
+        with self.oLock:
+            with self.conn:
+                self.conn.execute("UPDATE documents SET state=?, size=?, checksum=?, error=?, updated=? " + \
+                                  "WHERE dir=? AND gather=? AND num=?",
+                                  (sState, iSize, sChecksum, sError, time.time(), sDir, iGather, iNum))
+
+    # ----------------------------------------------------------------------------------
+    # Name :    report
+    # Goal :    Number of documents and bytes per dir/gather/state
+    #           Returns a list of rows; the first row contains the column names
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def report(self):
+        lRows = [['dir', 'gather', 'state', 'documents', 'bytes']]
+        with self.oLock:
+            for oRow in self.conn.execute("SELECT dir, gather, state, COUNT(*), SUM(size) FROM documents " + \
+                                          "GROUP BY dir, gather, state ORDER BY dir, gather, state"):
+                lRows.append(list(oRow[:4]) + [oRow[4] or 0])
+        return lRows
+
+    # ----------------------------------------------------------------------------------
+    # Name :    failed
+    # Goal :    List the documents whose download failed
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def failed(self):
+        with self.oLock:
+            lRows = self.conn.execute("SELECT nederlabid, path, error FROM documents WHERE state='failed' " + \
+                                      "ORDER BY dir, gather, num").fetchall()
+        return [{'id': x[0], 'file': x[1], 'error': x[2]} for x in lRows]
+
+    # ----------------------------------------------------------------------------------
+    # Name :    export
+    # Goal :    Write the metadata of every document to <dir>/<gather>/<num>.json,
+    #           the layout that foliaselect used to make for every document
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def export(self):
+        iCount = 0
+        with self.oLock:
+            lRows = self.conn.execute("SELECT path, meta FROM documents").fetchall()
+        for (sPath, sMeta) in lRows:
+            sResJson = sPath.replace(".folia.xml.gz", ".json")
+            if not os.path.exists(os.path.dirname(sResJson)): os.makedirs(os.path.dirname(sResJson))
+            with open(sResJson, "w") as fMeta:
+                json.dump(json.loads(sMeta), fMeta, indent=2)
+            iCount += 1
+        return iCount
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,192 @@
+# ==========================================================================================================
+# Name :    selectbench
+# Goal :    Benchmark foliaselect: selection (broker queries) and download of FoLiA documents
+#           Runs against the local stand-in (standin.py), or against the given endpoints
+#           Reports documents/sec, MB/s and the latency percentiles of both phases
+# History:
+# 19/oct/2026    ERK Created
+# ==========================================================================================================
+import sys, getopt, os.path, importlib
+import util
+import foliaselect
+import standin
+import json
+import time
+import math
+import tempfile
+import shutil
+import contextlib
+
+# ============================= LOCAL VARIABLES ====================================
+errHandle = util.ErrHandle()
+
+# ----------------------------------------------------------------------------------
+# Name :    main
+# Goal :    Main body of the function
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def main(prgName, argv) :
+    kwargs = {}
+
+    try:
+        # Adapt the program name to exclude the directory (for windows)
+        index = prgName.rfind("\\")
+        if (index > 0) :
+            prgName = prgName[index+1:]
+        sSyntax = prgName + ' [-u <broker url> -f <folia url>] [-g <gathers>] [-n <documents per gather>] ' + \
+                  '[-s <KB per document>] [-l <latency ms>] [-w <KB/s>] [-x <fail fraction>] ' + \
+                  '[-p <page size>] [-q <queries>] [-d <downloads>] [-o <resultfile>]'
+        # get all the arguments
+        try:
+            # Get arguments and options
+            opts, args = getopt.getopt(argv, "hu:f:g:n:s:l:w:x:p:q:d:o:",
+                ["-broker=", "-folia=", "-gathers=", "-documents=", "-size=", "-latency=", "-bandwidth=",
+                 "-fail=", "-page=", "-queries=", "-downloads=", "-output="])
+        except getopt.GetoptError:
+              print(sSyntax)
+              sys.exit(2)
+        # Walk all the arguments
+        for opt, arg in opts:
+            if opt == '-h':
+                print(sSyntax)
+                sys.exit(0)
+            elif opt in ("-u", "--broker"):
+                kwargs['broker'] = arg
+            elif opt in ("-f", "--folia"):
+                kwargs['openskos'] = arg
+            elif opt in ("-g", "--gathers"):
+                kwargs['gathers'] = int(arg)
+            elif opt in ("-n", "--documents"):
+                kwargs['documents'] = int(arg)
+            elif opt in ("-s", "--size"):
+                kwargs['size'] = int(arg)
+            elif opt in ("-l", "--latency"):
+                kwargs['latency'] = float(arg)
+            elif opt in ("-w", "--bandwidth"):
+                kwargs['bandwidth'] = float(arg)
+            elif opt in ("-x", "--fail"):
+                kwargs['fail'] = float(arg)
+            elif opt in ("-p", "--page"):
+                kwargs['page'] = int(arg)
+            elif opt in ("-q", "--queries"):
+                kwargs['queries'] = int(arg)
+            elif opt in ("-d", "--downloads"):
+                kwargs['workers'] = int(arg)
+            elif opt in ("-o", "--output"):
+                kwargs['result'] = arg
+        if ('broker' in kwargs) != ('openskos' in kwargs):
+            errHandle.DoError(sSyntax)
+            return False
+        if benchmark(**kwargs):
+            errHandle.Status("Ready")
+        else:
+            errHandle.DoError("Could not complete")
+    except SystemExit:
+        raise
+    except:
+        # Show the error to the user
+        errHandle.DoError("main")
+        return False
+
+# ----------------------------------------------------------------------------------
+# Name :    percentiles
+# Goal :    The 50th, 95th and 99th percentile (nearest rank) of [lTimes] in milliseconds
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def percentiles(lTimes):
+    oResult = {}
+    lSorted = sorted(lTimes)
+    for iPerc in (50, 95, 99):
+        if len(lSorted) == 0:
+            oResult['p' + str(iPerc)] = None
+        else:
+            iRank = max(1, int(math.ceil(iPerc / 100 * len(lSorted))))
+            oResult['p' + str(iPerc)] = round(lSorted[iRank - 1] * 1000, 1)
+    return oResult
+
+# ----------------------------------------------------------------------------------
+# Name :    benchmark
+# Goal :    Run foliaselect once on a selection of [gathers] gathers, and report
+#           The stand-in gets the settings documents, size, latency, bandwidth, fail
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def benchmark(**kwargs):
+    sTmpDir = tempfile.mkdtemp(prefix="selectbench-")
+    oServer = None
+
+    try:
+        iGathers = kwargs.get('gathers', 10)
+        iDocuments = kwargs.get('documents', 50)
+        # Start the stand-in, unless real endpoints were given
+        if not 'broker' in kwargs:
+            oServer = standin.start(documents=iDocuments, size=kwargs.get('size', 200),
+                                    latency=kwargs.get('latency', 50), bandwidth=kwargs.get('bandwidth', 0),
+                                    fail=kwargs.get('fail', 0))
+            sBase = "http://127.0.0.1:{}".format(oServer.server_address[1])
+            kwargs['broker'] = sBase + "/search"
+            kwargs['openskos'] = sBase + "/get/"
+        errHandle.Status("Broker: " + kwargs['broker'])
+        errHandle.Status("FoLiA:  " + kwargs['openskos'])
+
+        # The selection: one collection with [iGathers] gathers of one year each
+        flInput = os.path.join(sTmpDir, "select.json")
+        flOutput = os.path.join(sTmpDir, "out", "selected.json")
+        os.makedirs(os.path.dirname(flOutput))
+        oInput = {'date': time.strftime("%Y-%m-%d"), 'collection': [{'title': 'benchmark', 'dir': 'bench',
+                  'gather': [{'genre': 'roman', 'start': 1800 + i, 'number': iDocuments} for i in range(iGathers)]}]}
+        with open(flInput, "w") as fOut:
+            json.dump(oInput, fOut)
+
+        oTimes = {}
+        fStart = time.perf_counter()
+        # (foliaselect reports every download on stdout; that is not what we want to see here)
+        with open(os.devnull, "w") as fNull, contextlib.redirect_stdout(fNull):
+            bOkay = foliaselect.foliaselect(input=flInput, output=flOutput, stat="", broker=kwargs['broker'],
+                                            openskos=kwargs['openskos'], workers=kwargs.get('workers', 8),
+                                            queries=kwargs.get('queries', 4), page=kwargs.get('page', 100),
+                                            timings=oTimes)
+        fTotal = time.perf_counter() - fStart
+        if not bOkay: return False
+
+        # Count what was downloaded
+        iDocs = 0
+        iBytes = 0
+        for root, dirs, files in os.walk(os.path.dirname(flOutput)):
+            for file in files:
+                if file.endswith(".folia.xml.gz"):
+                    iDocs += 1
+                    iBytes += os.path.getsize(os.path.join(root, file))
+
+        lSelect = oTimes.get('select', [])
+        lDownload = oTimes.get('download', [])
+        oResult = {'gathers': iGathers, 'documents': iDocs, 'mb': round(iBytes / 1048576, 2),
+                   'total_sec': round(fTotal, 3),
+                   'docs_sec': round(iDocs / max(fTotal, 1e-9), 1),
+                   'mb_sec': round(iBytes / 1048576 / max(fTotal, 1e-9), 2),
+                   'select_requests': len(lSelect), 'select_ms': percentiles(lSelect),
+                   'download_requests': len(lDownload), 'download_ms': percentiles(lDownload)}
+        for (k,v) in oResult.items():
+            if isinstance(v, dict):
+                v = " ".join("{}={}".format(a, b) for (a, b) in v.items())
+            print("{}\t{}".format(k, v))
+        if 'result' in kwargs:
+            with open(kwargs['result'], "w") as fOut:
+                json.dump(oResult, fOut, indent=2)
+        return True
+    except:
+        errHandle.DoError("benchmark")
+        return False
+    finally:
+        if oServer != None: oServer.shutdown()
+        shutil.rmtree(sTmpDir, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------------------
+# Goal :  If user calls this as main, then follow up on it
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+    # Call the main function with two arguments: program name + remainder
+    main(sys.argv[0], sys.argv[1:])
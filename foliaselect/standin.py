@@ -0,0 +1,306 @@
+# ==========================================================================================================
+# Name :    standin
+# Goal :    Local stand-in for the Nederlab broker and the OpenSKOS FoLiA archive
+#           - POST <any path>:        broker search, answered in the shape of the real broker
+#           - GET  /get/<nederlabid>: a synthetic gzipped FoLiA document (with HTTP Range support)
+#           Latency, bandwidth and failures can be set, so that foliaselect can be tested
+#           and benchmarked without the public services.
+#           Use with: foliaselect.py -u http://localhost:<port>/search -f http://localhost:<port>/get/
+# History:
+# 19/oct/2026    ERK Created
+# ==========================================================================================================
+import sys, getopt, os.path, importlib
+import util
+import json
+import gzip
+import random
+import time
+import re
+import threading
+import functools
+import http.server
+import urllib.parse
+
+# ============================= LOCAL VARIABLES ====================================
+errHandle = util.ErrHandle()
+
+# Material for the synthetic documents
+WORDS = ["de", "het", "een", "en", "van", "in", "dat", "hij", "zij", "niet", "met", "op", "te", "was",
+         "zijn", "voor", "aan", "er", "maar", "om", "ook", "als", "dan", "nog", "wel", "naar", "uit",
+         "huis", "stad", "brief", "jaar", "dag", "man", "vrouw", "schip", "reis", "kerk", "boek"]
+ENTITIES = {"loc": ["Amsterdam", "Leiden", "Batavia", "Holland", "Parijs", "Utrecht"],
+            "per": ["Rembrandt", "Vondel", "Multatuli", "Erasmus", "Huygens"],
+            "org": ["VOC", "Staten-Generaal", "Maatschappij der Nederlandse Letterkunde"]}
+
+# ----------------------------------------------------------------------------------
+# Name :    makeFolia
+# Goal :    Make the gzipped FoLiA document for [sId] of about [iSize] KB (uncompressed)
+#           The same identifier always gives the same document
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+@functools.lru_cache(maxsize=256)
+def makeFolia(sId, iSize):
+    oRandom = random.Random(sId)
+    sDocId = re.sub(r"[^A-Za-z0-9_.-]", "_", sId)
+    if not sDocId[:1].isalpha(): sDocId = "d" + sDocId
+    lText = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<FoLiA xmlns="http://ilk.uvt.nl/folia" xmlns:xlink="http://www.w3.org/1999/xlink" xml:id="{}" version="1.4.0" generator="standin">'.format(sDocId),
+             '<metadata type="native"><annotations>',
+             '<token-annotation set="tokconfig-nld"/><entity-annotation set="https://raw.githubusercontent.com/proycon/folia/master/setdefinitions/namedentities.foliaset.xml"/>',
+             '</annotations></metadata>',
+             '<text xml:id="{}.text">'.format(sDocId)]
+    iLength = sum(len(x) for x in lText)
+    iPara = 0
+    while iLength < iSize * 1024:
+        iPara += 1
+        sPara = "{}.p.{}".format(sDocId, iPara)
+        lPara = ['<p xml:id="{}">'.format(sPara)]
+        for iSent in range(1, oRandom.randint(2, 6)):
+            sSent = "{}.s.{}".format(sPara, iSent)
+            lWords = [oRandom.choice(WORDS) for i in range(oRandom.randint(5, 20))]
+            # Put one named entity into most sentences
+            lEntity = []
+            if oRandom.random() < 0.8:
+                sClass = oRandom.choice(sorted(ENTITIES))
+                sName = oRandom.choice(ENTITIES[sClass])
+                iPos = oRandom.randint(0, len(lWords))
+                lName = sName.split(" ")
+                lWords[iPos:iPos] = lName
+                lEntity = [(sClass, iPos, len(lName))]
+            lSent = ['<s xml:id="{}">'.format(sSent)]
+            for (iWord, sWord) in enumerate(lWords, 1):
+                lSent.append('<w xml:id="{}.w.{}"><t>{}</t></w>'.format(sSent, iWord, sWord))
+            if len(lEntity) > 0:
+                lSent.append('<entities>')
+                for (iEnt, (sClass, iPos, iLen)) in enumerate(lEntity, 1):
+                    lSent.append('<entity xml:id="{}.entity.{}" class="{}">'.format(sSent, iEnt, sClass))
+                    for iWord in range(iPos + 1, iPos + iLen + 1):
+                        lSent.append('<wref id="{}.w.{}" t="{}"/>'.format(sSent, iWord, lWords[iWord - 1]))
+                    lSent.append('</entity>')
+                lSent.append('</entities>')
+            lSent.append('</s>')
+            lPara.append("".join(lSent))
+        lPara.append('</p>')
+        sPara = "\n".join(lPara)
+        lText.append(sPara)
+        iLength += len(sPara)
+    lText.append('</text>')
+    lText.append('</FoLiA>')
+    return gzip.compress("\n".join(lText).encode('utf-8'), compresslevel=6)
+
+# ----------------------------------------------------------------------------------
+# Name :    handler
+# Goal :    Answer one HTTP request; the settings are in [self.server.oSettings]
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class handler(http.server.BaseHTTPRequestHandler):
+    """Request handler of the stand-in"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.oSettings.get('verbose', False):
+            errHandle.Status(self.address_string() + " " + (format % args))
+
+    def delay(self):
+        # Latency in milliseconds, varying between half and one-and-a-half times the setting
+        fLatency = self.server.oSettings.get('latency', 0)
+        if fLatency > 0: time.sleep(fLatency * random.uniform(0.5, 1.5) / 1000)
+
+    def sendBody(self, iStatus, sType, bBody, oHeaders = {}):
+        self.send_response(iStatus)
+        self.send_header('Content-Type', sType)
+        self.send_header('Content-Length', str(len(bBody)))
+        for (k, v) in oHeaders.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(bBody)
+
+    # Broker search
+    def do_POST(self):
+        oSettings = self.server.oSettings
+        iLength = int(self.headers.get('Content-Length', 0))
+        bData = self.rfile.read(iLength)
+        self.delay()
+        if random.random() < oSettings.get('fail', 0):
+            self.sendBody(503, 'text/plain', b'Service Unavailable (injected)')
+            return
+        try:
+            oData = json.loads(bData.decode('utf-8'))
+        except ValueError:
+            self.sendBody(400, 'text/plain', b'Not JSON')
+            return
+        # Find the genre and the years
+        sGenre = ""
+        sStart = ""
+        sEnd = ""
+        for oCond in oData.get('condition', {}).get('list', []):
+            if oCond.get('field') == "NLTitle_genre": sGenre = oCond.get('value', "")
+            if oCond.get('type') == "range":
+                sStart = oCond.get('start', "")
+                sEnd = oCond.get('end', "")
+        oDocs = oData.get('response', {}).get('documents', {})
+        iFirst = oDocs.get('start', 0)
+        iNumber = oDocs.get('number', 10)
+        # Every gather has the same number of documents
+        iTotal = oSettings.get('documents', 250)
+        lDocuments = []
+        for iDoc in range(iFirst, min(iFirst + iNumber, iTotal)):
+            sId = "{}_{}_{}_{:05d}".format(sGenre, sStart, sEnd, iDoc)
+            lDocuments.append({"NLCore_NLIdentification_nederlabID": sId,
+                               "NLCore_NLAdministrative_sourceCollection": "DBNL",
+                               "NLTitle_title": "Synthetic document " + sId,
+                               "NLTitle_yearOfPublicationMin": sStart,
+                               "NLTitle_yearOfPublicationMax": sEnd,
+                               "NLTitle_yearOfPublicationLabel": sStart,
+                               "NLTitle_genre": sGenre,
+                               "title_authorinfo": [{"NLPerson_NLPersonName_preferredFullName": "Stand-in"}]})
+        oResult = {"status": "ok", "stats": {"total": iTotal}, "documents": lDocuments}
+        self.sendBody(200, 'application/json', json.dumps(oResult).encode('utf-8'))
+
+    # FoLiA archive
+    def do_GET(self):
+        oSettings = self.server.oSettings
+        oMatch = re.match(r"^.*/get/(.+)$", self.path)
+        if oMatch == None:
+            self.sendBody(404, 'text/plain', b'Not found')
+            return
+        self.delay()
+        if random.random() < oSettings.get('fail', 0):
+            self.sendBody(503, 'text/plain', b'Service Unavailable (injected)')
+            return
+        bFolia = makeFolia(urllib.parse.unquote(oMatch.group(1)), oSettings.get('size', 200))
+        iTotal = len(bFolia)
+        # Range request: only "bytes=<from>-" is supported, which is what broker.getFolia sends
+        iFrom = 0
+        sRange = self.headers.get('Range', '')
+        oRange = re.match(r"^bytes=(\d+)-$", sRange)
+        if oRange != None and oSettings.get('range', True):
+            iFrom = int(oRange.group(1))
+            if iFrom >= iTotal:
+                self.sendBody(416, 'text/plain', b'', {'Content-Range': 'bytes */{}'.format(iTotal)})
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(iFrom, iTotal - 1, iTotal))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/gzip')
+        self.send_header('Content-Length', str(iTotal - iFrom))
+        self.end_headers()
+        # Send the body in chunks, keeping to the bandwidth, possibly breaking off
+        iChunk = 16384
+        iBandwidth = oSettings.get('bandwidth', 0) * 1024
+        iDropAt = None
+        if random.random() < oSettings.get('drop', 0):
+            iDropAt = random.randint(iFrom, iTotal - 1)
+        iPos = iFrom
+        while iPos < iTotal:
+            iEnd = min(iPos + iChunk, iTotal)
+            if iDropAt != None and iEnd > iDropAt:
+                # Break off the connection in the middle of the body
+                self.wfile.write(bFolia[iPos:iDropAt])
+                self.wfile.flush()
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            self.wfile.write(bFolia[iPos:iEnd])
+            if iBandwidth > 0: time.sleep((iEnd - iPos) / iBandwidth)
+            iPos = iEnd
+
+# ----------------------------------------------------------------------------------
+# Name :    start
+# Goal :    Start the stand-in in a background thread
+#           port       - port to listen to (0: any free port)
+#           documents  - number of documents of every gather
+#           size       - size of a FoLiA document in KB (uncompressed)
+#           latency    - average latency of every request in milliseconds
+#           bandwidth  - maximum KB/s of every download (0: no limit)
+#           fail       - fraction of the requests that get a 503
+#           drop       - fraction of the downloads that break off halfway
+#           range      - whether Range requests are honoured
+# Return:   The server; server.server_address[1] is the port
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def start(**kwargs):
+    oServer = http.server.ThreadingHTTPServer((kwargs.get('host', '127.0.0.1'), kwargs.get('port', 0)), handler)
+    oServer.daemon_threads = True
+    oServer.oSettings = kwargs
+    oThread = threading.Thread(target=oServer.serve_forever, daemon=True)
+    oThread.start()
+    return oServer
+
+# ----------------------------------------------------------------------------------
+# Name :    main
+# Goal :    Main body of the function
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def main(prgName, argv) :
+    kwargs = {'port': 8000}
+
+    try:
+        # Adapt the program name to exclude the directory (for windows)
+        index = prgName.rfind("\\")
+        if (index > 0) :
+            prgName = prgName[index+1:]
+        sSyntax = prgName + ' [-p <port>] [-n <documents per gather>] [-s <KB per document>] [-l <latency ms>] ' + \
+                  '[-w <KB/s>] [-f <fail fraction>] [-x <drop fraction>] [-r] [-v]'
+        # get all the arguments
+        try:
+            # Get arguments and options
+            opts, args = getopt.getopt(argv, "hp:n:s:l:w:f:x:rv",
+                ["-port=", "-documents=", "-size=", "-latency=", "-bandwidth=", "-fail=", "-drop=", "-norange", "-verbose"])
+        except getopt.GetoptError:
+              print(sSyntax)
+              sys.exit(2)
+        # Walk all the arguments
+        for opt, arg in opts:
+            if opt == '-h':
+                print(sSyntax)
+                sys.exit(0)
+            elif opt in ("-p", "--port"):
+                kwargs['port'] = int(arg)
+            elif opt in ("-n", "--documents"):
+                kwargs['documents'] = int(arg)
+            elif opt in ("-s", "--size"):
+                kwargs['size'] = int(arg)
+            elif opt in ("-l", "--latency"):
+                kwargs['latency'] = float(arg)
+            elif opt in ("-w", "--bandwidth"):
+                kwargs['bandwidth'] = float(arg)
+            elif opt in ("-f", "--fail"):
+                kwargs['fail'] = float(arg)
+            elif opt in ("-x", "--drop"):
+                kwargs['drop'] = float(arg)
+            elif opt in ("-r", "--norange"):
+                kwargs['range'] = False
+            elif opt in ("-v", "--verbose"):
+                kwargs['verbose'] = True
+        oServer = start(**kwargs)
+        iPort = oServer.server_address[1]
+        errHandle.Status("Stand-in listening on port {}".format(iPort))
+        errHandle.Status("  broker: http://localhost:{}/search".format(iPort))
+        errHandle.Status("  folia:  http://localhost:{}/get/".format(iPort))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            oServer.shutdown()
+            errHandle.Status("Stopped")
+    except SystemExit:
+        raise
+    except:
+        # Show the error to the user
+        errHandle.DoError("main")
+        return False
+
+
+# ----------------------------------------------------------------------------------
+# Goal :  If user calls this as main, then follow up on it
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+    # Call the main function with two arguments: program name + remainder
+    main(sys.argv[0], sys.argv[1:])
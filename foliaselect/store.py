@@ -0,0 +1,143 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import shutil
+import hashlib
+import sqlite3
+import threading
+import time
+
+# ----------------------------------------------------------------------------------
+# Name :    store
+# Goal :    Content-addressed local store of FoLiA documents
+#           Every document is downloaded once, and kept as:
+#             <root>/objects/<sha[:2]>/<sha256>.folia.xml.gz
+#           The index <root>/index.db maps the Nederlab ID onto the checksum.
+#           The per-gather layout is made with hardlinks (or symlinks, or copies).
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class store:
+    """Content-addressed store of FoLiA documents"""
+
+    # ======================= CLASS INITIALIZER ========================================
+    def __init__(self, oErr, sRoot):
+        # Set the error handler
+        self.errHandle = oErr
+        self.sRoot = os.path.abspath(sRoot)
+        for sSub in ("objects", "tmp"):
+            sDir = os.path.join(self.sRoot, sSub)
+            if not os.path.exists(sDir): os.makedirs(sDir)
+        self.oLock = threading.Lock()
+        self.oIdLocks = {}          # One lock per Nederlab ID that is being fetched
+        self.conn = sqlite3.connect(os.path.join(self.sRoot, "index.db"), check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS documents (
+                                     nederlabid TEXT PRIMARY KEY, checksum TEXT, size INTEGER, added REAL)""")
+        # Statistics
+        self.iDownloaded = 0
+        self.iReused = 0
+
+    # ----------------------------------------------------------------------------------
+    # Name :    lookup
+    # Goal :    Get (checksum, path) of the stored object for [sId], or None
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def lookup(self, sId):
+        with self.oLock:
+            oRow = self.conn.execute("SELECT checksum FROM documents WHERE nederlabid=?", (sId,)).fetchone()
+        if oRow == None: return None
+        flObject = self.objectPath(oRow[0])
+        if not os.path.exists(flObject): return None
+        return (oRow[0], flObject)
+
+    def objectPath(self, sChecksum):
+        return os.path.join(self.sRoot, "objects", sChecksum[:2], sChecksum + ".folia.xml.gz")
+
+    # ----------------------------------------------------------------------------------
+    # Name :    add
+    # Goal :    Move the downloaded file [flFile] into the store under its checksum
+    # Return:   (checksum, path of the object)
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def add(self, sId, flFile):
+        oHash = hashlib.sha256()
+        with open(flFile, "rb") as fIn:
+            for bChunk in iter(lambda: fIn.read(1048576), b""):
+                oHash.update(bChunk)
+        sChecksum = oHash.hexdigest()
+        flObject = self.objectPath(sChecksum)
+        if not os.path.exists(os.path.dirname(flObject)):
+            os.makedirs(os.path.dirname(flObject), exist_ok=True)
+        if os.path.exists(flObject):
+            # Same content under another ID: keep one copy
+            os.remove(flFile)
+        else:
+            os.replace(flFile, flObject)
+        with self.oLock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO documents VALUES (?,?,?,?)",
+                                  (sId, sChecksum, os.path.getsize(flObject), time.time()))
+        return (sChecksum, flObject)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    link
+    # Goal :    Make [flTarget] point to the stored object: hardlink if possible,
+    #           otherwise a symbolic link, otherwise a copy
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def link(self, flObject, flTarget):
+        if os.path.lexists(flTarget):
+            if os.path.exists(flTarget) and os.path.samefile(flObject, flTarget): return
+            os.remove(flTarget)
+        try:
+            os.link(flObject, flTarget)
+        except OSError:
+            try:
+                os.symlink(flObject, flTarget)
+            except OSError:
+                shutil.copyfile(flObject, flTarget)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    fetch
+    # Goal :    Make the FoLiA document [sId] available as [flOutput](.gz)
+    #           It is only downloaded (with [oBroker]) if the store does not have it yet
+    #           Safe to call from several threads; one ID is downloaded by one thread
+    # Return:   True upon success; upon failure oBroker.lastError() tells why
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def fetch(self, oBroker, sId, flOutput):
+        if not flOutput.endswith(".gz"):
+            flOutput += ".gz"
+        with self.oLock:
+            if not sId in self.oIdLocks: self.oIdLocks[sId] = [threading.Lock(), 0]
+            oIdLock = self.oIdLocks[sId]
+            oIdLock[1] += 1
+        try:
+            with oIdLock[0]:
+                oFound = self.lookup(sId)
+                if oFound != None:
+                    with self.oLock: self.iReused += 1
+                else:
+                    # Download into the store; an interrupted .part file is continued next time
+                    flTmp = os.path.join(self.sRoot, "tmp", hashlib.sha1(sId.encode('utf-8')).hexdigest() + ".folia.xml.gz")
+                    if not oBroker.getFolia(sId, flTmp): return False
+                    oFound = self.add(sId, flTmp)
+                    with self.oLock: self.iDownloaded += 1
+                self.link(oFound[1], flOutput)
+            return True
+        finally:
+            with self.oLock:
+                oIdLock[1] -= 1
+                if oIdLock[1] == 0: del self.oIdLocks[sId]
+
+    def close(self):
+        self.errHandle.Status("Store: downloaded={} reused={}".format(self.iDownloaded, self.iReused))
+        self.conn.close()
@@ -11,6 +11,20 @@ import json
 from xml.sax.saxutils import escape
 import requests
 import urllib
+import socket
+import shutil
+import gzip
+import foliareader
+import nelfilter
+import nelprune
+import nelstrategy
+import endpoints
+import nelarchive
+import negcache
+import nelbudget
+import sentindex
+import copy
+from concurrent import futures
 # Make sure that folia is imported
 try:
   from pynlpl.formats import folia
@@ -56,6 +70,22 @@ class broker:
     self.schema = lxml.etree.RelaxNG(folia.relaxng())
     self.quick = False
     self.reHref = re.compile(r"href=['\"]?([^'\"]+)")
+    self.reader = foliareader.foliareader(oErr)
+    self.index = sentindex.sentindex(oErr)
+    self.filter = nelfilter.nelfilter(oErr)
+    self.prune = nelprune.nelprune(oErr)
+    self.strategy = nelstrategy.nelstrategy(oErr)
+    # Several Spotlight replicas can be given as a comma-separated list of base urls
+    self.endpoints = None
+    if os.environ.get("NEL_SPOTLIGHT", "") != "":
+      self.endpoints = endpoints.endpoints.fromSpec(oErr, os.environ["NEL_SPOTLIGHT"])
+    # Record or replay of the remote requests (a nelarchive object)
+    self.archive = None
+    # Entities that gave nothing before (a negcache object)
+    self.negcache = None
+    # Time and request budgets (a nelbudget object), and that of the current document
+    self.budget = None
+    self.oBudgetDoc = None
 
   # ----------------------------------------------------------------------------------
   # Name :    doValidate
@@ -77,16 +107,37 @@ class broker:
   # ----------------------------------------------------------------------------------
   # Name :    addOneNelToFolia
   # Goal :    Add one Named-Entity-Linking layer to a Folia xml file
-  # Return:   None upon failure. Otherwise an object with 'hits' and 'fail' numbers
+  #           With info['log'] (a nellog object) every resolved entity is written as
+  #           .folia.log rows right away, and counted the way ne-stat counts them
+  #           info['filter'] is the nelfilter object to use (default: self.filter)
+  #           info['prune'] is the nelprune object to use (default: self.prune)
+  #           info['strategy'] is the nelstrategy object to use (default: self.strategy);
+  #           its order of request types is fixed for the document (nelstrategy.snapshot)
+  #           info['budget'] is the nelbudget object to use (default: self.budget);
+  #           entities left when the budget is used up are deferred, not resolved
+  #           info['parts'] > 1 divides the document into that many parts of whole sentences
+  #           that are resolved at the same time (see sentindex)
+  #           The work is done in three steps:
+  #             collect    - read the entities with the fast lxml reader (foliareader)
+  #             resolve    - filter and normalize, then look up the links of every entity
+  #             writeLinks - write the links back (pynlpl is only loaded for this)
+  # Return:   None upon failure. Otherwise an object with 'hits' and 'fail' numbers,
+  #           'deferred' (the number of entities that were not done)
+  #           (and 'stats': the nelstats-format counts, if there is a log)
   # History:
   # 28/sep/2016    ERK Created
+  # 19/oct/2026    ERK Log rows and statistics while linking
+  # 19/oct/2026    ERK Split into collect, resolve and writeLinks
+  # 19/oct/2026    ERK Filter and normalize entities
+  # 19/oct/2026    ERK Prune the alignments
+  # 19/oct/2026    ERK Adaptive request strategy
+  # 19/oct/2026    ERK Time and request budgets
+  # 19/oct/2026    ERK Parts of a document at the same time
+  # 19/oct/2026    ERK Request order fixed per document
   # ----------------------------------------------------------------------------------
   def addOneNelToFolia(self, flInput, flOutput, bDoAsk = False, **info):
-    lResolutions = []     # List of all resolution items
 
     try:
-      # Initialisations
-      patPunct = re.compile(r"[\.\,\?\!\'\"\`\;\:\-]")
       # Validate: does flInput exist?
       if (not os.path.isfile(flInput)) : 
         self.errHandle.DoError("Input file not found: " + flInput)
@@ -108,6 +159,13 @@ class broker:
       if ("annotator" in info): sAnnotator = info["annotator"]
       if ("annotatortype" in info): iAnnotatorType = getAnnotatorType(info["annotatortype"])
       if ("confidence" in info): sConfidence = info["confidence"]
+      oLog = info.get("log", None)
+      oFilter = info.get("filter", self.filter)
+      oPrune = info.get("prune", self.prune)
+      oStrategy = info.get("strategy", self.strategy)
+      oBudget = info.get("budget", self.budget)
+      iParts = info.get("parts", 1)
+      sFile = os.path.basename(flOutput)
       # Set optional arguments
       kwargs = {}
       if (sAnnotator != ""):
@@ -119,116 +177,232 @@ class broker:
       else:
         sAnnotator = "nel2folia" 
 
-      # Load the indicated .folia.xml INPUT document
+      # Read the entities of the .folia.xml INPUT document
       self.errHandle.Status("Loading file: " + flInput )
-      doc = folia.Document(file=flInput)
-      # Immediately save it as the output document
+      if iParts > 1:
+        lParts = self.collectParts(flInput, iParts)
+        if lParts == None: return None
+        lEntities = [oEntity for lPart in lParts for oEntity in lPart]
+      else:
+        lEntities = self.collect(flInput)
+        if lEntities == None: return None
+
+      # Look up the links of all entities, in an order of request types fixed for the document
+      oFrozen = None if oStrategy == None else oStrategy.snapshot()
+      if iParts > 1 and len(lParts) > 1:
+        oResolved = self.resolveParts(lParts, sConfidence, oLog, sFile, oFilter, oPrune, oFrozen, oBudget)
+      else:
+        oResolved = self.resolve(lEntities, sConfidence, oLog, sFile, oFilter, oPrune, oFrozen, oBudget)
+      if oFrozen != None: oFrozen.flush()
+      if len(oResolved['deferred']) > 0:
+        self.errHandle.Status("Budget used up ({}): {} entities deferred in {}".format(
+          oResolved['reason'], len(oResolved['deferred']), flInput), 'budget', util.LEVEL_WARNING)
+        oBudget.defer(flInput, flOutput, oResolved['deferred'], oResolved['reason'])
+
+      # Write the links into the OUTPUT document
       self.errHandle.Status("Saving file: " + flOutput )
-      doc.save(filename = flOutput)
+      bRewrite = any(oEntity['aligned'] for oEntity in lEntities)
+      if not self.writeLinks(flInput, flOutput, oResolved['links'], sAnnotator, bRewrite, **kwargs):
+        return None
 
-      # Add the annotator information for this "nel2folia" conversion
-      doc.declare(folia.AnnotationType.ALIGNMENT, sAnnotator+"-NEL", **kwargs)
+      # all went well, so return an object with statistics
+      oStats = {'hit': oResolved['hit'], 'fail': oResolved['fail'], 'resolutions': oResolved['resolutions'],
+                'deferred': len(oResolved['deferred'])}
+      if oLog != None: oStats['stats'] = oLog.oStats
+      return oStats
+    except:
+      # act
+      self.errHandle.DoError("convert/addOneNelToFolia exception")
+      return None
 
-      # Initialize statistics
-      iHits = 0          # Statistics: number of hits
-      iFail = 0         # Statistics: number of failures
+  # ----------------------------------------------------------------------------------
+  # Name :    collect
+  # Goal :    Get the list of entity objects of [flInput] (see foliareader.entities)
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def collect(self, flInput):
+    try:
+      return list(self.reader.entities(flInput))
+    except:
+      self.errHandle.DoError("convert/collect: cannot read " + flInput)
+      return None
 
-      # Find and leaf through all the NER elements
-      for sentence in doc.sentences():
+  # ----------------------------------------------------------------------------------
+  # Name :    collectParts
+  # Goal :    Get the entity objects of [flInput] in at most [iParts] lists, one for
+  #           each part of consecutive sentences
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def collectParts(self, flInput, iParts):
+    try:
+      lFragments = self.index.fragments(flInput, iParts)
+      if lFragments == None: return None
+      return [list(self.reader.entitiesFromBytes(bData)) for bData in lFragments]
+    except:
+      self.errHandle.DoError("convert/collectParts: cannot read " + flInput)
+      return None
 
-          # =========== DEBUG ===========
-          x = str(sentence)
-          if "Nederlandse Bibliotheek Dienst" in x:
-              iStop = 1
-          # =============================
-
-          # visit the entity layer
-          for layer in sentence.select(folia.EntitiesLayer):
-
-              # visit all Entity elements
-              for entity in layer.select(folia.Entity):
-
-                  # Get the class of this entity
-                  entClass = entity.cls
-                  # Find all the words belonging to this entity
-                  sEntity = ""
-                  idStart = ""
-                  for word in entity.wrefs():
-                      # Combine the words of the entity into a string
-                      if sEntity != "": 
-                          sEntity = sEntity + " "
-                      else:
-                          # Note the start id of the entity
-                          idStart = word.id
-                      sEntity = sEntity + str(word)
-                  
-                  # Calculate the offset for this entity
-                  iOffset = 0
-                  sSent   = ""
-                  # Iterate over all the <w> *CHILDREN* of this <s>
-                  # words1 = list(sentence.select(folia.Word))
-                  # words2 = list(sentence.words())
-                  # words3 = list(sentence.select(folia.Word, None, False))
-                  for word in sentence.words():
-                      # Keep track of the sentence
-                      if sSent != "": sSent = sSent + " "
-                      # Note where the offset is
-                      if word.id == idStart: 
-                          iOffset = len(sSent)
-                      # Extend the sentence
-                      sSent = sSent + str(word)
-
-                  # Check and remove any existing alignments
-                  for alg in entity.select(folia.Alignment):
-                      alg.parent.remove(alg)
-
-                  # =========== DEBUG ===========
-                  if "Middellandse Zee" in sEntity:
-                      iStop = 1
-                      x = str(sentence)
-                  # =============================
-
-                  # We now have the whole entity and its class: add to a list of todo's
-                  oEntity = {"entity": sEntity, "class": entClass, "sent": sSent, "offset": str(iOffset), "id": sentence.id}
-                  # Calculate alignments for this entity
-                  oCombined = self.oneEntityToLinks(oEntity, sConfidence)
-                  # Make sure what we get back is okay
-                  if oCombined == None:
-                      # Do some error processing
-                      sId = sentence.id
-                      self.errHandle.DoError("convert/addOneNelToFolia: failed to create entity link in {}:{} ".format(
-                                             os.path.basename(flInput), sId))
-                      # Try to continue working...
-                  else:
-                      # Process the statistics
-                      iHits += oCombined['hit']
-                      iFail += oCombined['fail']
-                      # Store the resolution object
-                      lResolutions.append(oCombined['resolution'])
-                      # Get the list of alignments
-                      lResults = oCombined['results']
-                      # Walk the results
-                      for result in lResults:
-
-                          # Define an alignment layer for this result
-                          alignment = entity.append(folia.Alignment)
-                          alignment.cls = "NEL"     # Named Entity Link
-                          alignment.href = result['uri']
-                          alignment.type = "simple"
-                          # alignment.format = "application/rdf+xml"
-                          alignment.format = "application/json"
+  # ----------------------------------------------------------------------------------
+  # Name :    resolveParts
+  # Goal :    Resolve the entity lists of [lParts] at the same time, each in its own
+  #           thread with its own copy of this broker (the filter, strategy, archive,
+  #           caches and budget are shared), and combine the results as if they had
+  #           been resolved one after the other
+  #           This only holds when [oStrategy] is a snapshot (nelstrategy.frozen) and the
+  #           services give the same answers (as when an archive is replayed)
+  #           The log rows are written afterwards, in the order of the document
+  # History:
+  # 19/oct/2026    ERK Created
+  # 19/oct/2026    ERK Only the same as one after the other with a frozen strategy
+  # ----------------------------------------------------------------------------------
+  def resolveParts(self, lParts, sConfidence, oLog = None, sFile = "", oFilter = None, oPrune = None, oStrategy = None,
+                   oBudget = None):
+    oBudgetDoc = None if oBudget == None else oBudget.start()
+    with futures.ThreadPoolExecutor(max_workers=len(lParts)) as oPool:
+      lFutures = [oPool.submit(copy.copy(self).resolve, lPart, sConfidence, None, sFile, oFilter, oPrune,
+                               oStrategy, oBudget, oBudgetDoc) for lPart in lParts]
+      lResolved = [oFuture.result() for oFuture in lFutures]
+    oResolved = {'hit': 0, 'fail': 0, 'resolutions': [], 'links': {}, 'deferred': [], 'reason': ""}
+    for oPart in lResolved:
+      oResolved['hit'] += oPart['hit']
+      oResolved['fail'] += oPart['fail']
+      oResolved['resolutions'].extend(oPart['resolutions'])
+      oResolved['links'].update(oPart['links'])
+      oResolved['deferred'].extend(oPart['deferred'])
+      if oResolved['reason'] == "": oResolved['reason'] = oPart['reason']
+    if oLog != None:
+      for oResolution in oResolved['resolutions']:
+        oLog.add(sFile, oResolution)
+    return oResolved
 
+  # ----------------------------------------------------------------------------------
+  # Name :    resolve
+  # Goal :    Find the links of all entities in [lEntities]
+  #           With [oFilter], entities that cannot be linked are not sent to any service:
+  #           they count as one failure (method 'filter'); the others are normalized
+  #           With [oPrune] only the best candidates become alignments (see nelprune)
+  #           With [oBudget] the entities that are left when a budget is used up are
+  #           not resolved, but returned in 'deferred' (and the budget in 'reason');
+  #           [oBudgetDoc] is the budget of the document, when it is shared by parts
+  # Return:   Object with 'hit', 'fail', 'resolutions', 'deferred', 'reason' and 'links':
+  #             links[sentence id][entity number] = list of results
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def resolve(self, lEntities, sConfidence, oLog = None, sFile = "", oFilter = None, oPrune = None, oStrategy = None,
+              oBudget = None, oBudgetDoc = None):
+    oResolved = {'hit': 0, 'fail': 0, 'resolutions': [], 'links': {}, 'deferred': [], 'reason': ""}
+    if oBudgetDoc == None and oBudget != None: oBudgetDoc = oBudget.start()
+    self.oBudgetDoc = oBudgetDoc
+    try:
+      return self.resolveEntities(oResolved, lEntities, sConfidence, oLog, sFile, oFilter, oPrune, oStrategy, oBudget)
+    finally:
+      self.oBudgetDoc = None
+
+  # The loop of resolve, while the budget of the document is in self.oBudgetDoc
+  def resolveEntities(self, oResolved, lEntities, sConfidence, oLog, sFile, oFilter, oPrune, oStrategy, oBudget):
+    for (iEntity, oEntity) in enumerate(lEntities):
+      if oBudget != None:
+        sBudget = oBudget.exhausted(self.oBudgetDoc)
+        if sBudget != "":
+          oResolved['deferred'] = lEntities[iEntity:]
+          oResolved['reason'] = sBudget
+          break
+      oQuery = oEntity
+      if oFilter != None:
+        oQuery, sReason = oFilter.apply(oEntity)
+        if oQuery == None:
+          oResolution = oFilter.skipped(oEntity, sReason)
+          oResolved['fail'] += 1
+          oResolved['resolutions'].append(oResolution)
+          if oLog != None: oLog.add(sFile, oResolution)
+          continue
+      # Calculate alignments for this entity
+      oCombined = self.oneEntityToLinks(oQuery, sConfidence, oStrategy)
+      if oCombined != None and oQuery is not oEntity:
+        # The log and statistics show the entity as it is in the text
+        oResolution = oCombined['resolution']
+        oResolution['norm'] = oQuery['entity']
+        oResolution['entity'] = oEntity['entity']
+        oResolution['sent'] = oEntity['sent']
+      # Make sure what we get back is okay
+      if oCombined == None:
+        # Do some error processing
+        self.errHandle.DoError("convert/addOneNelToFolia: failed to create entity link in {}:{} ".format(
+                               sFile, oEntity['id']), sType='entity-link')
+        # Try to continue working...
+        continue
+      # Process the statistics
+      oResolved['hit'] += oCombined['hit']
+      oResolved['fail'] += oCombined['fail']
+      # Store the resolution object
+      oResolved['resolutions'].append(oCombined['resolution'])
+      # Log and count it straight away
+      if oLog != None: oLog.add(sFile, oCombined['resolution'])
+      # Keep the alignments, if there are any
+      lResults = oCombined['results']
+      if oPrune != None: lResults = oPrune.apply(lResults)
+      if len(lResults) > 0:
+        oSent = oResolved['links'].setdefault(oEntity['id'], {})
+        oSent[oEntity['num']] = lResults
+    return oResolved
 
+  # ----------------------------------------------------------------------------------
+  # Name :    writeLinks
+  # Goal :    Save [flInput] as [flOutput] with the alignments in [oLinks] (see resolve)
+  #           Existing alignments of entities are removed
+  #           If there is nothing to add or remove, the file is simply copied
+  # History:
+  # 28/sep/2016    ERK Created (as part of addOneNelToFolia)
+  # 19/oct/2026    ERK Separate method
+  # ----------------------------------------------------------------------------------
+  def writeLinks(self, flInput, flOutput, oLinks, sAnnotator, bRewrite = True, **kwargs):
+    try:
+      if len(oLinks) == 0 and not bRewrite:
+        if flInput.endswith(".gz") == flOutput.endswith(".gz"):
+          shutil.copyfile(flInput, flOutput)
+        else:
+          fOpen = gzip.open if flInput.endswith(".gz") else open
+          with fOpen(flInput, "rb") as fIn:
+            with (gzip.open(flOutput, "wb") if flOutput.endswith(".gz") else open(flOutput, "wb")) as fOut:
+              shutil.copyfileobj(fIn, fOut)
+        return True
+
+      # Load the indicated .folia.xml INPUT document
+      doc = folia.Document(file=flInput)
+      # Add the annotator information for this "nel2folia" conversion
+      doc.declare(folia.AnnotationType.ALIGNMENT, sAnnotator+"-NEL", **kwargs)
+
+      # Find and leaf through all the NER elements in the same order as foliareader
+      for sentence in doc.sentences():
+        oSent = oLinks.get(sentence.id, {})
+        iNum = 0
+        # visit the entity layer
+        for layer in sentence.select(folia.EntitiesLayer):
+          # visit all Entity elements
+          for entity in layer.select(folia.Entity):
+            # Check and remove any existing alignments
+            for alg in entity.select(folia.Alignment):
+              alg.parent.remove(alg)
+            # Walk the results
+            for result in oSent.get(iNum, []):
+              # Define an alignment layer for this result
+              alignment = entity.append(folia.Alignment)
+              alignment.cls = "NEL"     # Named Entity Link
+              alignment.href = result['uri']
+              alignment.type = "simple"
+              # alignment.format = "application/rdf+xml"
+              alignment.format = "application/json"
+            iNum += 1
 
       # Save the FoLiA document that has been created
       doc.save(filename = flOutput)
-      # all went well, so return an object with statistics
-      oStats = {'hit': iHits, 'fail': iFail, 'resolutions': lResolutions}
-      return oStats
+      return True
     except:
-      # act
-      self.errHandle.DoError("convert/addOneNelToFolia exception")
-      return None
+      self.errHandle.DoError("convert/writeLinks: cannot write " + flOutput)
+      return False
 
   # ----------------------------------------------------------------------------------
   # Name :    getAnnotatorType
@@ -249,13 +423,54 @@ class broker:
       self.errHandle.DoError("convert/getAnnotatorType exception")
       return  folia.AnnotatorType.UNSET
 
+  # ----------------------------------------------------------------------------------
+  # Name :    requestTimeout
+  # Goal :    The timeout of a remote request: capped by what is left of the budget
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def requestTimeout(self):
+      if self.oBudgetDoc == None: return nelbudget.REQUEST_TIMEOUT
+      return self.oBudgetDoc['budget'].timeout(self.oBudgetDoc)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    negativePut
+  # Goal :    Remember in self.negcache that [oEntity] gave nothing ([sKind])
+  #           Not while replaying an archive: a miss there says nothing about the service
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def negativePut(self, oEntity, sConfidence, sKind):
+      if self.negcache == None: return
+      if self.archive != None and self.archive.sMode != "record": return
+      self.negcache.put(oEntity, sConfidence, sKind)
+
   # ----------------------------------------------------------------------------------
   # Name :    oneSpotlightRequest
   # Goal :    Make an annotate or disambiguate request to spotlight
+  #           With self.archive the request is recorded or replayed (see nelarchive)
+  #           The request counts for the budget of the document
   # History:
-  # 17/oct/2016    ERK Created
+  # 19/oct/2026    ERK Created (the request itself is in spotlightRequest)
   # ----------------------------------------------------------------------------------
   def oneSpotlightRequest(self, sReqType, oEntity, sConfidence):
+      if self.oBudgetDoc != None: self.oBudgetDoc['budget'].request(self.oBudgetDoc)
+      if self.archive == None:
+          return self.spotlightRequest(sReqType, oEntity, sConfidence)
+      return self.archive.call('spotlight', sReqType, oEntity, sConfidence, self.spotlightRequest)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    spotlightRequest
+  # Goal :    Make an annotate or disambiguate request to spotlight
+  #           With self.endpoints the request goes to a pool of replicas
+  # History:
+  # 17/oct/2016    ERK Created
+  # 19/oct/2026    ERK Pool of replicas (endpoints.py)
+  # 19/oct/2026    ERK Timeout capped by the budget
+  # 19/oct/2026    ERK The text fallback has a timeout and counts for the budget
+  # 19/oct/2026    ERK A read timeout is a failure of the request
+  # ----------------------------------------------------------------------------------
+  def spotlightRequest(self, sReqType, oEntity, sConfidence):
       oResult = {}
       data = ""
 
@@ -323,30 +538,39 @@ class broker:
       oPost = {'Accept':'application/json', 
                'Content-Type': 'application/x-www-form-urlencoded'}
       req = urllib.request.Request(strUrl, headers=oPost, data=data, method='POST')
+      if self.endpoints != None: strUrl = self.endpoints.url(sReqType)
       
       try:
           # Perform the actual request to the URL
-          # POST method: 
-          with urllib.request.urlopen(req, timeout = 20) as response:
-          # GET method:
-          # with urllib.request.urlopen(req, timeout = 20) as response:
-              # Get the response as a text
-              sResult = response.read().decode('utf-8')
-              # First check the result myself
-              if sResult == "" or sResult[:1] != "{":
-                  # The result is empty, or at least not JSON
-                  oResult = {}
-              else:
-                  # Convert the response text to an object, interpreting it as JSON
-                  oResult = json.loads(sResult)
+          if self.endpoints == None:
+              # POST method: 
+              with urllib.request.urlopen(req, timeout = self.requestTimeout()) as response:
+              # GET method:
+              # with urllib.request.urlopen(req, timeout = 20) as response:
+                  # Get the response as a text
+                  sResult = response.read().decode('utf-8')
+          else:
+              # Spread over the replicas, with a hedge for slow ones
+              sResult = self.endpoints.post(sReqType, data, oPost, self.requestTimeout())
+          # First check the result myself
+          if sResult == "" or sResult[:1] != "{":
+              # The result is empty, or at least not JSON
+              oResult = {}
+          else:
+              # Convert the response text to an object, interpreting it as JSON
+              oResult = json.loads(sResult)
       except urllib.error.URLError as e:
+          # This happens for many entities at once when a service is down: rate-limited
           self.errHandle.Status('URLopen URL error: {}\n{}\ndata: {}\n url: {}\n'.format(
-              e.reason, str(sXmlPost), str(data), strUrl))
-          # Perform a text request
+              e.reason, str(sXmlPost), str(data), strUrl), 'url-error', util.LEVEL_WARNING)
+          # Perform a text request, unless the budget is used up; it counts as a request as well
+          if self.oBudgetDoc != None:
+              if self.oBudgetDoc['budget'].exhausted(self.oBudgetDoc) != "": return None
+              self.oBudgetDoc['budget'].request(self.oBudgetDoc)
           oPost['Accept'] = 'text/html'
           req = urllib.request.Request(strUrl, headers=oPost, data=data, method='POST')
           try:
-              with urllib.request.urlopen(req) as response:
+              with urllib.request.urlopen(req, timeout = self.requestTimeout()) as response:
                   sResult = response.read().decode('utf-8')
                   # The result is HTML, and we are looking for an <a tag and then the href="" inside that tag
                   match = re.search(r"(href=['\"]?)([^'\"]+)", sResult)
@@ -361,13 +585,15 @@ class broker:
                                                 '@percentageOfSecondRank': '0.0'}]}
           except:
               description = sys.exc_info()[1]
-              self.errHandle.DoError(description)      
+              self.errHandle.DoError(description, sType='url-fallback')
               return None
       except urllib.error.HTTPError as e:
           self.errHandle.DoError('URLopen HTTP error: {}\n{}'.format(e.code, str(sXmlPost)))
           return None
       except socket.timeout as e:
-          self.errHandle.DoError('URLopen timeout error: {}\n{}'.format(e.code, str(sXmlPost)))
+          # The service took longer than the (budget-capped) timeout: a normal failure
+          self.errHandle.Status('URLopen timeout error: {}\n{}'.format(str(e), str(sXmlPost)),
+                                'timeout', util.LEVEL_WARNING)
           return None
       except:
           description = sys.exc_info()[1]
@@ -378,11 +604,29 @@ class broker:
 
   # ----------------------------------------------------------------------------------
   # Name :    oneLotusRequest
+  # Goal :    Make a request to the Lotus/LOD Laundromat
+  #           With self.archive the request is recorded or replayed (see nelarchive)
+  #           The request counts for the budget of the document
+  # History:
+  # 19/oct/2026    ERK Created (the request itself is in lotusRequest)
+  # ----------------------------------------------------------------------------------
+  def oneLotusRequest(self, oEntity, sConfidence = None):
+      if self.oBudgetDoc != None: self.oBudgetDoc['budget'].request(self.oBudgetDoc)
+      if self.archive == None:
+          return self.lotusRequest(oEntity, sConfidence)
+      return self.archive.call('lotus', 'retrieve', oEntity, sConfidence,
+                               lambda sReqType, oEntity, sConfidence: self.lotusRequest(oEntity, sConfidence))
+
+  # ----------------------------------------------------------------------------------
+  # Name :    lotusRequest
   # Goal :    Make an annotate or disambiguate request to the Lotus/LOD Laundromat
   # History:
   # 2/nov/2016    ERK Created
+  # 19/oct/2026    ERK Timeout capped by the budget
+  # 19/oct/2026    ERK The text fallback has a timeout and counts for the budget
+  # 19/oct/2026    ERK A read timeout is a failure of the request
   # ----------------------------------------------------------------------------------
-  def oneLotusRequest(self, oEntity, sConfidence = None):
+  def lotusRequest(self, oEntity, sConfidence = None):
       oResult = {}
       data = ""
 
@@ -404,7 +648,7 @@ class broker:
       try:
           # Perform the actual request to the URL
           # POST method: 
-          with urllib.request.urlopen(req, timeout = 20) as response:
+          with urllib.request.urlopen(req, timeout = self.requestTimeout()) as response:
           # GET method:
           # with urllib.request.urlopen(req, timeout = 20) as response:
               # Get the response as a text
@@ -417,13 +661,17 @@ class broker:
                   # Convert the response text to an object, interpreting it as JSON
                   oResult = json.loads(sResult)
       except urllib.error.URLError as e:
+          # This happens for many entities at once when a service is down: rate-limited
           self.errHandle.Status('URLopen URL error: {}\n{}\ndata: {}\n url: {}\n'.format(
-              e.reason, str(sXmlPost), str(data), strUrl))
-          # Perform a text request
+              e.reason, oEntity['entity'], str(data), strUrl), 'url-error', util.LEVEL_WARNING)
+          # Perform a text request, unless the budget is used up; it counts as a request as well
+          if self.oBudgetDoc != None:
+              if self.oBudgetDoc['budget'].exhausted(self.oBudgetDoc) != "": return None
+              self.oBudgetDoc['budget'].request(self.oBudgetDoc)
           oPost['Accept'] = 'text/html'
           req = urllib.request.Request(strUrl, headers=oPost, data=data, method='POST')
           try:
-              with urllib.request.urlopen(req) as response:
+              with urllib.request.urlopen(req, timeout = self.requestTimeout()) as response:
                   sResult = response.read().decode('utf-8')
                   # The result is HTML, and we are looking for an <a tag and then the href="" inside that tag
                   match = re.search(r"(href=['\"]?)([^'\"]+)", sResult)
@@ -438,13 +686,15 @@ class broker:
                                                 '@percentageOfSecondRank': '0.0'}]}
           except:
               description = sys.exc_info()[1]
-              self.errHandle.DoError(description)      
+              self.errHandle.DoError(description, sType='url-fallback')
               return None
       except urllib.error.HTTPError as e:
-          self.errHandle.DoError('URLopen HTTP error: {}\n{}'.format(e.code, str(sXmlPost)))
+          self.errHandle.DoError('URLopen HTTP error: {}\n{}'.format(e.code, oEntity['entity']))
           return None
       except socket.timeout as e:
-          self.errHandle.DoError('URLopen timeout error: {}\n{}'.format(e.code, str(sXmlPost)))
+          # The service took longer than the (budget-capped) timeout: a normal failure
+          self.errHandle.Status('URLopen timeout error: {}\n{}'.format(str(e), oEntity['entity']),
+                                'timeout', util.LEVEL_WARNING)
           return None
       except:
           description = sys.exc_info()[1]
@@ -457,10 +707,19 @@ class broker:
   # ----------------------------------------------------------------------------------
   # Name :    oneEntityToLinks
   # Goal :    Get a list of possibilities to which one entity can be linked
+  #           The Spotlight request types are tried in the order [oStrategy] gives
+  #           for the class of the entity (without it: disambiguate, then annotate);
+  #           only requests that the service answered are recorded in [oStrategy]
+  #           With self.negcache, an entity that gave nothing before is not requested:
+  #           an empty one gets an empty resolution (request 'negcache'), a failed one None
   # History:
   # 10/oct/2016    ERK Created
+  # 19/oct/2026    ERK Order of request types from nelstrategy
+  # 19/oct/2026    ERK Negative cache
+  # 19/oct/2026    ERK Only answered requests count for the strategy
+  # 19/oct/2026    ERK Nothing goes into the negative cache while replaying
   # ----------------------------------------------------------------------------------
-  def oneEntityToLinks(self, oEntity, sConfidence):
+  def oneEntityToLinks(self, oEntity, sConfidence, oStrategy = None):
       oCombined = None  # Combination of results and statistics
       lResults = []     # List of results: will be put into [oCombined]
       lItems = []       # List of all items: hits and failures
@@ -476,18 +735,36 @@ class broker:
                          'id': oEntity['id'],
                          'request': 'disambiguate' }
 
+          # Did this entity give nothing before?
+          sNegative = "" if self.negcache == None else self.negcache.get(oEntity, sConfidence)
+          if sNegative == 'error':
+              return None
+          elif sNegative == 'empty':
+              oResolution['request'] = 'negcache'
+              lMethods = []
+
           # Walk all methods
           for sMethod in lMethods:
 
               if sMethod == 'spotlight':
-                  # Try making a disambiguation SPOTLIGHT request
-                  oResult = self.oneSpotlightRequest('disambiguate', oEntity, sConfidence)
-                  if oResult == None or not 'Resources' in oResult:
-                      # Second try: annotation request
-                      oResult = self.oneSpotlightRequest('annotate', oEntity, sConfidence)
-                      if oResult == None:
-                          return None
-                      oResolution['request'] = 'annotate'
+                  # Try the SPOTLIGHT request types until one gives resources
+                  if oStrategy == None:
+                      lTypes = nelstrategy.REQUEST_TYPES
+                  else:
+                      # Where the entity is in the document decides whether a skipped type is explored
+                      sWhere = "{}/{}".format(oEntity['id'], oEntity.get('num', ""))
+                      lTypes = oStrategy.order(oEntity['class'], sWhere)
+                  for (iTry, sReqType) in enumerate(lTypes):
+                      oResult = self.oneSpotlightRequest(sReqType, oEntity, sConfidence)
+                      oResolution['request'] = sReqType
+                      bSuccess = (oResult != None and 'Resources' in oResult)
+                      # A request that failed (or is not in the archive) says nothing about the request type
+                      if oStrategy != None and oResult != None:
+                          oStrategy.record(oEntity['class'], sReqType, iTry, bSuccess)
+                      if bSuccess: break
+                  if oResult == None:
+                      self.negativePut(oEntity, sConfidence, 'error')
+                      return None
 
                   # Have any resources been found?
                   if 'Resources' in oResult:
@@ -558,6 +835,9 @@ class broker:
 
                   # Try process the results
 
+          # Remember entities without any resources
+          if sNegative == "" and len(lItems) == 0:
+              self.negativePut(oEntity, sConfidence, 'empty')
           # Add the list of items to the resolution object
           oResolution['items'] = lItems
           oResolution['hit']   = iHits
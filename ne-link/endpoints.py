@@ -0,0 +1,219 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import time
+import math
+import threading
+import collections
+import urllib.request
+import urllib.error
+from concurrent import futures
+
+# ----------------------------------------------------------------------------------
+# Name :    endpoints
+# Goal :    A pool of Spotlight replicas, each given by its base url (e.g.
+#           http://host:2222/rest); requests go to <base>/annotate and <base>/disambiguate
+#           - a request goes to the healthy replica with the fewest outstanding requests
+#           - a replica that fails [iFailLimit] times in a row is left alone for [iCooldown]
+#             seconds; a health check thread looks every [iInterval] seconds whether
+#             such replicas answer again
+#           - a request that takes longer than the [fHedge] percentile of the recent
+#             latencies is sent to a second replica as well; the first answer counts.
+#             A request that fails is sent to a second replica straight away
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class endpoints:
+  """Load balancing and hedged requests over Spotlight replicas"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, lBases, fHedge = 0.9, iMinSamples = 20, iFailLimit = 3,
+               iCooldown = 30, iInterval = 10):
+    # Set the error handler
+    self.errHandle = oErr
+    self.lEnd = [{'base': x.rstrip("/"), 'outstanding': 0, 'requests': 0, 'errors': 0,
+                  'fails': 0, 'down': 0.0, 'times': collections.deque(maxlen=500)} for x in lBases]
+    if len(self.lEnd) == 0: raise ValueError("endpoints: no replicas given")
+    self.fHedge = fHedge
+    self.iMinSamples = iMinSamples
+    self.iFailLimit = iFailLimit
+    self.iCooldown = iCooldown
+    self.oLock = threading.Lock()
+    # Recent latencies of all replicas, for the hedging delay
+    self.lTimes = collections.deque(maxlen=500)
+    self.oCount = {'hedged': 0, 'hedgewins': 0, 'failover': 0}
+    # The requests themselves run in these threads, so that a hedge can be started
+    self.oPool = futures.ThreadPoolExecutor(max_workers=8 * len(self.lEnd) + 8)
+    # Health checks of replicas that are down
+    self.iInterval = iInterval
+    if iInterval > 0 and len(self.lEnd) > 1:
+      threading.Thread(target=self.healthLoop, name="endpoints-health", daemon=True).start()
+
+  # ----------------------------------------------------------------------------------
+  # Name :    fromSpec
+  # Goal :    Make a pool from a comma-separated list of base urls
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  @staticmethod
+  def fromSpec(oErr, sSpec, **kwargs):
+    lBases = [x.strip() for x in sSpec.split(",") if x.strip() != ""]
+    return endpoints(oErr, lBases, **kwargs)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    pick
+  # Goal :    The healthy replica with the fewest outstanding requests (not in [lSkip])
+  #           If all replicas are down, the one that went down first is tried anyway
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def pick(self, lSkip = []):
+    with self.oLock:
+      fNow = time.time()
+      lFree = [x for x in self.lEnd if not any(x is y for y in lSkip)]
+      if len(lFree) == 0: return None
+      lUp = [x for x in lFree if x['down'] <= fNow]
+      if len(lUp) > 0:
+        # With equal load, the replica that had the fewest requests goes first
+        oEnd = min(lUp, key=lambda x: (x['outstanding'], x['requests']))
+      else:
+        oEnd = min(lFree, key=lambda x: x['down'])
+      oEnd['outstanding'] += 1
+      oEnd['requests'] += 1
+      return oEnd
+
+  # The url of [sReqType] at the replica that pick() would give now, without using it
+  def url(self, sReqType):
+    with self.oLock:
+      fNow = time.time()
+      lUp = [x for x in self.lEnd if x['down'] <= fNow] or self.lEnd
+      return min(lUp, key=lambda x: (x['outstanding'], x['requests']))['base'] + "/" + sReqType
+
+  # The hedging delay in seconds, or None as long as there are too few latencies
+  def hedgeDelay(self):
+    with self.oLock:
+      if len(self.lTimes) < self.iMinSamples: return None
+      return percentile(self.lTimes, self.fHedge)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    send
+  # Goal :    POST [data] to replica [oEnd] (already counted as outstanding by pick)
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def send(self, oEnd, sReqType, data, oHeaders, iTimeout):
+    fStart = time.perf_counter()
+    bHealthy = True
+    try:
+      req = urllib.request.Request(oEnd['base'] + "/" + sReqType, headers=oHeaders, data=data, method='POST')
+      with urllib.request.urlopen(req, timeout = iTimeout) as response:
+        sResult = response.read().decode('utf-8')
+      return sResult
+    except urllib.error.HTTPError as e:
+      # The replica answers, but a server error still counts against its health
+      bHealthy = (e.code < 500)
+      raise
+    except:
+      bHealthy = False
+      raise
+    finally:
+      fTime = time.perf_counter() - fStart
+      with self.oLock:
+        oEnd['outstanding'] -= 1
+        if bHealthy:
+          oEnd['fails'] = 0
+          oEnd['times'].append(fTime)
+          self.lTimes.append(fTime)
+        else:
+          oEnd['errors'] += 1
+          oEnd['fails'] += 1
+          if oEnd['fails'] >= self.iFailLimit:
+            oEnd['down'] = time.time() + self.iCooldown
+
+  # ----------------------------------------------------------------------------------
+  # Name :    post
+  # Goal :    Send one Spotlight request of type [sReqType] to the pool
+  # Return:   The text of the answer; if no replica answers, the last exception is raised
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def post(self, sReqType, data, oHeaders, iTimeout = 20):
+    oFirst = self.pick()
+    lTried = [oFirst]
+    oRunning = {self.oPool.submit(self.send, oFirst, sReqType, data, oHeaders, iTimeout): oFirst}
+    setPending = set(oRunning)
+    fDelay = self.hedgeDelay()
+    bSecond = False
+    sSecond = ""
+    oError = None
+    while len(setPending) > 0:
+      setDone, setPending = futures.wait(setPending, timeout=None if bSecond else fDelay,
+                                         return_when=futures.FIRST_COMPLETED)
+      bFailed = False
+      for oFuture in setDone:
+        try:
+          sResult = oFuture.result()
+          if sSecond == 'hedged' and not oRunning[oFuture] is oFirst:
+            with self.oLock: self.oCount['hedgewins'] += 1
+          return sResult
+        except Exception as e:
+          oError = e
+          bFailed = True
+      # Too slow or failed: try a second replica
+      if not bSecond and (bFailed or len(setDone) == 0):
+        bSecond = True
+        oNext = self.pick(lTried)
+        if oNext != None:
+          lTried.append(oNext)
+          sSecond = 'failover' if bFailed else 'hedged'
+          with self.oLock: self.oCount[sSecond] += 1
+          oFuture = self.oPool.submit(self.send, oNext, sReqType, data, oHeaders, iTimeout)
+          oRunning[oFuture] = oNext
+          setPending.add(oFuture)
+    raise oError
+
+  # ----------------------------------------------------------------------------------
+  # Name :    healthLoop
+  # Goal :    Bring replicas that are down back as soon as they answer again
+  #           Any HTTP answer on the base url counts as alive
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def healthLoop(self):
+    while True:
+      time.sleep(self.iInterval)
+      for oEnd in self.lEnd:
+        if oEnd['down'] <= time.time(): continue
+        bAlive = True
+        try:
+          with urllib.request.urlopen(oEnd['base'], timeout = 5) as response:
+            response.read()
+        except urllib.error.HTTPError as e:
+          bAlive = (e.code < 500)
+        except:
+          bAlive = False
+        if bAlive:
+          with self.oLock:
+            oEnd['down'] = 0.0
+            oEnd['fails'] = 0
+
+  def report(self):
+    with self.oLock:
+      lParts = ["{} requests={} errors={} p50={} p99={}".format(
+                  x['base'], x['requests'], x['errors'], ms(percentile(x['times'], 0.5)),
+                  ms(percentile(x['times'], 0.99))) for x in self.lEnd]
+      lParts.append("hedged={hedged} hedgewins={hedgewins} failover={failover}".format(**self.oCount))
+    return "endpoints: " + "; ".join(lParts)
+
+
+# The [fPerc] percentile (nearest rank) of [lTimes], or None
+def percentile(lTimes, fPerc):
+  lSorted = sorted(lTimes)
+  if len(lSorted) == 0: return None
+  return lSorted[max(1, int(math.ceil(fPerc * len(lSorted)))) - 1]
+
+def ms(fTime):
+  return "-" if fTime == None else "{:.0f}ms".format(fTime * 1000)
@@ -0,0 +1,148 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import gzip
+import io
+from lxml import etree
+
+# ----------------------------------------------------------------------------------
+FOLIA_NS = "{http://ilk.uvt.nl/folia}"
+# Elements whose contents pynlpl also skips when it selects words and entities
+IGNORE_TAGS = set(FOLIA_NS + x for x in ["original", "suggestion", "alternative", "altlayers"])
+
+# ----------------------------------------------------------------------------------
+# Name :    foliareader
+# Goal :    Fast reading of the named entities in a FoLiA file, directly with lxml
+#           Only <s>, the text of its <w> elements and <entities>/<entity>/<wref>
+#           are looked at; every sentence is cleared from memory once it has been read.
+#           The entities come out in the order in which pynlpl finds them with
+#           doc.sentences() / sentence.select(EntitiesLayer) / layer.select(Entity)
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class foliareader:
+  """Fast reader of FoLiA entities"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr):
+    # Set the error handler
+    self.errHandle = oErr
+
+  # ----------------------------------------------------------------------------------
+  # Name :    entities
+  # Goal :    Walk all entities of [flInput] (.folia.xml or .folia.xml.gz)
+  #           Yields one object per entity:
+  #             entity  - the words of the entity, separated by spaces
+  #             class   - the class of the entity
+  #             sent    - the words of the sentence, separated by spaces
+  #             offset  - the position of the entity in [sent] (a string)
+  #             id      - the id of the sentence
+  #             num     - the number of the entity within the sentence (from 0)
+  #             aligned - True if the entity already has alignments
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def entities(self, flInput):
+    if flInput.endswith(".gz"):
+      fIn = gzip.open(flInput, "rb")
+    else:
+      fIn = open(flInput, "rb")
+    try:
+      for oEntity in self.walk(fIn):
+        yield oEntity
+    finally:
+      fIn.close()
+
+  # The same for a part of a document in memory (see sentindex.fragments)
+  def entitiesFromBytes(self, bData):
+    return self.walk(io.BytesIO(bData))
+
+  # ----------------------------------------------------------------------------------
+  # Name :    walk
+  # Goal :    Walk the sentences of the open file [fIn] and yield their entities
+  # History:
+  # 19/oct/2026    ERK Created (from entities)
+  # ----------------------------------------------------------------------------------
+  def walk(self, fIn):
+    for ev, sentence in etree.iterparse(fIn, events=("end",), tag=FOLIA_NS + "s", huge_tree=True):
+      if self.ignored(sentence): continue
+      for oEntity in self.sentenceEntities(sentence):
+        yield oEntity
+      # A sentence inside another one is read again with the outer one
+      if self.hasAncestor(sentence, FOLIA_NS + "s"): continue
+      # Free the memory of what has been read
+      sentence.clear(keep_tail=True)
+      while sentence.getprevious() is not None:
+        del sentence.getparent()[0]
+
+  # ----------------------------------------------------------------------------------
+  # Name :    sentenceEntities
+  # Goal :    Get the entities of one <s> element
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def sentenceEntities(self, sentence):
+    lEntities = []
+    sSentId = sentence.get("{http://www.w3.org/XML/1998/namespace}id", "")
+    # The words of the sentence, their text and their offset in the sentence
+    oOffset = {}
+    oText = {}
+    lWords = []
+    iLength = 0
+    for word in sentence.iter(FOLIA_NS + "w"):
+      if self.ignored(word, sentence): continue
+      sId = word.get("{http://www.w3.org/XML/1998/namespace}id", "")
+      sWord = self.wordText(word)
+      if len(lWords) > 0: iLength += 1
+      oOffset[sId] = iLength
+      oText[sId] = sWord
+      lWords.append(sWord)
+      iLength += len(sWord)
+    sSent = " ".join(lWords)
+    # The entities of the sentence
+    iNum = 0
+    for layer in sentence.iter(FOLIA_NS + "entities"):
+      if self.ignored(layer, sentence): continue
+      for entity in layer.iter(FOLIA_NS + "entity"):
+        if self.ignored(entity, layer): continue
+        lEntity = []
+        iOffset = 0
+        for iRef, wref in enumerate(entity.iter(FOLIA_NS + "wref")):
+          sId = wref.get("id", "")
+          if iRef == 0: iOffset = oOffset.get(sId, 0)
+          lEntity.append(oText.get(sId, wref.get("t", "")))
+        bAligned = (entity.find(FOLIA_NS + "alignment") is not None)
+        lEntities.append({"entity": " ".join(lEntity), "class": entity.get("class"), "sent": sSent,
+                          "offset": str(iOffset), "id": sSentId, "num": iNum, "aligned": bAligned})
+        iNum += 1
+    return lEntities
+
+  # ----------------------------------------------------------------------------------
+  # Name :    wordText
+  # Goal :    The text of a <w>: its <t> without a class or with class "current"
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def wordText(self, word):
+    for t in word.iterchildren(FOLIA_NS + "t"):
+      if t.get("class", "current") == "current":
+        return "".join(t.itertext())
+    return ""
+
+  # Is [el] inside an element that pynlpl skips (below [top])?
+  def ignored(self, el, top = None):
+    el = el.getparent()
+    while el is not None and el is not top:
+      if el.tag in IGNORE_TAGS: return True
+      el = el.getparent()
+    return False
+
+  def hasAncestor(self, el, sTag):
+    el = el.getparent()
+    while el is not None:
+      if el.tag == sTag: return True
+      el = el.getparent()
+    return False
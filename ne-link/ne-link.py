@@ -7,6 +7,14 @@
 import sys, getopt, os.path, importlib
 import util
 import convert
+import nellog
+import nelfilter
+import nelprune
+import nelstrategy
+import endpoints
+import nelarchive
+import negcache
+import nelbudget
 import json
 
 # ============================= LOCAL VARIABLES ====================================
@@ -23,17 +31,28 @@ def main(prgName, argv) :
   flOutput = ''       # output file name
   sAnnotator = ""     # If specified
   flStat = 'nel2folia-stats.json'         # Location of the statistics file that is produced (optional argument)
+  bLog = False        # Write a .folia.log file next to every output file
+  flFilter = ''       # JSON configuration of the entity filter (optional)
+  sPrune = ''         # Pruning of the alignments, e.g. "top=3,score=0.5" (optional)
+  flRates = ''        # Success rates of the request types, kept between runs (optional)
+  sEndpoints = ''     # Comma-separated base urls of Spotlight replicas (optional)
+  flArchive = ''      # Archive to record the remote requests in, or to replay them from (optional)
+  sMode = 'record'    # What to do with the archive: record, replay or replay-latency
+  flNegative = ''     # Negative cache of entities that gave nothing (optional)
+  sBudget = ''        # Time and request budgets, e.g. "doctime=60,runtime=3600" (optional)
+  flRetry = ''        # Retry queue for the entities that did not fit in the budget (optional)
+  iParts = 1          # Number of parts of a document that are linked at the same time
 
   try:
     # Adapt the program name to exclude the directory
     index = prgName.rfind("\\")
     if (index > 0) :
       prgName = prgName[index+1:]
-    sSyntax = prgName + ' [-a <annotator>] [-s <statfile>] -i <inputfile> -o <outputfile>'
+    sSyntax = prgName + ' [-a <annotator>] [-s <statfile>] [-l] [-f <filter.json>] [-p <top=k,score=x,support=n,second=y>] [-r <rates.json>] [-e <spotlight base url>,...] [-c <archive.db> [-m record|replay|replay-latency]] [-g <negcache.db>] [-b <doctime=s,docrequests=n,runtime=s,runrequests=n> [-d <retry.jsonl>]] [-w <parts per document>] -i <inputfile> -o <outputfile>'
     # get all the arguments
     try:
       # Get arguments and options
-      opts, args = getopt.getopt(argv, "ha:s:i:o:", ["-annotator","-statfile=","-inputfile=","-outputfile="])
+      opts, args = getopt.getopt(argv, "ha:s:lf:p:r:e:c:m:g:b:d:w:i:o:", ["-annotator","-statfile=","-log","-filter=","-prune=","-rates=","-endpoints=","-archive=","-mode=","-negcache=","-budget=","-retry=","-parts=","-inputfile=","-outputfile="])
     except getopt.GetoptError:
       print(sSyntax)
       sys.exit(2)
@@ -46,6 +65,28 @@ def main(prgName, argv) :
         sAnnotator = arg
       elif opt in ("-s", "--sfile"):
         flStat = arg
+      elif opt in ("-l", "--log"):
+        bLog = True
+      elif opt in ("-f", "--filter"):
+        flFilter = arg
+      elif opt in ("-p", "--prune"):
+        sPrune = arg
+      elif opt in ("-r", "--rates"):
+        flRates = arg
+      elif opt in ("-e", "--endpoints"):
+        sEndpoints = arg
+      elif opt in ("-c", "--archive"):
+        flArchive = arg
+      elif opt in ("-m", "--mode"):
+        sMode = arg
+      elif opt in ("-g", "--negcache"):
+        flNegative = arg
+      elif opt in ("-b", "--budget"):
+        sBudget = arg
+      elif opt in ("-d", "--retry"):
+        flRetry = arg
+      elif opt in ("-w", "--parts"):
+        iParts = int(arg)
       elif opt in ("-i", "--ifile"):
         flInput = arg
       elif opt in ("-o", "--ofile"):
@@ -58,7 +99,8 @@ def main(prgName, argv) :
     errHandle.Status('Output is "' + flOutput + '"')
     errHandle.Status('Statistics: "' + flStat + '"')
     # Call the function that converst input into output
-    if (nel2folia(flInput, flOutput, flStat, sAnnotator)) :
+    if (nel2folia(flInput, flOutput, flStat, sAnnotator, bLog, flFilter, sPrune, flRates, sEndpoints,
+                   flArchive, sMode, flNegative, sBudget, flRetry, iParts)) :
       errHandle.Status("Ready")
     else :
       errHandle.DoError("Could not complete")
@@ -71,10 +113,31 @@ def main(prgName, argv) :
 # ----------------------------------------------------------------------------------
 # Name :    nel2folia
 # Goal :    Link named entities 
+#           With [bLog] every output X.folia.xml gets an X.folia.log for ne-stat
+#           [flFilter] is a JSON file with settings for nelfilter
+#           [sPrune] says which alignments to keep (see nelprune.fromSpec)
+#           [flRates] keeps the success rates of the request types (see nelstrategy)
+#           [sEndpoints] lists Spotlight replicas to spread the requests over (see endpoints)
+#           [flArchive] records or replays ([sMode]) the remote requests (see nelarchive)
+#           [flNegative] keeps the entities that gave nothing (see negcache)
+#           [sBudget] limits time and requests; what is left goes to [flRetry] (see nelbudget)
+#           [iParts] > 1 links that many parts of every document at the same time (see sentindex)
 # History:
 # 28/sep/2016    ERK Created
+# 19/oct/2026    ERK Optional .folia.log output and statistics
+# 19/oct/2026    ERK Entity filter settings
+# 19/oct/2026    ERK Alignment pruning
+# 19/oct/2026    ERK Adaptive request strategy
+# 19/oct/2026    ERK Spotlight replicas
+# 19/oct/2026    ERK Record and replay
+# 19/oct/2026    ERK Negative cache
+# 19/oct/2026    ERK Budgets
+# 19/oct/2026    ERK Parts of a document at the same time
+# 19/oct/2026    ERK Close and save also after an error
 # ----------------------------------------------------------------------------------
-def nel2folia(flInput, flOutput, flStat, sAnnotator):
+def nel2folia(flInput, flOutput, flStat, sAnnotator, bLog = False, flFilter = '', sPrune = '', flRates = '',
+              sEndpoints = '', flArchive = '', sMode = 'record', flNegative = '', sBudget = '', flRetry = '',
+              iParts = 1):
   bDoAsk = False                  # Local variable
   arInput = []                    # Array of input files
   arOutput = []                   # Array of output files
@@ -82,11 +145,19 @@ def nel2folia(flInput, flOutput, flStat, sAnnotator):
   iFail = 0                       # Statistics: number of failures
   iDocs = 0                       # Number of documents
   lStats = []                     # List of all resolutions
-  oConv = convert.convert(errHandle)      # Object that handles the conversion
+  oLogStats = {}                  # Statistics in the format of ne-stat (with [bLog])
+  oConv = convert.broker(errHandle)       # Object that handles the conversion
 
   try:
     # Create a kwargs information object to be passed on
-    info = {"annotator": sAnnotator}
+    info = {"annotator": sAnnotator, "parts": iParts}
+    oConv.filter = nelfilter.nelfilter(errHandle, flFilter)
+    oConv.prune = nelprune.nelprune.fromSpec(errHandle, sPrune)
+    oConv.strategy = nelstrategy.nelstrategy(errHandle, flRates)
+    if sEndpoints != '': oConv.endpoints = endpoints.endpoints.fromSpec(errHandle, sEndpoints)
+    if flArchive != '': oConv.archive = nelarchive.nelarchive(errHandle, flArchive, sMode)
+    if flNegative != '': oConv.negcache = negcache.negcache(errHandle, flNegative)
+    if sBudget != '': oConv.budget = nelbudget.nelbudget.fromSpec(errHandle, sBudget, flRetry)
     # Validate: does flInput exist?
     if (os.path.isfile(flInput)) : 
       # The input is one file
@@ -118,7 +189,14 @@ def nel2folia(flInput, flOutput, flStat, sAnnotator):
     # Perform the conversion in the Conversion module
     for index in range(len(arInput)):
       # Perform conversion of this file
-      oBack = oConv.addOneNelToFolia(arInput[index], arOutput[index], bDoAsk, **info)
+      if bLog:
+        # The log rows are written while the entities are being resolved
+        with open(os.path.splitext(arOutput[index])[0] + ".log", "w", encoding="utf-8") as fLog:
+          info['log'] = nellog.nellog(errHandle, fLog)
+          oBack = oConv.addOneNelToFolia(arInput[index], arOutput[index], bDoAsk, **info)
+        if oBack != None: nellog.nellog.merge(oLogStats, oBack['stats'])
+      else:
+        oBack = oConv.addOneNelToFolia(arInput[index], arOutput[index], bDoAsk, **info)
       if oBack == None:
         # Signal there was an error
         errHandle.DoError("nel2folia conversion error in " + os.path.basename(arInput[index]))
@@ -128,7 +206,7 @@ def nel2folia(flInput, flOutput, flStat, sAnnotator):
       iFail += oBack['fail']
       iDocs += 1
       lStats.append({'doc': os.path.basename(arInput[index]),
-                     'resolutions': oBack['resolutions']})
+                     'resolutions': oBack['resolutions'], 'deferred': oBack['deferred']})
       # Perform validation of the output file that has been produced
       if (not oConv.doValidate(arOutput[index])):
         # Signal there was an error
@@ -138,6 +216,8 @@ def nel2folia(flInput, flOutput, flStat, sAnnotator):
     # Provide statistics
     errHandle.Status("nel2folia: hits={}, fail={}, docs={}".format(
                      iHit, iFail, iDocs))
+    if bLog:
+      errHandle.Status("ne-stat counts: " + json.dumps(oLogStats))
     # Save the statistics in a .json file
     with open(flStat, 'w') as outfile:
         json.dump(lStats, outfile, indent=2)
@@ -147,6 +227,26 @@ def nel2folia(flInput, flOutput, flStat, sAnnotator):
     # act
     errHandle.DoError("nel2folia")
     return False
+  finally:
+    # Also after an error: what was recorded and learned so far is kept
+    try:
+      errHandle.Status(oConv.filter.report())
+      if oConv.prune.active():
+        errHandle.Status(oConv.prune.report())
+      errHandle.Status(oConv.strategy.report())
+      if oConv.endpoints != None:
+        errHandle.Status(oConv.endpoints.report())
+      if oConv.archive != None:
+        oConv.archive.close()
+        errHandle.Status(oConv.archive.report())
+      if oConv.negcache != None:
+        oConv.negcache.close()
+        errHandle.Status(oConv.negcache.report())
+      if oConv.budget != None:
+        errHandle.Status(oConv.budget.report())
+      oConv.strategy.save()
+    except:
+      errHandle.DoError("nel2folia: closing")
 
 
 
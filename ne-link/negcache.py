@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# How long (seconds) an entity is not asked for again, after
+NEGCACHE_TTL_EMPTY = 7 * 24 * 3600      # ... the services found nothing
+NEGCACHE_TTL_ERROR = 10 * 60            # ... the request failed (HTTP or URL error)
+
+# ----------------------------------------------------------------------------------
+# Name :    negcache
+# Goal :    Remember the entities for which linking gave nothing, so that they are
+#           not sent to the services again on every occurrence and every run
+#             empty - no service had any Resources for the entity
+#             error - the requests failed
+#           Each kind has its own time to live; the entries are kept in an SQLite file
+#           The key is the entity, its class and the confidence
+#           Stores are committed per [iCommit] and on close()
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Commit in batches
+# ----------------------------------------------------------------------------------
+class negcache:
+  """Persistent negative cache of entity resolutions"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, flCache, iTtlEmpty = NEGCACHE_TTL_EMPTY, iTtlError = NEGCACHE_TTL_ERROR, iCommit = 200):
+    # Set the error handler
+    self.errHandle = oErr
+    self.oTtl = {'empty': iTtlEmpty, 'error': iTtlError}
+    self.iCommit = iCommit
+    self.iUncommitted = 0
+    # The linkers of the pipeline share one cache
+    self.oLock = threading.Lock()
+    self.oConn = sqlite3.connect(flCache, check_same_thread=False)
+    self.oConn.execute("PRAGMA journal_mode=WAL")
+    self.oConn.execute("CREATE TABLE IF NOT EXISTS negative (key TEXT PRIMARY KEY, kind TEXT, expires REAL)")
+    self.oCount = {'hit_empty': 0, 'hit_error': 0, 'miss': 0, 'stored_empty': 0, 'stored_error': 0}
+
+  def key(self, oEntity, sConfidence):
+    sKey = json.dumps([oEntity['entity'], oEntity['class'], sConfidence], ensure_ascii=False)
+    return hashlib.sha256(sKey.encode('utf-8')).hexdigest()
+
+  # ----------------------------------------------------------------------------------
+  # Name :    get
+  # Goal :    'empty' or 'error' if [oEntity] is in the cache and has not expired, else ""
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def get(self, oEntity, sConfidence):
+    sKey = self.key(oEntity, sConfidence)
+    with self.oLock:
+      row = self.oConn.execute("SELECT kind, expires FROM negative WHERE key=?", (sKey,)).fetchone()
+      if row != None and row[1] < time.time():
+        self.oConn.execute("DELETE FROM negative WHERE key=?", (sKey,))
+        row = None
+      if row == None:
+        self.oCount['miss'] += 1
+        return ""
+      self.oCount['hit_' + row[0]] += 1
+      return row[0]
+
+  # ----------------------------------------------------------------------------------
+  # Name :    put
+  # Goal :    Remember that [oEntity] gave nothing ([sKind] is 'empty' or 'error')
+  # History:
+  # 19/oct/2026    ERK Created
+  # 19/oct/2026    ERK Commit per [iCommit] stores
+  # ----------------------------------------------------------------------------------
+  def put(self, oEntity, sConfidence, sKind):
+    if self.oTtl[sKind] <= 0: return
+    with self.oLock:
+      self.oConn.execute("INSERT OR REPLACE INTO negative VALUES (?, ?, ?)",
+                         (self.key(oEntity, sConfidence), sKind, time.time() + self.oTtl[sKind]))
+      self.oCount['stored_' + sKind] += 1
+      self.iUncommitted += 1
+      if self.iUncommitted >= self.iCommit:
+        self.oConn.commit()
+        self.iUncommitted = 0
+
+  def close(self):
+    with self.oLock:
+      self.oConn.commit()
+      self.oConn.close()
+
+  def report(self):
+    oCount = self.oCount
+    iHits = oCount['hit_empty'] + oCount['hit_error']
+    iAll = iHits + oCount['miss']
+    sRate = "-" if iAll == 0 else "{:.1f}%".format(100 * iHits / iAll)
+    return "negcache: hit rate {} ".format(sRate) + " ".join("{}={}".format(k, v) for (k, v) in oCount.items())
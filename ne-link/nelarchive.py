@@ -0,0 +1,108 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import threading
+
+# ----------------------------------------------------------------------------------
+# Name :    nelarchive
+# Goal :    Record the requests to Spotlight and Lotus with their answers and latency,
+#           and replay them later on, so that runs of ne-link can be repeated exactly
+#           and benchmarked without the network
+#           The archive is an SQLite file with one row per distinct request:
+#             key      - sha256 of the request (service, type, entity, sentence, offset, confidence)
+#             service, reqtype
+#             request  - the request as zlib-compressed JSON
+#             response - the answer as zlib-compressed JSON (NULL: the request failed)
+#             latency  - seconds the request took
+#           Modes:
+#             record         - do the requests and store them
+#             replay         - answer from the archive; a request that is not there fails
+#             replay-latency - the same, but wait as long as the recorded request took
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class nelarchive:
+  """Record and replay of remote linking requests"""
+  lModes = ["record", "replay", "replay-latency"]
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, flArchive, sMode = "record", iCommit = 200):
+    # Set the error handler
+    self.errHandle = oErr
+    if not sMode in self.lModes:
+      raise ValueError("nelarchive: unknown mode " + sMode)
+    if sMode != "record" and not os.path.isfile(flArchive):
+      raise ValueError("nelarchive: archive not found " + flArchive)
+    self.sMode = sMode
+    self.iCommit = iCommit
+    self.iUncommitted = 0
+    # The linkers of the pipeline share one archive
+    self.oLock = threading.Lock()
+    self.oConn = sqlite3.connect(flArchive, check_same_thread=False)
+    self.oConn.execute("PRAGMA journal_mode=WAL")
+    self.oConn.execute("CREATE TABLE IF NOT EXISTS calls (key TEXT PRIMARY KEY, service TEXT, reqtype TEXT, "
+                       "request BLOB, response BLOB, latency REAL, created REAL)")
+    self.oCount = {'recorded': 0, 'replayed': 0, 'missing': 0}
+
+  def key(self, oRequest):
+    return hashlib.sha256(json.dumps(oRequest, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+  # ----------------------------------------------------------------------------------
+  # Name :    call
+  # Goal :    Do one request through the archive
+  #           [fnRequest](sReqType, oEntity, sConfidence) makes the real request
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def call(self, sService, sReqType, oEntity, sConfidence, fnRequest):
+    # Only what goes into the request decides the answer
+    oRequest = {'service': sService, 'reqtype': sReqType, 'entity': oEntity['entity'],
+                'confidence': sConfidence}
+    if sReqType == 'disambiguate':
+      oRequest['sent'] = oEntity['sent']
+      oRequest['offset'] = oEntity['offset']
+    sKey = self.key(oRequest)
+
+    if self.sMode != "record":
+      with self.oLock:
+        row = self.oConn.execute("SELECT response, latency FROM calls WHERE key=?", (sKey,)).fetchone()
+        self.oCount['replayed' if row != None else 'missing'] += 1
+      if row == None:
+        self.errHandle.Status("nelarchive: not in the archive: {} {} {}".format(
+          sService, sReqType, oEntity['entity']), 'archive-miss', util.LEVEL_WARNING)
+        return None
+      if self.sMode == "replay-latency": time.sleep(row[1])
+      return None if row[0] == None else json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    fStart = time.perf_counter()
+    oResult = fnRequest(sReqType, oEntity, sConfidence)
+    fLatency = time.perf_counter() - fStart
+    bResponse = None
+    if oResult != None:
+      bResponse = zlib.compress(json.dumps(oResult, ensure_ascii=False).encode('utf-8'))
+    bRequest = zlib.compress(json.dumps(oRequest, ensure_ascii=False).encode('utf-8'))
+    with self.oLock:
+      self.oConn.execute("INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (sKey, sService, sReqType, bRequest, bResponse, fLatency, time.time()))
+      self.oCount['recorded'] += 1
+      self.iUncommitted += 1
+      if self.iUncommitted >= self.iCommit:
+        self.oConn.commit()
+        self.iUncommitted = 0
+    return oResult
+
+  def close(self):
+    with self.oLock:
+      self.oConn.commit()
+      self.oConn.close()
+
+  def report(self):
+    return "nelarchive ({}): ".format(self.sMode) + " ".join("{}={}".format(k, v) for (k, v) in self.oCount.items())
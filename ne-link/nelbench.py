@@ -0,0 +1,261 @@
+# ==========================================================================================================
+# Name :    nelbench
+# Goal :    Benchmark the reading of named entities from FoLiA files:
+#           the pynlpl object model (how addOneNelToFolia used to do it) against foliareader
+#           Without input files, a large synthetic document is made with the stand-in of foliaselect
+#           Also checks that the rows nellog writes are read back by nelstats (ne-stat) with
+#           the same counts, and that a request that times out ends up in the negative cache
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Round trip of the .folia.log rows
+# 19/oct/2026    ERK Timeouts in the negative cache
+# ==========================================================================================================
+import sys, getopt, os.path
+import util
+import foliareader
+import nellog
+import json
+import time
+import gzip
+import tempfile
+import shutil
+import socket
+import threading
+from pynlpl.formats import folia
+
+# The stand-in and nelstats live in the sibling directories
+sBase = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sDir in ("foliaselect", "ne-stat"):
+  if not os.path.join(sBase, sDir) in sys.path: sys.path.append(os.path.join(sBase, sDir))
+
+# ============================= LOCAL VARIABLES ====================================
+errHandle = util.ErrHandle()
+
+# ----------------------------------------------------------------------------------
+# Name :    main
+# Goal :    Main body of the function
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def main(prgName, argv) :
+  lInput = []
+  kwargs = {}
+
+  try:
+    # Adapt the program name to exclude the directory (for windows)
+    index = prgName.rfind("\\")
+    if (index > 0) :
+      prgName = prgName[index+1:]
+    sSyntax = prgName + ' [-i <input .folia.xml[.gz]>]... [-s <KB of synthetic document>] [-r <repeats>] [-o <resultfile>]'
+    # get all the arguments
+    try:
+      # Get arguments and options
+      opts, args = getopt.getopt(argv, "hi:s:r:o:", ["-inputfile=", "-size=", "-repeats=", "-output="])
+    except getopt.GetoptError:
+      print(sSyntax)
+      sys.exit(2)
+    # Walk all the arguments
+    for opt, arg in opts:
+      if opt == '-h':
+        print(sSyntax)
+        sys.exit(0)
+      elif opt in ("-i", "--inputfile"):
+        lInput.append(arg)
+      elif opt in ("-s", "--size"):
+        kwargs['size'] = int(arg)
+      elif opt in ("-r", "--repeats"):
+        kwargs['repeats'] = int(arg)
+      elif opt in ("-o", "--output"):
+        kwargs['result'] = arg
+    if benchmark(lInput, **kwargs):
+      errHandle.Status("Ready")
+    else:
+      errHandle.DoError("Could not complete")
+  except SystemExit:
+    raise
+  except:
+    # Show the error to the user
+    errHandle.DoError("main")
+    return False
+
+# ----------------------------------------------------------------------------------
+# Name :    pynlplEntities
+# Goal :    Read the entities with pynlpl, the way addOneNelToFolia did before foliareader
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def pynlplEntities(flInput):
+  lEntities = []
+  doc = folia.Document(file=flInput)
+  for sentence in doc.sentences():
+    iNum = 0
+    for layer in sentence.select(folia.EntitiesLayer):
+      for entity in layer.select(folia.Entity):
+        lWords = list(entity.wrefs())
+        idStart = lWords[0].id if len(lWords) > 0 else ""
+        sEntity = " ".join(str(word) for word in lWords)
+        iOffset = 0
+        sSent = ""
+        for word in sentence.words():
+          if sSent != "": sSent = sSent + " "
+          if word.id == idStart: iOffset = len(sSent)
+          sSent = sSent + str(word)
+        lEntities.append({"entity": sEntity, "class": entity.cls, "sent": sSent, "offset": str(iOffset),
+                          "id": sentence.id, "num": iNum})
+        iNum += 1
+  return lEntities
+
+# ----------------------------------------------------------------------------------
+# Name :    timeIt
+# Goal :    Best time out of [iRepeats] runs of fnRead(flInput), plus its result
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def timeIt(fnRead, flInput, iRepeats):
+  fBest = None
+  lResult = []
+  for i in range(iRepeats):
+    fStart = time.perf_counter()
+    lResult = fnRead(flInput)
+    fTime = time.perf_counter() - fStart
+    if fBest == None or fTime < fBest: fBest = fTime
+  return fBest, lResult
+
+# ----------------------------------------------------------------------------------
+# Name :    logCheck
+# Goal :    Write resolutions with awkward entities (quotes, tabs, line separators) through
+#           nellog into [flLog], read the file back with nelstats (at once and with tail)
+#           and compare the counts with those of nellog
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def logCheck(flLog):
+  import nelstats
+  lEntities = ['"Jan de Wit', 'Jan "de" Wit"', "tab\there", "line\nbreak", "carriage\rreturn",
+               "sep\u2028ar\x85ator", "Batavia", "'s-Gravenhage", "\"\"", ""]
+  lResolutions = []
+  for (iNum, sEntity) in enumerate(lEntities):
+    lItems = []
+    if iNum % 3 != 2:
+      lItems.append({'hit': iNum % 2 == 0, 'uri': 'http://x/"' + str(iNum), 'form': sEntity, 'classmatch': 'true',
+                     'support': str(iNum), 'offset': '0', 'similarityScore': '1.0', 'percentageOfSecondRank': '0.0'})
+    lResolutions.append({'id': "s." + str(iNum // 2), 'class': ['per', 'loc'][iNum % 2], 'entity': sEntity,
+                         'request': 'annotate', 'items': lItems})
+  with open(flLog, "w", encoding="utf-8") as fLog:
+    oLog = nellog.nellog(errHandle, fLog)
+    for oResolution in lResolutions:
+      oLog.add("check.folia.xml", oResolution)
+  oStats = nelstats.nelstats(errHandle)
+  oRead = oStats.treat(flLog)
+  oTail = oStats.tail(flLog)
+  bSame = (oRead == oLog.oStats and oTail != None and oTail['stats'] == oLog.oStats)
+  print("logcheck: rows={} same={}".format(oTail['new'] if oTail != None else "-", bSame))
+  return bSame
+
+# ----------------------------------------------------------------------------------
+# Name :    negcacheCheck
+# Goal :    Link one entity against a local service that accepts and never answers:
+#           the request must time out and the entity must be stored as 'error' in
+#           a negative cache in [sTmpDir]; replaying an (empty) archive must store nothing
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def negcacheCheck(sTmpDir):
+  import convert, negcache, nelbudget, nelarchive
+  lHeld = []
+  oServer = socket.socket()
+  oServer.bind(("127.0.0.1", 0))
+  oServer.listen(20)
+  def accept():
+    try:
+      while True: lHeld.append(oServer.accept()[0])
+    except OSError:
+      pass
+  threading.Thread(target=accept, daemon=True).start()
+  sUrl = "http://127.0.0.1:{}/rest".format(oServer.getsockname()[1])
+  lSaved = [convert.SPOTLIGHT_REQUEST, convert.SPOTLIGHT_DISAMBI, convert.LOTUS_REQUEST]
+  oEntity = {'entity': 'Batavia', 'class': 'loc', 'sent': 'Naar Batavia', 'offset': '5', 'id': 's.1'}
+  try:
+    convert.SPOTLIGHT_REQUEST = convert.SPOTLIGHT_DISAMBI = convert.LOTUS_REQUEST = sUrl
+    oConv = convert.broker(errHandle)
+    oConv.endpoints = None
+    oConv.negcache = negcache.negcache(errHandle, os.path.join(sTmpDir, "check.negcache.db"))
+    oBudget = nelbudget.nelbudget.fromSpec(errHandle, "doctime=1")
+    oConv.oBudgetDoc = oBudget.start()
+    oResult = oConv.oneEntityToLinks(oEntity, convert.SPOTLIGHT_CONFIDENCE)
+    bStored = (oResult == None and oConv.negcache.get(oEntity, convert.SPOTLIGHT_CONFIDENCE) == 'error')
+    # A miss while replaying is not a failure of the service
+    flArchive = os.path.join(sTmpDir, "check.archive.db")
+    nelarchive.nelarchive(errHandle, flArchive).close()
+    oConv.archive = nelarchive.nelarchive(errHandle, flArchive, "replay")
+    oEntity = dict(oEntity, entity='Soerabaja')
+    oResult = oConv.oneEntityToLinks(oEntity, convert.SPOTLIGHT_CONFIDENCE)
+    bReplay = (oResult == None and oConv.negcache.get(oEntity, convert.SPOTLIGHT_CONFIDENCE) == "")
+    oConv.archive.close()
+    oConv.negcache.close()
+    print("negcachecheck: timeout stored={} replay stored nothing={}".format(bStored, bReplay))
+    return bStored and bReplay
+  finally:
+    (convert.SPOTLIGHT_REQUEST, convert.SPOTLIGHT_DISAMBI, convert.LOTUS_REQUEST) = lSaved
+    oServer.close()
+    for oConn in lHeld: oConn.close()
+
+# ----------------------------------------------------------------------------------
+# Name :    benchmark
+# Goal :    Time both readers on every input file and check they find the same entities
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Check the .folia.log round trip as well
+# 19/oct/2026    ERK Check that timeouts are stored in the negative cache
+# ----------------------------------------------------------------------------------
+def benchmark(lInput, **kwargs):
+  sTmpDir = None
+
+  try:
+    iRepeats = kwargs.get('repeats', 3)
+    oReader = foliareader.foliareader(errHandle)
+    if len(lInput) == 0:
+      import standin
+      sTmpDir = tempfile.mkdtemp(prefix="nelbench-")
+      flInput = os.path.join(sTmpDir, "bench.folia.xml")
+      with open(flInput, "wb") as fOut:
+        fOut.write(gzip.decompress(standin.makeFolia("nelbench", kwargs.get('size', 5000))))
+      lInput = [flInput]
+
+    lResult = []
+    for flInput in lInput:
+      errHandle.Status("Reading " + flInput)
+      fPynlpl, lPynlpl = timeIt(pynlplEntities, flInput, iRepeats)
+      fReader, lReader = timeIt(lambda x: list(oReader.entities(x)), flInput, iRepeats)
+      # Both should give the same entities
+      lCheck = [{k: v for (k, v) in x.items() if k != 'aligned'} for x in lReader]
+      oResult = {'file': os.path.basename(flInput), 'kb': round(os.path.getsize(flInput) / 1024),
+                 'entities': len(lReader), 'same': lCheck == lPynlpl,
+                 'pynlpl_sec': round(fPynlpl, 3), 'reader_sec': round(fReader, 3),
+                 'speedup': round(fPynlpl / max(fReader, 1e-9), 1)}
+      print("\t".join("{}={}".format(k, v) for (k, v) in oResult.items()))
+      lResult.append(oResult)
+    if sTmpDir == None: sTmpDir = tempfile.mkdtemp(prefix="nelbench-")
+    if not logCheck(os.path.join(sTmpDir, "check.folia.log")):
+      errHandle.DoError("nellog rows are not read back the same by nelstats")
+      return False
+    if not negcacheCheck(sTmpDir):
+      errHandle.DoError("a timed-out request is not stored as 'error' in the negative cache")
+      return False
+    if 'result' in kwargs:
+      with open(kwargs['result'], "w") as fOut:
+        json.dump(lResult, fOut, indent=2)
+    return True
+  except:
+    errHandle.DoError("benchmark")
+    return False
+  finally:
+    if sTmpDir != None: shutil.rmtree(sTmpDir, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------------------
+# Goal :  If user calls this as main, then follow up on it
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+  # Call the main function with two arguments: program name + remainder
+  main(sys.argv[0], sys.argv[1:])
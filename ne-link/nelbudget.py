@@ -0,0 +1,125 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import json
+import time
+import threading
+
+# The timeout of one request when no budget is tighter
+REQUEST_TIMEOUT = 20
+
+# ----------------------------------------------------------------------------------
+# Name :    nelbudget
+# Goal :    Limit the time and the number of remote requests spent on linking
+#             doctime     - seconds per document
+#             docrequests - requests per document
+#             runtime     - seconds for the whole run
+#             runrequests - requests for the whole run
+#           (0 = no limit). When a budget is used up, the remaining entities of the
+#           document are deferred: they are not resolved, and written to the retry
+#           queue [flRetry] (JSON lines, one line per document) so that they can be
+#           done later. The document itself is still written
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class nelbudget:
+  """Time and request budgets for linking"""
+  lKeys = ["doctime", "docrequests", "runtime", "runrequests"]
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, flRetry = None, **limits):
+    # Set the error handler
+    self.errHandle = oErr
+    for sKey in limits:
+      if not sKey in self.lKeys: raise ValueError("Unknown budget: " + sKey)
+    self.oLimit = {k: float(limits.get(k, 0)) for k in self.lKeys}
+    self.flRetry = flRetry
+    # The linkers of the pipeline share the run budget
+    self.oLock = threading.Lock()
+    self.fStart = time.time()
+    self.iRequests = 0
+    self.oCount = {'documents': 0, 'cut': 0, 'deferred': 0, 'reasons': {}}
+
+  # ----------------------------------------------------------------------------------
+  # Name :    fromSpec
+  # Goal :    Make a budget from a specification like "doctime=60,runrequests=10000"
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  @staticmethod
+  def fromSpec(oErr, sSpec, flRetry = None):
+    oArgs = {}
+    for sPart in sSpec.split(","):
+      if sPart.strip() == "": continue
+      sKey, sValue = sPart.split("=", 1)
+      oArgs[sKey.strip()] = sValue.strip()
+    return nelbudget(oErr, flRetry, **oArgs)
+
+  # The budget object of one document
+  def start(self):
+    with self.oLock:
+      self.oCount['documents'] += 1
+    return {'start': time.time(), 'requests': 0, 'budget': self}
+
+  # Count one remote request for document [oDoc]
+  def request(self, oDoc):
+    with self.oLock:
+      oDoc['requests'] += 1
+      self.iRequests += 1
+
+  # ----------------------------------------------------------------------------------
+  # Name :    exhausted
+  # Goal :    The name of the budget that [oDoc] has used up, or ""
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def exhausted(self, oDoc):
+    fNow = time.time()
+    oLimit = self.oLimit
+    if oLimit['doctime'] > 0 and fNow - oDoc['start'] >= oLimit['doctime']: return "doctime"
+    if oLimit['docrequests'] > 0 and oDoc['requests'] >= oLimit['docrequests']: return "docrequests"
+    if oLimit['runtime'] > 0 and fNow - self.fStart >= oLimit['runtime']: return "runtime"
+    if oLimit['runrequests'] > 0 and self.iRequests >= oLimit['runrequests']: return "runrequests"
+    return ""
+
+  # ----------------------------------------------------------------------------------
+  # Name :    timeout
+  # Goal :    The timeout for the next request: [fDefault], but not longer than the
+  #           time that is left (at least one second)
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def timeout(self, oDoc, fDefault = REQUEST_TIMEOUT):
+    fNow = time.time()
+    fTimeout = fDefault
+    if oDoc != None and self.oLimit['doctime'] > 0:
+      fTimeout = min(fTimeout, self.oLimit['doctime'] - (fNow - oDoc['start']))
+    if self.oLimit['runtime'] > 0:
+      fTimeout = min(fTimeout, self.oLimit['runtime'] - (fNow - self.fStart))
+    return max(1.0, fTimeout)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    defer
+  # Goal :    Put the entities [lEntities] of a document on the retry queue
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def defer(self, flInput, flOutput, lEntities, sReason):
+    with self.oLock:
+      self.oCount['cut'] += 1
+      self.oCount['deferred'] += len(lEntities)
+      self.oCount['reasons'][sReason] = self.oCount['reasons'].get(sReason, 0) + 1
+      if self.flRetry == None or self.flRetry == "": return
+      oRetry = {'input': flInput, 'output': flOutput, 'reason': sReason,
+                'entities': [{k: x[k] for k in ('id', 'num', 'entity', 'class')} for x in lEntities]}
+      with open(self.flRetry, "a", encoding="utf-8") as fOut:
+        fOut.write(json.dumps(oRetry, ensure_ascii=False) + "\n")
+
+  def report(self):
+    with self.oLock:
+      oCount = self.oCount
+      return "nelbudget: documents={} cut short={} deferred entities={} requests={} {}".format(
+        oCount['documents'], oCount['cut'], oCount['deferred'], self.iRequests, json.dumps(oCount['reasons']))
@@ -0,0 +1,166 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import re
+import json
+import unicodedata
+import threading
+
+# ----------------------------------------------------------------------------------
+# The settings of the filter; a JSON configuration file may change any of them
+# By default nothing is skipped or changed: the filter only does something when a
+# configuration (ne-link -f) switches rules on, for example
+#   {"punct": true, "numeral": true, "minlength": 2, "noise": true, "whitespace": true}
+#   punct       - skip entities that consist of punctuation only
+#   numeral     - skip entities that consist of digits (and punctuation) only
+#   minlength   - skip entities with fewer letters/digits than this
+#   noise       - skip OCR noise: too few letters, long runs of one character,
+#                 long words without vowels
+#   whitespace  - collapse runs of whitespace and strip the entity
+#   case        - "upper": write ALL CAPS entities as Capitalized Words; "" = leave as is
+#   diacritics  - remove diacritics
+#   spelling    - map from (lower case) historic word forms to modern ones
+#   rewrite     - list of [regex, replacement] applied to every word
+# ----------------------------------------------------------------------------------
+FILTER_DEFAULTS = {"punct": False, "numeral": False, "minlength": 0, "noise": False,
+                   "whitespace": False, "case": "", "diacritics": False,
+                   "spelling": {}, "rewrite": []}
+
+# ----------------------------------------------------------------------------------
+# Name :    nelfilter
+# Goal :    Filter and normalize entities before they are resolved
+#           Entities that cannot be linked are skipped (their resolution is a failure
+#           with request 'filter'); the others get a normalized surface form, and the
+#           sentence is adapted so that the disambiguation still finds it at its offset
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class nelfilter:
+  """Rules to skip and normalize named entities"""
+  patPunct = re.compile(r"^[\s\.\,\?\!\'\"\`\;\:\-\(\)\[\]\/\\\*\&\%\$\#\@\+\=\_\|\~\^]*$")
+  patNumeral = re.compile(r"^[\d\s\.\,\-\/\:]*$")
+  patRun = re.compile(r"(.)\1\1\1")
+  patSpace = re.compile(r"\s+")
+  sVowels = "aeiouy"
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, flConfig = None, **options):
+    # Set the error handler
+    self.errHandle = oErr
+    self.oSettings = dict(FILTER_DEFAULTS)
+    if flConfig != None and flConfig != "":
+      with open(flConfig, "r", encoding="utf-8") as fIn:
+        self.oSettings.update(json.load(fIn))
+    self.oSettings.update(options)
+    self.oSpelling = {k.lower(): v for (k, v) in self.oSettings['spelling'].items()}
+    self.lRewrite = [(re.compile(x), y) for (x, y) in self.oSettings['rewrite']]
+    # Statistics (the parts of a document are filtered at the same time)
+    self.oLock = threading.Lock()
+    self.oCount = {'checked': 0, 'skipped': {}, 'normalized': 0}
+
+  # ----------------------------------------------------------------------------------
+  # Name :    skip
+  # Goal :    The reason why [sEntity] cannot be linked, or "" if it can
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def skip(self, sEntity):
+    oSet = self.oSettings
+    if oSet['punct'] and self.patPunct.match(sEntity): return "punct"
+    if oSet['numeral'] and self.patNumeral.match(sEntity): return "numeral"
+    lChars = [c for c in sEntity if c.isalnum()]
+    if len(lChars) < oSet['minlength']: return "minlength"
+    if oSet['noise']:
+      sBare = "".join(c for c in sEntity if not c.isspace())
+      iLetters = sum(1 for c in sBare if c.isalpha())
+      if iLetters * 2 < len(sBare): return "noise"
+      if self.patRun.search(sEntity): return "noise"
+      for sWord in sEntity.split():
+        if len(sWord) >= 5 and sWord.isalpha() and \
+           not any(c in self.sVowels for c in self.stripDiacritics(sWord.lower())):
+          return "noise"
+    return ""
+
+  # ----------------------------------------------------------------------------------
+  # Name :    normalize
+  # Goal :    The normalized surface form of [sEntity]
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def normalize(self, sEntity):
+    oSet = self.oSettings
+    if oSet['whitespace']:
+      sEntity = self.patSpace.sub(" ", sEntity).strip()
+    if oSet['case'] == "upper" and sEntity.isupper() and len(sEntity) > 3:
+      sEntity = " ".join(x.capitalize() for x in sEntity.split(" "))
+    if len(self.oSpelling) > 0 or len(self.lRewrite) > 0:
+      lWords = []
+      for sWord in sEntity.split(" "):
+        sNew = self.oSpelling.get(sWord.lower())
+        if sNew != None:
+          # Keep the capital of the original word
+          if sWord[:1].isupper(): sNew = sNew[:1].upper() + sNew[1:]
+          sWord = sNew
+        for (patThis, sReplace) in self.lRewrite:
+          sWord = patThis.sub(sReplace, sWord)
+        lWords.append(sWord)
+      sEntity = " ".join(lWords)
+    if oSet['diacritics']:
+      sEntity = self.stripDiacritics(sEntity)
+    return sEntity
+
+  def stripDiacritics(self, sText):
+    return "".join(c for c in unicodedata.normalize("NFKD", sText) if not unicodedata.combining(c))
+
+  # ----------------------------------------------------------------------------------
+  # Name :    apply
+  # Goal :    Filter and normalize one entity object (see foliareader)
+  # Return:   (None, reason) if the entity is skipped
+  #           (entity, "") otherwise; if the surface form changed, this is a copy
+  #           with the new 'entity' and the adapted 'sent'
+  # History:
+  # 19/oct/2026    ERK Created
+  # 19/oct/2026    ERK Count under a lock
+  # ----------------------------------------------------------------------------------
+  def apply(self, oEntity):
+    sEntity = oEntity['entity']
+    sReason = self.skip(sEntity)
+    sNorm = sEntity if sReason != "" else self.normalize(sEntity)
+    with self.oLock:
+      self.oCount['checked'] += 1
+      if sReason != "":
+        self.oCount['skipped'][sReason] = self.oCount['skipped'].get(sReason, 0) + 1
+      elif sNorm != sEntity:
+        self.oCount['normalized'] += 1
+    if sReason != "": return None, sReason
+    if sNorm == sEntity: return oEntity, ""
+    oNew = dict(oEntity)
+    oNew['entity'] = sNorm
+    # Put the new form into the sentence at the same place
+    iOffset = int(oEntity['offset']) + len(sEntity) - len(sEntity.lstrip())
+    sOld = sEntity.strip()
+    sSent = oEntity['sent']
+    if sSent[iOffset:iOffset + len(sOld)] == sOld:
+      oNew['sent'] = sSent[:iOffset] + sNorm + sSent[iOffset + len(sOld):]
+      oNew['offset'] = str(iOffset)
+    return oNew, ""
+
+  # ----------------------------------------------------------------------------------
+  # Name :    skipped
+  # Goal :    The resolution object of a skipped entity: a failure without items
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def skipped(self, oEntity, sReason):
+    return {'entity': oEntity['entity'], 'class': oEntity['class'], 'sent': oEntity['sent'],
+            'id': oEntity['id'], 'request': 'filter', 'reason': sReason,
+            'items': [], 'hit': 0, 'fail': 1}
+
+  def report(self):
+    oCount = self.oCount
+    iSkipped = sum(oCount['skipped'].values())
+    return "nelfilter: checked={}, skipped={} {}, normalized={}".format(
+      oCount['checked'], iSkipped, json.dumps(oCount['skipped']), oCount['normalized'])
@@ -0,0 +1,122 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import csv
+
+# ----------------------------------------------------------------------------------
+# Name :    nellog
+# Goal :    Write the resolution of every entity as rows in the .folia.log format,
+#           the format that ne-stat reads (14 columns, tab-separated, quoted the way
+#           csv.reader of nelstats expects it):
+#             file, sentId, class, entity, hit, service, method, URI, form,
+#             classmatch, support, offset, similarity, 2ndOfRank
+#           At the same time the rows are counted the way ne-stat counts them
+#           (see nelstats.treatRows), so that the statistics are there without
+#           reading the log again
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class nellog:
+  """Log rows and running statistics of named-entity linking"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, fOut = None):
+    # Set the error handler
+    self.errHandle = oErr
+    # Where the rows go to (any object with a write() method), or None
+    self.fOut = fOut
+    self.wOut = None if fOut == None else csv.writer(fOut, delimiter="\t", lineterminator="\n")
+    # Statistics in the format of nelstats
+    self.oStats = {'ne': 0}
+    # The previous row, needed to skip doubles, like nelstats does
+    self.oState = {'file': "", 'sent': "", 'entity': "", 'service': "", 'method': "", 'first': ""}
+
+  # ----------------------------------------------------------------------------------
+  # Name :    rows
+  # Goal :    Convert one resolution object into rows
+  #           Hits come first; an entity without any items gets one failure row
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def rows(self, sFile, oResolution, sService = "spotlight"):
+    lFirst = [sFile, oResolution['id'], oResolution['class'], oResolution['entity']]
+    sMethod = oResolution['request']
+    lItems = oResolution['items']
+    if len(lItems) == 0:
+      return [lFirst + ['false', sService, sMethod, '', '', '', '', '', '', '']]
+    lRows = []
+    for oItem in [x for x in lItems if x['hit']] + [x for x in lItems if not x['hit']]:
+      lRows.append(lFirst + ['true' if oItem['hit'] else 'false', sService, sMethod,
+                             oItem['uri'], oItem['form'], oItem['classmatch'], oItem['support'],
+                             oItem['offset'], oItem['similarityScore'], oItem['percentageOfSecondRank']])
+    return lRows
+
+  # ----------------------------------------------------------------------------------
+  # Name :    add
+  # Goal :    Write and count the rows of one resolution
+  # History:
+  # 19/oct/2026    ERK Created
+  # 19/oct/2026    ERK Write with csv.writer, so that a quote in an entity is read back
+  # ----------------------------------------------------------------------------------
+  def add(self, sFile, oResolution):
+    lRows = self.rows(sFile, oResolution)
+    if self.wOut != None:
+      for lRow in lRows:
+        # One row is one line: nelstats.tail reads the log line by line
+        self.wOut.writerow([str(x).replace("\t", " ").replace("\r", " ").replace("\n", " ") for x in lRow])
+    self.count(lRows)
+    return lRows
+
+  # ----------------------------------------------------------------------------------
+  # Name :    count
+  # Goal :    Add the rows to the statistics, exactly like nelstats.treatRows:
+  #           consecutive rows for the same file, sentence, entity, service and method
+  #           are counted once
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def count(self, lRows):
+    oStats = self.oStats
+    oState = self.oState
+    for row in lRows:
+      # Make sure we do not count doubles
+      if oState['sent'] == row[1] and oState['file'] == row[0] and oState['entity'] == row[3] and \
+         oState['service'] == row[5] and oState['method'] == row[6]:
+        continue
+      # Check for changes in the entity
+      if oState['sent'] != row[1] or oState['file'] != row[0] or oState['entity'] != row[3] or row[5] == oState['first']:
+        oStats['ne'] += 1
+        oState['first'] = row[5]
+      sService = row[5]
+      if sService != "":
+        if not sService in oStats: oStats[sService] = {'hit': 0, 'fail': 0}
+        sNEtype = row[2]
+        if not sNEtype in oStats[sService]: oStats[sService][sNEtype] = {'hit': 0, 'fail': 0}
+        sCount = 'hit' if row[4] == 'true' else 'fail'
+        oStats[sService][sCount] += 1
+        oStats[sService][sNEtype][sCount] += 1
+      # Bookkeeping
+      oState['file'] = row[0]
+      oState['sent'] = row[1]
+      oState['entity'] = row[3]
+      oState['service'] = row[5]
+      oState['method'] = row[6]
+
+  # ----------------------------------------------------------------------------------
+  # Name :    merge
+  # Goal :    Add the statistics [oOther] (nelstats format) to [oTotal]
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  @staticmethod
+  def merge(oTotal, oOther):
+    for (k, v) in oOther.items():
+      if isinstance(v, dict):
+        if not k in oTotal: oTotal[k] = {}
+        nellog.merge(oTotal[k], v)
+      else:
+        oTotal[k] = oTotal.get(k, 0) + v
+    return oTotal
@@ -0,0 +1,101 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import threading
+
+# Size of one alignment in the output, without its URI (as pynlpl writes it, indented)
+ALIGNMENT_BYTES = len('            <alignment format="application/json" class="NEL" xlink:href="" xlink:type="simple"/>\n')
+
+# ----------------------------------------------------------------------------------
+# Name :    nelprune
+# Goal :    Keep only the best candidate links of an entity as alignments
+#           The candidates are ranked once: on similarityScore (high first), then
+#           support (high first), then percentageOfSecondRank (low first)
+#   top       - keep at most this many candidates (0 = all)
+#   score     - minimal similarityScore
+#   support   - minimal support
+#   second    - maximal percentageOfSecondRank (None = no maximum)
+#           The resolution items (the .folia.log rows and the statistics) are not
+#           changed: only the alignments written into the FoLiA document are pruned
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class nelprune:
+  """Top-k and threshold pruning of candidate links"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, top = 0, score = 0.0, support = 0, second = None):
+    # Set the error handler
+    self.errHandle = oErr
+    self.iTop = int(top)
+    self.fScore = float(score)
+    self.iSupport = int(support)
+    self.fSecond = None if second == None else float(second)
+    # Statistics (the parts of a document are pruned at the same time)
+    self.oLock = threading.Lock()
+    self.oCount = {'kept': 0, 'pruned': 0, 'bytes': 0}
+
+  # ----------------------------------------------------------------------------------
+  # Name :    fromSpec
+  # Goal :    Make a pruner from a specification like "top=3,score=0.5,support=10,second=0.8"
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  @staticmethod
+  def fromSpec(oErr, sSpec):
+    oArgs = {}
+    for sPart in sSpec.split(","):
+      if sPart.strip() == "": continue
+      sKey, sValue = sPart.split("=", 1)
+      sKey = sKey.strip()
+      if not sKey in ("top", "score", "support", "second"):
+        raise ValueError("Unknown pruning setting: " + sKey)
+      oArgs[sKey] = sValue.strip()
+    return nelprune(oErr, **oArgs)
+
+  def active(self):
+    return self.iTop > 0 or self.fScore > 0 or self.iSupport > 0 or self.fSecond != None
+
+  def number(self, sValue, default = 0.0):
+    try:
+      return float(sValue)
+    except:
+      return default
+
+  # ----------------------------------------------------------------------------------
+  # Name :    apply
+  # Goal :    The candidates of [lResults] that are kept, best first
+  # History:
+  # 19/oct/2026    ERK Created
+  # 19/oct/2026    ERK Count under a lock
+  # ----------------------------------------------------------------------------------
+  def apply(self, lResults):
+    if not self.active() or len(lResults) == 0:
+      with self.oLock: self.oCount['kept'] += len(lResults)
+      return lResults
+    lRanked = []
+    for oResult in lResults:
+      fScore = self.number(oResult['similarityScore'])
+      fSupport = self.number(oResult['support'])
+      fSecond = self.number(oResult['percentageOfSecondRank'])
+      if fScore < self.fScore or fSupport < self.iSupport: continue
+      if self.fSecond != None and fSecond > self.fSecond: continue
+      lRanked.append((-fScore, -fSupport, fSecond, oResult))
+    lRanked.sort(key=lambda x: x[:3])
+    if self.iTop > 0: lRanked = lRanked[:self.iTop]
+    lKept = [x[3] for x in lRanked]
+    # Keep track of what the output saves
+    lPruned = [x for x in lResults if not any(x is y for y in lKept)]
+    with self.oLock:
+      self.oCount['kept'] += len(lKept)
+      self.oCount['pruned'] += len(lPruned)
+      self.oCount['bytes'] += sum(ALIGNMENT_BYTES + len(x['uri'].encode('utf-8')) for x in lPruned)
+    return lKept
+
+  def report(self):
+    oCount = self.oCount
+    return "nelprune: kept={}, pruned={}, saved about {} KB of output".format(
+      oCount['kept'], oCount['pruned'], round(oCount['bytes'] / 1024, 1))
@@ -0,0 +1,202 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import json
+import threading
+import zlib
+
+# The Spotlight request types, in the order that was always used
+REQUEST_TYPES = ["disambiguate", "annotate"]
+
+# ----------------------------------------------------------------------------------
+# Name :    nelstrategy
+# Goal :    Decide per NE class which Spotlight request type to try first
+#           For every class and request type the tries and successes (a result with
+#           'Resources') are counted; the type with the best success rate goes first.
+#           A type that almost never helps for a class (after [iMinTries] tries, a
+#           success rate below [fSkip]) is skipped, except for one in [iExplore] times,
+#           so that its rate can still change.
+#           The rates can be kept in a JSON file [flState] between runs
+#           A document is linked with a snapshot(), so that the order does not depend
+#           on how the parts of the document (or other documents) are interleaved
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Snapshot per document
+# ----------------------------------------------------------------------------------
+class nelstrategy:
+  """Adaptive order of Spotlight request types per NE class"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr, flState = None, iMinTries = 30, fSkip = 0.02, iExplore = 20):
+    # Set the error handler
+    self.errHandle = oErr
+    self.flState = flState
+    self.iMinTries = iMinTries
+    self.fSkip = fSkip
+    self.iExplore = iExplore
+    # The linkers of the pipeline share one strategy
+    self.oLock = threading.Lock()
+    # rates[class][request type] = {'tries': n, 'success': n}
+    self.oRates = {}
+    # Counters of this run
+    self.oCount = {'entities': 0, 'requests': 0, 'first': 0, 'fallback': 0, 'success': 0, 'skipped': 0}
+    if flState != None and flState != "" and os.path.isfile(flState):
+      with open(flState, "r", encoding="utf-8") as fIn:
+        self.oRates = json.load(fIn).get('rates', {})
+
+  def rate(self, oThis):
+    # Rate with one success and one failure added, so unknown types start at 0.5
+    return (oThis['success'] + 1) / (oThis['tries'] + 2)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    ranked
+  # Goal :    The request types for the rates [oClass] of one class, best first, as
+  #           (type, skip) pairs: skip is True for a type that (almost) never helps
+  # History:
+  # 19/oct/2026    ERK Created (from order)
+  # ----------------------------------------------------------------------------------
+  def ranked(self, oClass):
+    lTypes = []
+    for (iPos, sType) in enumerate(REQUEST_TYPES):
+      oThis = oClass.get(sType, {'tries': 0, 'success': 0})
+      # Sort on the rate; with equal rates the usual order stays
+      lTypes.append((-self.rate(oThis), iPos, sType, oThis))
+    lTypes.sort(key=lambda x: x[:2])
+    lRanked = [(lTypes[0][2], False)]
+    for (fRate, iPos, sType, oThis) in lTypes[1:]:
+      lRanked.append((sType, oThis['tries'] >= self.iMinTries and oThis['success'] < self.fSkip * oThis['tries']))
+    return lRanked
+
+  # ----------------------------------------------------------------------------------
+  # Name :    order
+  # Goal :    The request types to try for an entity of class [sClass], best first
+  # History:
+  # 19/oct/2026    ERK Created
+  # 19/oct/2026    ERK Ranking in ranked()
+  # ----------------------------------------------------------------------------------
+  def order(self, sClass, sKey = ""):
+    with self.oLock:
+      self.oCount['entities'] += 1
+      lOrder = []
+      for (sType, bSkip) in self.ranked(self.oRates.get(sClass, {})):
+        if bSkip and self.oCount['entities'] % self.iExplore != 0:
+          self.oCount['skipped'] += 1
+          continue
+        lOrder.append(sType)
+      return lOrder
+
+  # ----------------------------------------------------------------------------------
+  # Name :    snapshot
+  # Goal :    A frozen copy of the order for the linking of one document (see frozen)
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def snapshot(self):
+    with self.oLock:
+      oRanked = {sClass: self.ranked(oClass) for (sClass, oClass) in self.oRates.items()}
+    return frozen(self, oRanked)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    record
+  # Goal :    Count the outcome of the [iTry]-th request (from 0) for an entity
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def record(self, sClass, sType, iTry, bSuccess):
+    with self.oLock:
+      oThis = self.oRates.setdefault(sClass, {}).setdefault(sType, {'tries': 0, 'success': 0})
+      oThis['tries'] += 1
+      self.oCount['requests'] += 1
+      if iTry > 0: self.oCount['fallback'] += 1
+      if bSuccess:
+        oThis['success'] += 1
+        self.oCount['success'] += 1
+        if iTry == 0: self.oCount['first'] += 1
+
+  # ----------------------------------------------------------------------------------
+  # Name :    save
+  # Goal :    Keep the rates for the next run
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def save(self):
+    if self.flState == None or self.flState == "": return True
+    try:
+      with self.oLock:
+        sText = json.dumps({'rates': self.oRates, 'lastrun': self.oCount}, indent=2, sort_keys=True)
+      with open(self.flState + ".tmp", "w", encoding="utf-8") as fOut:
+        fOut.write(sText)
+      os.replace(self.flState + ".tmp", self.flState)
+      return True
+    except:
+      self.errHandle.DoError("nelstrategy/save")
+      return False
+
+  def stats(self):
+    with self.oLock:
+      return dict(self.oCount)
+
+  def report(self):
+    return "nelstrategy: " + " ".join("{}={}".format(k, v) for (k, v) in self.stats().items())
+
+
+# ----------------------------------------------------------------------------------
+# Name :    frozen
+# Goal :    The order of the request types of a nelstrategy, fixed when the linking of a
+#           document starts. The outcomes are kept until flush() adds them to the strategy,
+#           when the document is done; the rates only add up, so the parts of a document
+#           may record in any order.
+#           Whether a skipped type is explored for an entity depends on [sKey] (where the
+#           entity is in the document), not on a counter, so it is the same with any
+#           number of parts
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class frozen:
+  """Order of Spotlight request types for one document"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oStrategy, oRanked):
+    self.oStrategy = oStrategy
+    self.oRanked = oRanked
+    # The parts of a document share the snapshot
+    self.oLock = threading.Lock()
+    self.lRecords = []
+    self.oCount = {'entities': 0, 'skipped': 0}
+
+  def order(self, sClass, sKey = ""):
+    if sClass in self.oRanked:
+      lRanked = self.oRanked[sClass]
+    else:
+      lRanked = self.oStrategy.ranked({})
+    bExplore = (zlib.crc32(sKey.encode('utf-8')) % self.oStrategy.iExplore == 0)
+    lOrder = [sType for (sType, bSkip) in lRanked if not bSkip or bExplore]
+    with self.oLock:
+      self.oCount['entities'] += 1
+      self.oCount['skipped'] += len(lRanked) - len(lOrder)
+    return lOrder
+
+  def record(self, sClass, sType, iTry, bSuccess):
+    with self.oLock:
+      self.lRecords.append((sClass, sType, iTry, bSuccess))
+
+  # ----------------------------------------------------------------------------------
+  # Name :    flush
+  # Goal :    Add the outcomes of the document to the strategy
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def flush(self):
+    with self.oLock:
+      lRecords = self.lRecords
+      oCount = self.oCount
+      self.lRecords = []
+      self.oCount = {'entities': 0, 'skipped': 0}
+    for oRecord in lRecords:
+      self.oStrategy.record(*oRecord)
+    with self.oStrategy.oLock:
+      for (sKey, iCount) in oCount.items():
+        self.oStrategy.oCount[sKey] += iCount
@@ -0,0 +1,123 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import re
+import mmap
+import gzip
+import foliareader
+
+# ----------------------------------------------------------------------------------
+# Name :    sentindex
+# Goal :    Byte-offset index of the <s> elements of a FoLiA file, so that a large
+#           document can be divided into parts that are linked at the same time
+#           The file is memory-mapped (a .gz file is read into memory); only the tags of
+#           <s> and of the elements that foliareader skips (<original>, <suggestion>...)
+#           are looked for. A sentence inside another one belongs to the outer one; a
+#           sentence inside a skipped element is left out, as foliareader would do
+#           Every part is made into a small document of its own: the root element of the
+#           original (with all its namespace declarations) around the sentences of the
+#           part, so that foliareader can read their entities
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class sentindex:
+  """Byte-offset index of FoLiA sentences"""
+  lSkip = sorted(x.split("}")[1] for x in foliareader.IGNORE_TAGS)
+  patTag = re.compile(rb"<(/?)(?:[\w.-]+:)?(s|" + "|".join(lSkip).encode("ascii") + rb")(?=[\s/>])[^>]*?(/?)>")
+  patRoot = re.compile(rb"<FoLiA[\s>][^>]*>")
+
+  # ======================= CLASS INITIALIZER ========================================
+  def __init__(self, oErr):
+    # Set the error handler
+    self.errHandle = oErr
+
+  # ----------------------------------------------------------------------------------
+  # Name :    build
+  # Goal :    The list of (start, end) byte offsets of the outermost <s> elements in [data]
+  #           that are not inside a skipped element
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def build(self, data):
+    lIndex = []
+    iDepth = 0          # Depth of <s> elements
+    iSkip = 0           # Depth of skipped elements
+    iStart = 0
+    bTake = False       # Does the current outermost <s> go into the index?
+    for match in self.patTag.finditer(data):
+      bSent = (match.group(2) == b"s")
+      if match.group(3) == b"/":
+        # An empty element: only an empty <s/> at the top counts
+        if bSent and iDepth == 0 and iSkip == 0: lIndex.append((match.start(), match.end()))
+      elif match.group(1) == b"/":
+        if not bSent:
+          iSkip -= 1
+          continue
+        iDepth -= 1
+        if iDepth == 0 and bTake: lIndex.append((iStart, match.end()))
+      elif bSent:
+        if iDepth == 0:
+          iStart = match.start()
+          bTake = (iSkip == 0)
+        iDepth += 1
+      else:
+        iSkip += 1
+    return lIndex
+
+  # ----------------------------------------------------------------------------------
+  # Name :    ranges
+  # Goal :    Divide the sentences of [lIndex] into at most [iParts] consecutive ranges
+  #           (first, last + 1) of about the same number of bytes
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def ranges(self, lIndex, iParts):
+    if len(lIndex) == 0: return []
+    iParts = max(1, min(iParts, len(lIndex)))
+    iTotal = sum(e - s for (s, e) in lIndex)
+    lRanges = []
+    iFirst = 0
+    iBytes = 0
+    for (iSent, (s, e)) in enumerate(lIndex):
+      iBytes += e - s
+      # Close this range once it has its share of the bytes
+      if len(lRanges) < iParts - 1 and iBytes * iParts >= iTotal * (len(lRanges) + 1):
+        lRanges.append((iFirst, iSent + 1))
+        iFirst = iSent + 1
+    if iFirst < len(lIndex): lRanges.append((iFirst, len(lIndex)))
+    return lRanges
+
+  # ----------------------------------------------------------------------------------
+  # Name :    fragments
+  # Goal :    Divide [flInput] into at most [iParts] small documents of whole sentences
+  #           Returns a list of bytes objects, in document order, or None upon failure
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def fragments(self, flInput, iParts):
+    try:
+      if flInput.endswith(".gz"):
+        with gzip.open(flInput, "rb") as fIn:
+          return self.split(fIn.read(), iParts)
+      with open(flInput, "rb") as fIn:
+        if os.path.getsize(flInput) == 0: return []
+        with mmap.mmap(fIn.fileno(), 0, access=mmap.ACCESS_READ) as data:
+          return self.split(data, iParts)
+    except:
+      self.errHandle.DoError("sentindex/fragments: cannot divide " + flInput)
+      return None
+
+  def split(self, data, iParts):
+    match = self.patRoot.search(data)
+    if match == None: raise ValueError("No FoLiA root element")
+    bRoot = bytes(match.group(0))
+    if bRoot.endswith(b"/>"): return []
+    lIndex = self.build(data)
+    lFragments = []
+    for (iFirst, iLast) in self.ranges(lIndex, iParts):
+      # Only the sentences themselves: what lies between them need not be balanced
+      lFragments.append(bRoot + b"".join(data[s:e] for (s, e) in lIndex[iFirst:iLast]) + b"</FoLiA>")
+    return lFragments
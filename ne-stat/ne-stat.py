@@ -4,11 +4,14 @@
 # History:
 # 22/dec/2016    ERK Created
 # ==========================================================================================================
-import sys, getopt, os.path, importlib
+import sys, getopt, os.path, importlib, time
 import util
 import nelstats
+import nelstore
 import json
 import csv
+import contextlib
+import copy
 
 # ============================= LOCAL VARIABLES ====================================
 errHandle = util.ErrHandle()
@@ -24,17 +27,24 @@ def main(prgName, argv) :
     flOutput = ''       # output file name
     flGather = ''       # JSON file describing the set 
     sMethod = ''        # Method to be used
+    flDbase = ''        # SQLite store for the aggregated counts (optional)
+    sQuery = ''         # Query on the store (method 'query')
+    iInterval = 0       # Seconds between rewrites of the output (method 'follow')
+    iIdle = 0           # Stop following after this many seconds without new rows
+    bSketch = False     # Keep approximate statistics (sketches) too
 
     try:
         # Adapt the program name to exclude the directory (for windows)
         index = prgName.rfind("\\")
         if (index > 0) :
             prgName = prgName[index+1:]
-        sSyntax = prgName + ' -i <inputfile/dir> -o <outputfile/dir> -g <gatherfile>'
+        sSyntax = prgName + ' [-k] [-d <dbfile>] -i <inputfile/dir> -o <outputfile/dir> -g <gatherfile>\n' + \
+                  prgName + ' -m follow [-k] [-t <seconds>] [-e <idle seconds>] [-d <dbfile>] -i <inputdir> -o <outputfile> -g <gatherfile>\n' + \
+                  prgName + ' -m query -d <dbfile> -q "ne=org;genre=<genre>;start=1850-1900;service=<service>;by=set,start"'
         # get all the arguments
         try:
             # Get arguments and options
-            opts, args = getopt.getopt(argv, "hi:o:g:m:", ["-inputfile=","-outputfile=", "-gatherfile=", "-method="])
+            opts, args = getopt.getopt(argv, "hi:o:g:m:d:q:t:e:k", ["-inputfile=","-outputfile=", "-gatherfile=", "-method=", "-dbfile=", "-query=", "-interval=", "-idle=", "-sketch"])
         except getopt.GetoptError:
               print(sSyntax)
               sys.exit(2)
@@ -51,6 +61,22 @@ def main(prgName, argv) :
                 flGather = arg
             elif opt in ("-m", "--method"):
                 sMethod = arg
+            elif opt in ("-d", "--dbfile"):
+                flDbase = arg
+            elif opt in ("-q", "--query"):
+                sQuery = arg
+            elif opt in ("-t", "--interval"):
+                iInterval = int(arg)
+            elif opt in ("-e", "--idle"):
+                iIdle = int(arg)
+            elif opt in ("-k", "--sketch"):
+                bSketch = True
+        # A query only needs the store
+        if sMethod == 'query':
+            if flDbase == '':
+                errHandle.DoError(sSyntax)
+                return False
+            return query(flDbase, sQuery)
         # Check if all arguments are there
         if (flInput == '' or flOutput == ''):
             errHandle.DoError(sSyntax)
@@ -63,9 +89,23 @@ def main(prgName, argv) :
         # possibly add a method
         if sMethod != '':
             kwargs['method'] = sMethod
+        # possibly add a store
+        if flDbase != '':
+            kwargs['dbase'] = flDbase
+        if iInterval > 0:
+            kwargs['interval'] = iInterval
+        if iIdle > 0:
+            kwargs['idle'] = iIdle
+        if bSketch:
+            kwargs['sketch'] = True
 
-        # Call the 'calculate' function with all the arguments we have collected
-        if (calculate(**kwargs)) :
+        # Follow growing log files, or calculate once
+        if sMethod == 'follow':
+            bOkay = follow(**kwargs)
+        else:
+            # Call the 'calculate' function with all the arguments we have collected
+            bOkay = calculate(**kwargs)
+        if (bOkay) :
             # Finish nicely
             errHandle.Status("Ready")
         else :
@@ -90,39 +130,142 @@ def calculate(**kwargs):
         if not "input" in kwargs or not "output" in kwargs or not "gather" in kwargs: return False
         # Get the obligatory parameters from the kwargs
         flInput = kwargs['input']
-        flOutput = kwargs['output']
-        flGather = kwargs['gather']
         sMethod = ''
         if "method" in kwargs: sMethod = kwargs['method']
-        arInput = []        # List of input files
 
         # Open a statistics object
-        oStat = nelstats.nelstats(errHandle)
+        oStat = nelstats.nelstats(errHandle, kwargs.get('sketch', False))
 
         # Gather a list of .folia.log input files
-        if os.path.isdir(flInput):
-            # Input is a directory
-            for root, dirs, files in os.walk(flInput):
-                for file in files:
-                    if file.endswith(".folia.log"):
-                        arInput.append(os.path.abspath( os.path.join(root,file)))
-        elif os.path.isfile(flInput):
-            arInput.append(flInput)
-        else:
-            # There is no valid input file
-            errHandle.DoError("Could not find input or output. Input [{}]".format(flInput))
-            return False
+        arInput = getLogFiles(flInput)
+        if arInput == None: return False
 
-        # Keep track of statistics
+        # Walk through all the input files
         lstLogStat = []
+        for logfile in arInput:
+            # Process this file: get a 'statistics' (counting) object for it
+            lstLogStat.append((logfile, oStat.treat(logfile)))
+
+        # Combine the statistics and write all the output files
+        return summarize(lstLogStat, sketchset=oStat.oSketch, **kwargs)
+    except:
+        errHandle.DoError("ne-stat")
+        return False
+
+
+# ----------------------------------------------------------------------------------
+# Name :    follow
+# Goal :    Follow the .folia.log files under a directory while they are growing
+#           Every file keeps its byte offset, its counts and its duplicate-detection
+#           state, so only new rows are read. The output is rewritten every 
+#           [interval] seconds when there is new data. Stops on Ctrl-C, or after 
+#           [idle] seconds without new rows.
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Read all files again when the sketches start again
+# ----------------------------------------------------------------------------------
+def follow(**kwargs):
+
+    try:
+        # Check
+        if not "input" in kwargs or not "output" in kwargs or not "gather" in kwargs: return False
+        flInput = kwargs['input']
+        iInterval = kwargs.get('interval', 60)
+        iIdle = kwargs.get('idle', 0)
+        iPoll = min(5, iInterval)
+        oTails = {}             # Tail state per log file
+        iRows = 0               # Rows read since the last rewrite
+        fLastWrite = time.time()
+        fLastData = time.time()
+
+        # Open a statistics object
+        oStat = nelstats.nelstats(errHandle, kwargs.get('sketch', False))
+
+        errHandle.Status("Following: {} (every {}s)".format(flInput, iInterval))
+        try:
+            while True:
+                # New files may appear at any time
+                arInput = getLogFiles(flInput)
+                if arInput == None: return False
+                iGeneration = oStat.iGeneration
+                for logfile in arInput:
+                    oTail = oStat.tail(logfile, oTails.get(logfile, None))
+                    if oTail != None:
+                        oTails[logfile] = oTail
+                        iRows += oTail['new']
+                # A file became shorter and the sketches started again: read all files again first
+                if oStat.iGeneration != iGeneration: continue
+                fNow = time.time()
+                if iRows > 0: fLastData = fNow
+                if iRows > 0 and fNow - fLastWrite >= iInterval:
+                    errHandle.Status("Update: {} new rows in {} files".format(iRows, len(oTails)))
+                    lstLogStat = [(k, v['stats']) for (k,v) in oTails.items()]
+                    if not summarize(lstLogStat, sketchset=oStat.oSketch, **kwargs): return False
+                    iRows = 0
+                    fLastWrite = fNow
+                if iIdle > 0 and fNow - fLastData >= iIdle:
+                    errHandle.Status("No new rows for {}s".format(iIdle))
+                    break
+                time.sleep(iPoll)
+        except KeyboardInterrupt:
+            errHandle.Status("Stopped following")
+
+        # Write the final state
+        lstLogStat = [(k, v['stats']) for (k,v) in oTails.items()]
+        return summarize(lstLogStat, sketchset=oStat.oSketch, **kwargs)
+    except:
+        errHandle.DoError("follow")
+        return False
+
+# ----------------------------------------------------------------------------------
+# Name :    getLogFiles
+# Goal :    Get a list of the .folia.log files in [flInput] (a file or a directory)
+# History:
+# 22/dec/2016    ERK Created (as part of calculate)
+# 19/oct/2026    ERK Separate function
+# ----------------------------------------------------------------------------------
+def getLogFiles(flInput):
+    arInput = []        # List of input files
+
+    if os.path.isdir(flInput):
+        # Input is a directory
+        for root, dirs, files in os.walk(flInput):
+            for file in files:
+                if file.endswith(".folia.log"):
+                    arInput.append(os.path.abspath( os.path.join(root,file)))
+    elif os.path.isfile(flInput):
+        arInput.append(flInput)
+    else:
+        # There is no valid input file
+        errHandle.DoError("Could not find input or output. Input [{}]".format(flInput))
+        return None
+    return arInput
+
+# ----------------------------------------------------------------------------------
+# Name :    summarize
+# Goal :    Combine the statistics of the log files per directory, set and gather,
+#           and write the JSON, CSV and (optionally) store and sketch output
+#           [lstLogStat] is a list of (logfile, oLogStat) tuples
+#           [sketchset] (optional) is the nelsketch.sketchset of all the log files;
+#           the figures per set/gather in the sketch output are exact counts
+# History:
+# 22/dec/2016    ERK Created (as part of calculate)
+# 19/oct/2026    ERK Separate function, so that follow mode can use it
+# 19/oct/2026    ERK One sketch set for all directories
+# ----------------------------------------------------------------------------------
+def summarize(lstLogStat, **kwargs):
+
+    try:
+        flOutput = kwargs['output']
+        flGather = kwargs['gather']
+
+        # Keep track of statistics
         oLogDirStat = {}
         oLogTotal = {}
         lstNeType = []
         lstNeType.append('')
-        # Walk through all the input files
-        for logfile in arInput:
-            # Process this file: get a 'statistics' (counting) object for it
-            oLogStat = oStat.treat(logfile)
+        # Walk through the statistics of all the input files
+        for (logfile, oLogStat) in lstLogStat:
             if oLogStat == None:
                 # Did not receive a reply
                 iStop = 1
@@ -130,7 +273,8 @@ def calculate(**kwargs):
                 # Get the directory
                 sDir = os.path.dirname(logfile)
                 if not sDir in oLogDirStat:
-                    oLogDirStat[sDir] = oLogStat
+                    # Work on a copy: the caller may still be adding to [oLogStat]
+                    oLogDirStat[sDir] = copy.deepcopy(oLogStat)
                 else:
                     oTmp = oLogDirStat[sDir]
                     for (k,v) in oLogStat.items():
@@ -138,7 +282,7 @@ def calculate(**kwargs):
                             oTmp[k] += v
                         else:
                             if not k in oTmp:
-                                oTmp[k] = v
+                                oTmp[k] = copy.deepcopy(v)
                             else:
                                 #oTmp[k]['hit'] += v['hit']
                                 #oTmp[k]['fail'] += v['fail']
@@ -204,9 +348,10 @@ def calculate(**kwargs):
                     # Visit all the services
                     for (keyService, oService) in oItem.items():
                         if isinstance(oService, dict) and 'hit' in oService:
-                            # This really is a service
-                            iPtc = 100 * oService['hit'] / iNE
-                            oGather[keyService+'_ptc'] = iPtc
+                            # This really is a service (a growing log may not have entities yet)
+                            if iNE > 0:
+                                iPtc = 100 * oService['hit'] / iNE
+                                oGather[keyService+'_ptc'] = iPtc
                             # Find out which row it is in the 'services' array
                             if not keyService in oLogTotal[sSet]['services']:
                                 # Add it to the services
@@ -216,84 +361,10 @@ def calculate(**kwargs):
                     # oItem['num'] = int(arDirs[-1])
                     oLogTotal[sSet][iGat] = oItem
 
-        # Try to extract information from oLogTotal to make one CSV file per NE-type
-        for sNEtype in lstNeType:
-            oCsv = {}
-            for (sSet,oSet) in oLogTotal.items():
-                lRows = []
-                # First row contains column information
-                oRow = ['set', 'genre', 'start', 'docs', 'ne']
-                # Add one column header for each service
-                for sThis in oSet['services']: oRow.append(sThis)
-                # Add this row to the list of rows
-                lRows.append(oRow)
-                # Walk all the elements of this set
-                for (sKey, oItem) in oSet.items():
-                    if str(sKey) != 'services' and str(sKey) != 'ptc':
-                        # Start a new ro
-                        oRow = [sSet]
-                        # Get the standard information from this row
-                        try:
-                            oRow.append(oItem['genre'])
-                        except:
-                            iStop = 1
-                        oRow.append(oItem['start'])
-                        if 'docs' in oItem:
-                            oRow.append(oItem['docs'])
-                        else:
-                            oRow.append(0)
-                        if 'ne' in oItem:
-                            # Do we need tot TOTAL number of named-entities?
-                            if sNEtype == "":
-                                oRow.append(oItem['ne'])
-                            else:
-                                # No, we need the number of named-entities for one particular kind
-                                iService = 0
-                                while oSet['services'][iService] not in oItem:
-                                    iService+= 1
-                                if oSet['services'][iService] in oItem:
-                                    oFirstServiceItem = oItem[oSet['services'][iService]]
-                                else:
-                                    iStop = 1
-                                if sNEtype in oFirstServiceItem:
-                                    iNEtypeTotal = oFirstServiceItem[sNEtype]['hit'] + oFirstServiceItem[sNEtype]['fail']
-                                    oRow.append(iNEtypeTotal)
-                                else:
-                                    # There are no hits for this NE-type
-                                    oRow.append(0)
-                        else:
-                            oRow.append(0)
-                        # Walk all the services
-                        for sThis in oSet['services']: 
-                            # See if this service is represented
-                            if sThis in oItem:
-                                # Add this count of hits -- depending on the NE type
-                                if sNEtype == "":
-                                    # Take the overall number of hits for this service
-                                    oRow.append(oItem[sThis]['hit'])
-                                elif sNEtype in oItem[sThis]:
-                                    # Take the number of hits for this service/NE-type combi
-                                    oRow.append(oItem[sThis][sNEtype]['hit'])
-                                else:
-                                    # There are no hits for this service/NE-type combination
-                                    oRow.append(0)
-                            else:
-                                # Not represented: count = 0
-                                oRow.append(0)
-                        # Add the row to the list
-                        lRows.append(oRow)
-                # Combine into oCsv
-                oCsv[sSet] = lRows
-                if sNEtype == "":
-                    fCsvFileName = flOutput.replace(".json", "_"+sSet+".csv")
-                else:
-                    fCsvFileName = flOutput.replace(".json", "_"+sSet+"_"+sNEtype+".csv")
-                with open(fCsvFileName, "w") as csvfile:
-                    wOut = csv.writer(csvfile, delimiter='\t')
-                    for oRow in lRows:
-                        wOut.writerow(oRow)
-
-
+        # Make one CSV file per set and per set/NE-type in one pass over oLogTotal
+        oCsv = makeReport(oLogTotal, lstNeType, flOutput)
+        if oCsv == None:
+            return False
 
         # Save the statistics results
         with open(flOutput, "w") as fOut:
@@ -306,12 +377,152 @@ def calculate(**kwargs):
         with open(flOutput.replace(".json", "_csv.json"), "w") as fOut:
             json.dump(oCsv, fOut, indent = 2)
 
+        # Optionally persist the aggregated counts in the indexed store
+        if "dbase" in kwargs:
+            oStore = nelstore.nelstore(errHandle, kwargs['dbase'])
+            bStored = oStore.store(oLogTotal)
+            oStore.close()
+            if not bStored: return False
+
+        # Optionally save the approximate statistics of the whole input, with the
+        # exact counts per set/gather next to them
+        oSketch = kwargs.get('sketchset', None)
+        if oSketch != None:
+            oSketchOut = {'total': oSketch.summary(), 'sets': {}}
+            for (sDir, oItem) in oLogDirStat.items():
+                arDirs = sDir.replace("\\", "/").split("/")
+                sSet = str(arDirs[-2])
+                if not sSet in oSketchOut['sets']: oSketchOut['sets'][sSet] = {}
+                oExact = {}
+                for (sService, oService) in oItem.items():
+                    if isinstance(oService, dict) and 'hit' in oService:
+                        oExact[sService] = {'*': {'linked_total': oService['hit'], 'failed_total': oService['fail']}}
+                        for (sNEtype, oCount) in oService.items():
+                            if isinstance(oCount, dict):
+                                oExact[sService][sNEtype] = {'linked_total': oCount['hit'], 'failed_total': oCount['fail']}
+                oSketchOut['sets'][sSet][arDirs[-1]] = oExact
+            with open(flOutput.replace(".json", "_sketch.json"), "w") as fOut:
+                json.dump(oSketchOut, fOut, indent=2)
+            # The state can be merged with that of other runs (see nelsketch.py)
+            with open(flOutput.replace(".json", "_sketch-state.json"), "w") as fOut:
+                json.dump(oSketch.save(), fOut)
+
         # Return positively
         return True
     except:
-        errHandle.DoError("ne-stat")
+        errHandle.DoError("summarize")
         return False
 
+# ----------------------------------------------------------------------------------
+# Name :    query
+# Goal :    Slice and aggregate the counts in the store without re-reading any logs
+#           The result is printed as tab-separated rows
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def query(flDbase, sQuery):
+
+    try:
+        if not os.path.isfile(flDbase):
+            errHandle.DoError("Could not find the store [{}]".format(flDbase))
+            return False
+        oStore = nelstore.nelstore(errHandle, flDbase)
+        lRows = oStore.query(sQuery)
+        oStore.close()
+        if lRows == None: return False
+        wOut = csv.writer(sys.stdout, delimiter='\t', lineterminator='\n')
+        for oRow in lRows:
+            wOut.writerow(oRow)
+        return True
+    except:
+        errHandle.DoError("query")
+        return False
+
+
+# ----------------------------------------------------------------------------------
+# Name :    makeReport
+# Goal :    Write the CSV tables for all sets and NE-types in one pass over [oLogTotal]
+#           Each set gets one table with the totals (NE-type "") and one table per NE-type.
+#           Rows are streamed to writers that stay open for the whole set.
+#           Returns the [oCsv] aggregate: one entry per CSV file, keyed by the 
+#           file name suffix ("set" or "set_netype")
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def makeReport(oLogTotal, lstNeType, flOutput):
+    oCsv = {}
+
+    try:
+        for (sSet,oSet) in oLogTotal.items():
+            # Precompute the column index of each service in this set
+            lServices = oSet['services']
+            oServiceIdx = {sThis: iIdx for (iIdx, sThis) in enumerate(lServices)}
+            iServices = len(lServices)
+            # The header row is the same for all tables of this set
+            lHeader = ['set', 'genre', 'start', 'docs', 'ne'] + lServices
+            with contextlib.ExitStack() as stack:
+                # Open one writer per NE-type for this set
+                lTables = []
+                for sNEtype in lstNeType:
+                    if sNEtype == "":
+                        sKey = sSet
+                    else:
+                        sKey = sSet + "_" + sNEtype
+                    fCsvFileName = flOutput.replace(".json", "_"+sKey+".csv")
+                    csvfile = stack.enter_context(open(fCsvFileName, "w"))
+                    wOut = csv.writer(csvfile, delimiter='\t')
+                    wOut.writerow(lHeader)
+                    lRows = [lHeader]
+                    oCsv[sKey] = lRows
+                    lTables.append((sNEtype, wOut, lRows))
+
+                # Walk all the elements of this set only once
+                for (sKey, oItem) in oSet.items():
+                    if str(sKey) == 'services' or str(sKey) == 'ptc': continue
+                    # Standard information, shared by all NE-types
+                    lStart = [sSet, oItem.get('genre', ''), oItem.get('start', ''), oItem.get('docs', 0)]
+                    # The first service present in this item holds the per NE-type totals
+                    oFirstServiceItem = None
+                    lPresent = []
+                    for sThis in oItem:
+                        if sThis in oServiceIdx:
+                            lPresent.append((oServiceIdx[sThis], oItem[sThis]))
+                    if len(lPresent) > 0:
+                        oFirstServiceItem = min(lPresent, key=lambda x: x[0])[1]
+
+                    for (sNEtype, wOut, lRows) in lTables:
+                        oRow = list(lStart)
+                        if not 'ne' in oItem:
+                            oRow.append(0)
+                        elif sNEtype == "":
+                            # The TOTAL number of named-entities
+                            oRow.append(oItem['ne'])
+                        elif oFirstServiceItem != None and sNEtype in oFirstServiceItem:
+                            # The number of named-entities for one particular kind
+                            oNE = oFirstServiceItem[sNEtype]
+                            oRow.append(oNE['hit'] + oNE['fail'])
+                        else:
+                            # There are no hits for this NE-type
+                            oRow.append(0)
+                        # Services that are not represented have count = 0
+                        lCounts = [0] * iServices
+                        for (iIdx, oService) in lPresent:
+                            if sNEtype == "":
+                                # Take the overall number of hits for this service
+                                lCounts[iIdx] = oService['hit']
+                            elif sNEtype in oService:
+                                # Take the number of hits for this service/NE-type combi
+                                lCounts[iIdx] = oService[sNEtype]['hit']
+                        oRow.extend(lCounts)
+                        wOut.writerow(oRow)
+                        lRows.append(oRow)
+
+        # Return the aggregate
+        return oCsv
+    except:
+        errHandle.DoError("makeReport")
+        return None
+
 
 # ----------------------------------------------------------------------------------
 # Goal :  If user calls this as main, then follow up on it
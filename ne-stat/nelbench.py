@@ -0,0 +1,249 @@
+# ==========================================================================================================
+# Name :    nelbench
+# Goal :    Benchmark nelstats.treat and the whole ne-stat program on a (synthetic) corpus
+#           Reports rows/sec, peak memory and end-to-end time, and compares with stored baselines
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Memory of treat with tracemalloc
+# ==========================================================================================================
+import sys, getopt, os.path, importlib
+import util
+import nelstats
+import nelgen
+import json
+import time
+import tempfile
+import subprocess
+import shutil
+import tracemalloc
+try:
+    import resource
+except ImportError:
+    # Not available on Windows: no RSS figures
+    resource = None
+
+# ============================= LOCAL VARIABLES ====================================
+errHandle = util.ErrHandle()
+
+# ----------------------------------------------------------------------------------
+# Name :    main
+# Goal :    Main body of the function
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def main(prgName, argv) :
+    kwargs = {}
+
+    try:
+        # Adapt the program name to exclude the directory (for windows)
+        index = prgName.rfind("\\")
+        if (index > 0) :
+            prgName = prgName[index+1:]
+        sSyntax = prgName + ' [-i <corpusdir> -g <gatherfile> | -n <rows>] [-r <repeats>] [-b <baselinefile> [-u] [-x <tolerance>]]'
+        # get all the arguments
+        try:
+            # Get arguments and options
+            opts, args = getopt.getopt(argv, "hi:g:n:r:b:ux:",
+                ["-inputdir=", "-gatherfile=", "-rows=", "-repeats=", "-baseline=", "-update", "-tolerance="])
+        except getopt.GetoptError:
+              print(sSyntax)
+              sys.exit(2)
+        # Walk all the arguments
+        for opt, arg in opts:
+            if opt == '-h':
+                print(sSyntax)
+                sys.exit(0)
+            elif opt in ("-i", "--inputdir"):
+                kwargs['input'] = arg
+            elif opt in ("-g", "--gatherfile"):
+                kwargs['gather'] = arg
+            elif opt in ("-n", "--rows"):
+                kwargs['rows'] = int(float(arg))
+            elif opt in ("-r", "--repeats"):
+                kwargs['repeats'] = int(arg)
+            elif opt in ("-b", "--baseline"):
+                kwargs['baseline'] = arg
+            elif opt in ("-u", "--update"):
+                kwargs['update'] = True
+            elif opt in ("-x", "--tolerance"):
+                kwargs['tolerance'] = float(arg)
+        if ('input' in kwargs) != ('gather' in kwargs):
+            errHandle.DoError(sSyntax)
+            return False
+        bOkay = benchmark(**kwargs)
+        if bOkay:
+            errHandle.Status("Ready")
+        else:
+            errHandle.Status("Regression or error")
+        # A regression gives a non-zero exit code, so that scripts can act on it
+        sys.exit(0 if bOkay else 1)
+    except SystemExit:
+        raise
+    except:
+        # Show the error to the user
+        errHandle.DoError("main")
+        return False
+
+# ----------------------------------------------------------------------------------
+# Name :    peakRss
+# Goal :    Peak resident set size in MB of this process or of its children
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def peakRss(bChildren = False):
+    if resource == None: return None
+    iWho = resource.RUSAGE_CHILDREN if bChildren else resource.RUSAGE_SELF
+    iMax = resource.getrusage(iWho).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin": iMax = iMax / 1024
+    return round(iMax / 1024, 1)
+
+# ----------------------------------------------------------------------------------
+# Name :    outputEntities
+# Goal :    The number of named entities in the statistics file [flOutput] of ne-stat,
+#           or None if there is no such file or it cannot be read
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def outputEntities(flOutput):
+    try:
+        with open(flOutput, "r") as fIn:
+            oLogTotal = json.load(fIn)
+        iEntities = 0
+        for oSet in oLogTotal.values():
+            for (sKey, oItem) in oSet.items():
+                if str(sKey) == 'services' or str(sKey) == 'ptc': continue
+                iEntities += oItem['ne']
+        return iEntities
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+# ----------------------------------------------------------------------------------
+# Name :    benchmark
+# Goal :    Run the benchmark
+#           input, gather - an existing corpus; otherwise one of [rows] rows is generated
+#           repeats       - number of runs; the best one counts
+#           baseline      - JSON file with baselines per corpus size
+#           update        - store the results as the new baseline
+#           tolerance     - allowed relative slowdown before a regression is flagged
+# Return:   False if there was an error or a regression
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Check the output of every ne-stat run
+# 19/oct/2026    ERK Peak memory of treat from tracemalloc, not the RSS of the process
+# ----------------------------------------------------------------------------------
+def benchmark(**kwargs):
+    sTmpDir = tempfile.mkdtemp(prefix="nelbench-")
+
+    try:
+        iRepeats = kwargs.get('repeats', 3)
+        fTolerance = kwargs.get('tolerance', 0.10)
+        if 'input' in kwargs:
+            flInput = kwargs['input']
+            flGather = kwargs['gather']
+        else:
+            flInput = os.path.join(sTmpDir, "corpus")
+            flGather = os.path.join(sTmpDir, "gather.json")
+            errHandle.Status("Generating a corpus of {} rows".format(kwargs.get('rows', 100000)))
+            if not nelgen.generate(flInput, flGather, rows=kwargs.get('rows', 100000)): return False
+
+        # List the log files and count the rows, outside of the timings
+        lFiles = []
+        iRows = 0
+        iBytes = 0
+        for root, dirs, files in os.walk(flInput):
+            for file in files:
+                if file.endswith(".folia.log"):
+                    sFile = os.path.join(root, file)
+                    lFiles.append(sFile)
+                    iBytes += os.path.getsize(sFile)
+                    with open(sFile, "rb") as fIn:
+                        iRows += sum(1 for x in fIn)
+        errHandle.Status("Corpus: {} files, {} rows, {:.1f} MB".format(len(lFiles), iRows, iBytes / 1048576))
+
+        # (1) nelstats.treat on its own
+        oStat = nelstats.nelstats(errHandle)
+        fBestTreat = None
+        for iRun in range(iRepeats):
+            fStart = time.perf_counter()
+            lStats = [oStat.treat(sFile) for sFile in lFiles]
+            fTime = time.perf_counter() - fStart
+            if fBestTreat == None or fTime < fBestTreat: fBestTreat = fTime
+        # The number of entities the output of ne-stat should have
+        iEntities = sum(x['ne'] for x in lStats if x != None)
+        fRowsSec = iRows / max(fBestTreat, 1e-9)
+        # The peak RSS of this process includes the generated corpus: trace one more (untimed) run
+        tracemalloc.start()
+        for sFile in lFiles: oStat.treat(sFile)
+        iTreatPeak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # (2) The whole ne-stat program, in a separate process
+        flNeStat = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ne-stat.py")
+        flOutput = os.path.join(sTmpDir, "stats.json")
+        fBestRun = None
+        for iRun in range(iRepeats):
+            # The output of a previous run must not count for this one
+            if os.path.exists(flOutput): os.remove(flOutput)
+            fStart = time.perf_counter()
+            oProc = subprocess.run([sys.executable, flNeStat, "-i", flInput, "-o", flOutput, "-g", flGather],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            fTime = time.perf_counter() - fStart
+            # ne-stat does not set its exit code on errors: check the output itself as well
+            iOutput = outputEntities(flOutput)
+            if oProc.returncode != 0 or iOutput != iEntities:
+                errHandle.DoError("ne-stat failed (entities in the output: {}, expected {}):\n{}".format(
+                    iOutput, iEntities, oProc.stderr.decode('utf-8', 'replace')))
+                return False
+            if fBestRun == None or fTime < fBestRun: fBestRun = fTime
+
+        oResult = {'rows': iRows, 'files': len(lFiles), 'mb': round(iBytes / 1048576, 1),
+                   'treat_rows_sec': round(fRowsSec), 'treat_peak_kb': round(iTreatPeak / 1024),
+                   'ne_stat_sec': round(fBestRun, 3), 'ne_stat_rss_mb': peakRss(True)}
+        for (k,v) in oResult.items():
+            print("{}\t{}".format(k, v))
+
+        # Compare with the baseline for the same corpus size
+        bOkay = True
+        if 'baseline' in kwargs:
+            flBaseline = kwargs['baseline']
+            oBaselines = {}
+            if os.path.exists(flBaseline):
+                with open(flBaseline, "r") as fIn:
+                    oBaselines = json.load(fIn)
+            sKey = str(iRows)
+            if sKey in oBaselines:
+                oBase = oBaselines[sKey]
+                # Higher is better for rows/sec, lower is better for the others
+                for (sName, bHigher) in [('treat_rows_sec', True), ('ne_stat_sec', False),
+                                         ('treat_peak_kb', False), ('ne_stat_rss_mb', False)]:
+                    if oBase.get(sName) == None or oResult[sName] == None: continue
+                    if bHigher:
+                        bWorse = oResult[sName] < oBase[sName] * (1 - fTolerance)
+                    else:
+                        bWorse = oResult[sName] > oBase[sName] * (1 + fTolerance)
+                    sFlag = "REGRESSION" if bWorse else "ok"
+                    print("{}\t{}\tbaseline {}\t{}".format(sName, oResult[sName], oBase[sName], sFlag))
+                    if bWorse: bOkay = False
+            else:
+                errHandle.Status("No baseline for {} rows".format(iRows))
+            if kwargs.get('update', False):
+                oBaselines[sKey] = oResult
+                with open(flBaseline, "w") as fOut:
+                    json.dump(oBaselines, fOut, indent=2)
+                errHandle.Status("Baseline updated: " + flBaseline)
+        return bOkay
+    except:
+        errHandle.DoError("benchmark")
+        return False
+    finally:
+        # Remove the generated corpus and the output
+        shutil.rmtree(sTmpDir, ignore_errors=True)
+
+
+# ----------------------------------------------------------------------------------
+# Goal :  If user calls this as main, then follow up on it
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+    # Call the main function with two arguments: program name + remainder
+    main(sys.argv[0], sys.argv[1:])
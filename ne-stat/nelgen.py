@@ -0,0 +1,195 @@
+# ==========================================================================================================
+# Name :    nelgen
+# Goal :    Generate a synthetic corpus of .folia.log files plus a matching gather file
+#           The layout is the one ne-stat expects: <dir>/<set>/<gather>/<n>.folia.log
+# History:
+# 19/oct/2026    ERK Created
+# ==========================================================================================================
+import sys, getopt, os.path, importlib
+import util
+import json
+import random
+import time
+import itertools
+
+# ============================= LOCAL VARIABLES ====================================
+errHandle = util.ErrHandle()
+GENRES = ["roman", "poezie", "verhalen", "toneel", "non-fictie", "jeugdliteratuur", "brieven"]
+
+# ----------------------------------------------------------------------------------
+# Name :    main
+# Goal :    Main body of the function
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def main(prgName, argv) :
+    flOutput = ''       # output directory
+    flGather = ''       # gather file to be made
+    kwargs = {}
+
+    try:
+        # Adapt the program name to exclude the directory (for windows)
+        index = prgName.rfind("\\")
+        if (index > 0) :
+            prgName = prgName[index+1:]
+        sSyntax = prgName + ' -o <outputdir> -g <gatherfile> [-n <rows>] [-s <services>] [-t <per:0.4,loc:0.3,...>]' + \
+                  ' [-d <duplicate rate>] [-l <sets:gathers:docs>] [-r <seed>]'
+        # get all the arguments
+        try:
+            # Get arguments and options
+            opts, args = getopt.getopt(argv, "ho:g:n:s:t:d:l:r:",
+                ["-outputdir=", "-gatherfile=", "-rows=", "-services=", "-types=", "-dups=", "-layout=", "-seed="])
+        except getopt.GetoptError:
+              print(sSyntax)
+              sys.exit(2)
+        # Walk all the arguments
+        for opt, arg in opts:
+            if opt == '-h':
+                print(sSyntax)
+                sys.exit(0)
+            elif opt in ("-o", "--outputdir"):
+                flOutput = arg
+            elif opt in ("-g", "--gatherfile"):
+                flGather = arg
+            elif opt in ("-n", "--rows"):
+                kwargs['rows'] = int(float(arg))
+            elif opt in ("-s", "--services"):
+                kwargs['services'] = [x.strip() for x in arg.split(",") if x.strip() != ""]
+            elif opt in ("-t", "--types"):
+                kwargs['types'] = parseTypes(arg)
+            elif opt in ("-d", "--dups"):
+                kwargs['dups'] = float(arg)
+            elif opt in ("-l", "--layout"):
+                kwargs['layout'] = [int(x) for x in arg.split(":")]
+            elif opt in ("-r", "--seed"):
+                kwargs['seed'] = int(arg)
+        # Check if all arguments are there
+        if (flOutput == '' or flGather == ''):
+            errHandle.DoError(sSyntax)
+            return False
+        errHandle.Status('Output is "' + flOutput + '"')
+        errHandle.Status('Gather is "' + flGather + '"')
+        if (generate(flOutput, flGather, **kwargs)) :
+            errHandle.Status("Ready")
+        else :
+            errHandle.DoError("Could not complete")
+        return  True
+    except:
+        # Show the error to the user
+        errHandle.DoError("main")
+        return False
+
+# ----------------------------------------------------------------------------------
+# Name :    parseTypes
+# Goal :    Turn "per:0.4,loc:0.3" into a list of (type, weight) tuples
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def parseTypes(sTypes):
+    lTypes = []
+    for sPart in sTypes.split(","):
+        (sType, sWeight) = sPart.split(":")
+        lTypes.append((sType.strip(), float(sWeight)))
+    return lTypes
+
+# ----------------------------------------------------------------------------------
+# Name :    generate
+# Goal :    Generate the corpus
+#           rows     - approximate total number of rows (10^4 .. 10^8)
+#           services - list of services: every entity gets rows for each service
+#           types    - list of (NE-type, weight) tuples
+#           dups     - share of rows that are repeated (ne-stat must skip these)
+#           layout   - [sets, gathers per set, documents per gather]
+#           seed     - random seed, so that a corpus can be made again
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def generate(flOutput, flGather, **kwargs):
+
+    try:
+        iRows = kwargs.get('rows', 10000)
+        lServices = kwargs.get('services', ['spotlight', 'lotus'])
+        lTypes = kwargs.get('types', [('per', 0.35), ('loc', 0.30), ('org', 0.15), ('misc', 0.15), ('pro', 0.05)])
+        fDups = kwargs.get('dups', 0.05)
+        (iSets, iGathers, iDocs) = kwargs.get('layout', [4, 10, 25])
+        oRandom = random.Random(kwargs.get('seed', 1))
+
+        # Hit rates per NE-type and service, so that the statistics are not flat
+        oHitRate = {}
+        for (sType, fWeight) in lTypes:
+            for sService in lServices:
+                oHitRate[(sType, sService)] = oRandom.uniform(0.2, 0.8)
+        lTypeNames = [x[0] for x in lTypes]
+        lTypeWeights = list(itertools.accumulate(x[1] for x in lTypes))
+        # A Zipf-like vocabulary of entity names
+        lNames = ["Naam{}".format(i) for i in range(5000)]
+        lNameWeights = list(itertools.accumulate(1.0 / (i+1) for i in range(len(lNames))))
+        lMethods = ['disambiguate', 'annotate']
+
+        iFiles = iSets * iGathers * iDocs
+        iRowsPerFile = max(1, iRows // iFiles)
+        iTotal = 0
+        fStart = time.time()
+        oCollect = {'date': time.strftime("%Y-%m-%d"), 'collection': []}
+        for iSet in range(iSets):
+            sSet = "set{}".format(iSet)
+            lGather = []
+            for iGat in range(iGathers):
+                iStart = 1800 + 10 * iGat
+                lGather.append({'genre': GENRES[iSet % len(GENRES)], 'start': iStart, 'end': iStart + 10,
+                                'number': iDocs, 'results': iDocs})
+                sDir = os.path.join(flOutput, sSet, str(iGat))
+                if not os.path.exists(sDir): os.makedirs(sDir)
+                for iDoc in range(iDocs):
+                    sFile = "{}.folia.xml".format(iDoc)
+                    lBuf = []
+                    iFileRows = 0
+                    iSent = 0
+                    while iFileRows < iRowsPerFile:
+                        iSent += 1
+                        sSentId = "{}.p.1.s.{}".format(iDoc, iSent)
+                        sType = oRandom.choices(lTypeNames, cum_weights=lTypeWeights)[0]
+                        sName = oRandom.choices(lNames, cum_weights=lNameWeights)[0]
+                        sOffset = str(oRandom.randint(0, 120))
+                        for sService in lServices:
+                            bHit = (oRandom.random() < oHitRate[(sType, sService)])
+                            sMethod = lMethods[0] if oRandom.random() < 0.7 else lMethods[1]
+                            # One to three candidate rows; the first one decides
+                            for iCand in range(oRandom.randint(1, 3)):
+                                if iCand == 0:
+                                    sHit = 'true' if bHit else 'false'
+                                else:
+                                    sHit = 'true' if oRandom.random() < 0.5 else 'false'
+                                sUri = "http://nl.dbpedia.org/resource/{}_{}".format(sName, iCand)
+                                sRow = "\t".join([sFile, sSentId, sType, sName, sHit, sService, sMethod, sUri, sName,
+                                                  'yes' if sHit == 'true' else 'no', str(oRandom.randint(0, 5000)),
+                                                  sOffset, "{:.4f}".format(oRandom.random()),
+                                                  "{:.4f}".format(oRandom.random())]) + "\n"
+                                lBuf.append(sRow)
+                                iFileRows += 1
+                                if oRandom.random() < fDups:
+                                    # A double row
+                                    lBuf.append(sRow)
+                                    iFileRows += 1
+                    with open(os.path.join(sDir, str(iDoc) + ".folia.log"), "w", encoding="utf-8") as fOut:
+                        fOut.writelines(lBuf)
+                    iTotal += iFileRows
+            oCollect['collection'].append({'title': sSet, 'dir': sSet, 'gather': lGather})
+            errHandle.Status("{}: {} rows so far ({:.0f} rows/s)".format(sSet, iTotal, iTotal / max(0.001, time.time() - fStart)))
+
+        # Save the gather file
+        with open(flGather, "w") as fOut:
+            json.dump(oCollect, fOut, indent=2)
+        errHandle.Status("Generated {} rows in {} files".format(iTotal, iFiles))
+        return True
+    except:
+        errHandle.DoError("generate")
+        return False
+
+
+# ----------------------------------------------------------------------------------
+# Goal :  If user calls this as main, then follow up on it
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+    # Call the main function with two arguments: program name + remainder
+    main(sys.argv[0], sys.argv[1:])
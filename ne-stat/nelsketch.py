@@ -0,0 +1,265 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+# ==========================================================================================================
+# Name :    nelsketch
+# Goal :    Approximate corpus statistics with a fixed memory size
+#           - hyperloglog:  number of distinct values
+#           - countmin:     frequencies of values, with the top-K most frequent ones
+#           - sketchset:    the sketches per service and NE-type, as used by nelstats
+#           All sketches can be merged (across files, directories and runs) and saved as JSON.
+#           Called as a program, it merges saved sketch states and prints the summary.
+# History:
+# 19/oct/2026    ERK Created
+# ==========================================================================================================
+import util
+import sys
+import math
+import json
+import base64
+import hashlib
+import array
+
+# ----------------------------------------------------------------------------------
+HLL_PRECISION = 12          # 2^12 registers: standard error 1.04/sqrt(4096) = 1.6%
+CMS_WIDTH = 2048            # Overestimate at most e/2048 = 0.13% of the total count...
+CMS_DEPTH = 4               # ...with probability 1 - e^-4 = 98.2%
+TOPK_SIZE = 50              # Number of heavy hitters that are kept
+
+# ----------------------------------------------------------------------------------
+# Name :    hash64
+# Goal :    64-bit hash of a string
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def hash64(sValue):
+    return int.from_bytes(hashlib.blake2b(sValue.encode('utf-8'), digest_size=8).digest(), 'big')
+
+# ----------------------------------------------------------------------------------
+# Name :    hyperloglog
+# Goal :    Estimate the number of distinct values
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class hyperloglog:
+    """HyperLogLog distinct counter"""
+
+    def __init__(self, iPrecision = HLL_PRECISION):
+        self.p = iPrecision
+        self.m = 1 << iPrecision
+        self.registers = bytearray(self.m)
+
+    def add(self, sValue):
+        h = hash64(sValue)
+        iIdx = h >> (64 - self.p)
+        w = h & ((1 << (64 - self.p)) - 1)
+        iRank = (64 - self.p) - w.bit_length() + 1
+        if iRank > self.registers[iIdx]:
+            self.registers[iIdx] = iRank
+
+    def merge(self, oOther):
+        if oOther.p != self.p: raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(max(a, b) for (a, b) in zip(self.registers, oOther.registers))
+
+    def estimate(self):
+        fAlpha = 0.7213 / (1 + 1.079 / self.m)
+        fSum = sum(2.0 ** -r for r in self.registers)
+        fEst = fAlpha * self.m * self.m / fSum
+        iZeros = self.registers.count(0)
+        if fEst <= 2.5 * self.m and iZeros > 0:
+            # Small range correction: linear counting
+            fEst = self.m * math.log(self.m / iZeros)
+        return int(round(fEst))
+
+    def error(self):
+        # Relative standard error
+        return 1.04 / math.sqrt(self.m)
+
+    def save(self):
+        return {'p': self.p, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @staticmethod
+    def load(oData):
+        oHll = hyperloglog(oData['p'])
+        oHll.registers = bytearray(base64.b64decode(oData['registers']))
+        return oHll
+
+# ----------------------------------------------------------------------------------
+# Name :    countmin
+# Goal :    Estimate frequencies and keep the top-K most frequent values
+#           Estimates never undercount; they overcount by at most [epsilon * total]
+#           with probability [1 - delta]
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class countmin:
+    """Count-min sketch with top-K heavy hitters"""
+
+    def __init__(self, iWidth = CMS_WIDTH, iDepth = CMS_DEPTH, iTopK = TOPK_SIZE):
+        self.w = iWidth
+        self.d = iDepth
+        self.k = iTopK
+        self.rows = [array.array('q', [0]) * iWidth for i in range(iDepth)]
+        self.total = 0
+        self.top = {}           # Candidate heavy hitters with their estimates
+        self.topMin = 0         # Lowest estimate in [self.top] when it is full
+
+    def indexes(self, sValue):
+        h = hash64(sValue)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        return [(h1 + i * h2) % self.w for i in range(self.d)]
+
+    def add(self, sValue, iCount = 1):
+        self.total += iCount
+        iEst = None
+        for (oRow, iIdx) in zip(self.rows, self.indexes(sValue)):
+            oRow[iIdx] += iCount
+            if iEst == None or oRow[iIdx] < iEst: iEst = oRow[iIdx]
+        # Keep track of the heavy hitters
+        if sValue in self.top or len(self.top) < self.k:
+            self.top[sValue] = iEst
+            if len(self.top) == self.k: self.topMin = min(self.top.values())
+        elif iEst > self.topMin:
+            del self.top[min(self.top, key=self.top.get)]
+            self.top[sValue] = iEst
+            self.topMin = min(self.top.values())
+
+    def estimate(self, sValue):
+        return min(oRow[iIdx] for (oRow, iIdx) in zip(self.rows, self.indexes(sValue)))
+
+    def merge(self, oOther):
+        if oOther.w != self.w or oOther.d != self.d: raise ValueError("Cannot merge count-min sketches of different size")
+        for (oRow, oOtherRow) in zip(self.rows, oOther.rows):
+            for i in range(self.w):
+                oRow[i] += oOtherRow[i]
+        self.total += oOther.total
+        # The candidates of both sides are re-estimated with the merged counts
+        oTop = {sValue: self.estimate(sValue) for sValue in set(self.top) | set(oOther.top)}
+        self.top = dict(sorted(oTop.items(), key=lambda x: -x[1])[:self.k])
+        self.topMin = min(self.top.values()) if len(self.top) == self.k else 0
+
+    def topk(self):
+        return sorted(self.top.items(), key=lambda x: (-x[1], x[0]))
+
+    def epsilon(self):
+        return math.e / self.w
+
+    def delta(self):
+        return math.exp(-self.d)
+
+    def save(self):
+        return {'w': self.w, 'd': self.d, 'k': self.k, 'total': self.total, 'top': self.top,
+                'rows': [base64.b64encode(oRow.tobytes()).decode('ascii') for oRow in self.rows]}
+
+    @staticmethod
+    def load(oData):
+        oCms = countmin(oData['w'], oData['d'], oData['k'])
+        for (oRow, sRow) in zip(oCms.rows, oData['rows']):
+            oRow[:] = array.array('q', base64.b64decode(sRow))
+        oCms.total = oData['total']
+        oCms.top = oData['top']
+        oCms.topMin = min(oCms.top.values()) if len(oCms.top) == oCms.k else 0
+        return oCms
+
+# ----------------------------------------------------------------------------------
+# Name :    sketchset
+# Goal :    The sketches for one part of the corpus, per service and NE-type:
+#           'forms'  - distinct surface forms that were offered to the service
+#           'linked' - distinct URIs the service linked to (hits only)
+#           'failed' - frequencies and top-K of the surface forms that failed
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class sketchset:
+    """Sketches per service and NE-type"""
+
+    def __init__(self):
+        self.parts = {}
+
+    def get(self, sService, sNEtype):
+        sKey = sService + "\t" + sNEtype
+        if not sKey in self.parts:
+            self.parts[sKey] = {'forms': hyperloglog(), 'linked': hyperloglog(), 'failed': countmin()}
+        return self.parts[sKey]
+
+    # Add one (counted) row of a .folia.log file
+    def add(self, sService, sNEtype, sEntity, bHit, sUri):
+        oPart = self.get(sService, sNEtype)
+        oPart['forms'].add(sEntity)
+        if bHit:
+            oPart['linked'].add(sUri)
+        else:
+            oPart['failed'].add(sEntity)
+
+    def merge(self, oOther):
+        for (sKey, oOtherPart) in oOther.parts.items():
+            (sService, sNEtype) = sKey.split("\t")
+            oPart = self.get(sService, sNEtype)
+            for (sName, oSketch) in oOtherPart.items():
+                oPart[sName].merge(oSketch)
+        return self
+
+    # ----------------------------------------------------------------------------------
+    # Name :    summary
+    # Goal :    Estimates per service and NE-type, with their error bounds
+    #           NE-type "*" combines all NE-types of a service
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def summary(self):
+        # Combine the NE-types per service
+        oAll = sketchset()
+        for (sKey, oPart) in self.parts.items():
+            (sService, sNEtype) = sKey.split("\t")
+            oOne = sketchset()
+            oOne.parts[sService + "\t*"] = oPart
+            oAll.merge(oOne)
+        oSummary = {}
+        for oSet in (self, oAll):
+            for (sKey, oPart) in oSet.parts.items():
+                (sService, sNEtype) = sKey.split("\t")
+                if not sService in oSummary: oSummary[sService] = {}
+                oFailed = oPart['failed']
+                oSummary[sService][sNEtype] = {
+                    'distinct_forms': oPart['forms'].estimate(),
+                    'distinct_linked': oPart['linked'].estimate(),
+                    'failed_total': oFailed.total,
+                    'top_failed': oFailed.topk()}
+        oSummary['error_bounds'] = {
+            'distinct': "relative standard error {:.2%} (HyperLogLog, {} registers)".format(
+                hyperloglog().error(), 1 << HLL_PRECISION),
+            'top_failed': "counts overestimate by at most {:.3%} of failed_total with probability {:.1%} (count-min {}x{})".format(
+                countmin().epsilon(), 1 - countmin().delta(), CMS_WIDTH, CMS_DEPTH)}
+        return oSummary
+
+    def save(self):
+        return {sKey: {sName: oSketch.save() for (sName, oSketch) in oPart.items()}
+                for (sKey, oPart) in self.parts.items()}
+
+    @staticmethod
+    def load(oData):
+        oSet = sketchset()
+        for (sKey, oPart) in oData.items():
+            oSet.parts[sKey] = {'forms': hyperloglog.load(oPart['forms']),
+                                'linked': hyperloglog.load(oPart['linked']),
+                                'failed': countmin.load(oPart['failed'])}
+        return oSet
+
+
+# ----------------------------------------------------------------------------------
+# Goal :  Merge the sketch states given on the command line and print the summary
+#         Usage: nelsketch.py <state.json> [<state.json> ...]
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+    errHandle = util.ErrHandle()
+    if len(sys.argv) < 2:
+        print(sys.argv[0] + " <sketch-state.json> [<sketch-state.json> ...]")
+        sys.exit(2)
+    try:
+        oTotal = sketchset()
+        for flState in sys.argv[1:]:
+            with open(flState, "r") as fIn:
+                oTotal.merge(sketchset.load(json.load(fIn)))
+        json.dump(oTotal.summary(), sys.stdout, indent=2)
+    except:
+        errHandle.DoError("nelsketch")
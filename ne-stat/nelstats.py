@@ -5,6 +5,10 @@ import util
 import sys
 import os.path
 import csv
+import nelsketch
+
+# Number of bytes that tail reads at a time
+TAIL_CHUNK = 1 << 20
 
 # ----------------------------------------------------------------------------------
 # Name :    stats
@@ -17,9 +21,14 @@ class nelstats:
 
 
     # ======================= CLASS INITIALIZER ========================================
-    def __init__(self, oErr):
+    def __init__(self, oErr, bSketch = False):
         # Set the error handler
         self.errHandle = oErr
+        # Optional sketches (approximate statistics): one set for all files, so that
+        # the memory does not grow with the number of directories
+        self.oSketch = nelsketch.sketchset() if bSketch else None
+        # Goes up when the sketches start again (see tail)
+        self.iGeneration = 0
 
     # ----------------------------------------------------------------------------------
     # Name :    treat
@@ -31,10 +40,7 @@ class nelstats:
         """Get statistics from this file"""
 
         # Initialise the statistics with the number of named entities set to 0
-        oStats = {'ne': 0}  
-        bMakeLst = False
-
-        if bMakeLst: oStats['lst'] = []
+        oStats = self.newStats()
 
         try:
             # CHeck existence
@@ -42,75 +48,7 @@ class nelstats:
             # Open and start reading the input
             with open(fInput, "r",  encoding='utf-8') as fIn:
                 rdCsv = csv.reader(fIn, delimiter="\t")
-                # Row division:
-                # 0  File
-                # 1  sentId
-                # 2  type of named-entity: 'per', 'loc', 'misc', 'org', 'pro' and so forth
-                # 3  Named-Entity
-                # 4  hit
-                # 5  Service
-                # 6  Method
-                # 7  Result URI
-                # 8  NER-form
-                # 9  ClassMatch
-                # 10 Support
-                # 11 Offset
-                # 12 Similarity
-                # 13 2ndOfRank
-
-                sFileId = ""
-                sSentId = ""
-                sEntity = ""
-                sService = ""
-                sMethod = ""
-                sFirstService = ""
-
-                for row in rdCsv:
-                    # Sanity check: number of columns
-                    if len(row) == 14:
-                        # Make sure we do not count doubles
-                        if not(sSentId == row[1] and sFileId == row[0] and sEntity == row[3] and sService == row[5] and sMethod == row[6]):
-                            # Check for changes in the entity
-                            if sSentId != row[1] or sFileId != row[0] or sEntity != row[3] or row[5] == sFirstService:
-                                # New entity
-                                oStats['ne'] += 1
-                                try:
-                                    sFirstService = row[5]
-                                except:
-                                    iStop = 1
-                                if bMakeLst:
-                                    oStats['lst'].append({'sent': row[1], 'entity': row[3]})
-
-                            # Make sure this service is in the 'oHits'
-                            sThisService = row[5]
-                            if sThisService == "":
-                                # Do not account for 'empty' services
-                                iStop = 1
-                            else:
-                                # Make sure the 'overall' counting elements are there
-                                if not sThisService in oStats: oStats[sThisService] = {'hit': 0, 'fail': 0}
-                                # Make sure the 'NE-type-specific' counting elements are there
-                                sNEtype = row[2]
-                                if not sNEtype in oStats[sThisService]: oStats[sThisService][sNEtype] =  {'hit': 0, 'fail': 0}
-                                # Keep track of the frequencies for this service
-                                bHit = (row[4] == 'true')
-                                if bHit:
-                                    # Add to the 'overall' count of hits for this service
-                                    oStats[sThisService]['hit'] += 1
-                                    # Add to the NE-type-specific count of hits for this service
-                                    oStats[sThisService][sNEtype]['hit'] += 1
-                                else:
-                                    # Add to the 'overall' count of fails for this service
-                                    oStats[sThisService]['fail'] += 1
-                                    # Add to the NE-type-specific count of fails for this service
-                                    oStats[sThisService][sNEtype]['fail'] += 1
-
-                        # Bookkeeping
-                        sFileId = row[0]
-                        sSentId = row[1]
-                        sEntity = row[3]
-                        sService = row[5]
-                        sMethod = row[6]
+                self.treatRows(rdCsv, oStats, self.newState(), self.oSketch)
 
             # Return the results
             return oStats
@@ -121,3 +59,161 @@ class nelstats:
             # Return failure
             return None
 
+    # ----------------------------------------------------------------------------------
+    # Name :    tail
+    # Goal :    Treat the rows that have been added to a growing file since the last call
+    #           [oTail] keeps the byte offset, the statistics and the duplicate-detection
+    #           state of the file between calls. Pass None the first time.
+    #           The file is read in chunks of TAIL_CHUNK bytes and split on "\n" only;
+    #           a partial last line waits for the next call.
+    #           A file that has become shorter is read again from the start. Its rows
+    #           cannot be taken out of the sketches, so then the sketches start again
+    #           as well and every file is read again on its next call (see iGeneration)
+    # Return:   The updated [oTail] object, with 'new' set to the number of new rows,
+    #           or None upon failure
+    # History:
+    # 19/oct/2026    ERK Created
+    # 19/oct/2026    ERK Bounded reads, split on newlines only, reset the sketches
+    # ----------------------------------------------------------------------------------
+    def tail(self, fInput, oTail = None):
+        """Get statistics from the new part of this file"""
+
+        try:
+            iSize = os.path.getsize(fInput)
+            if oTail != None and iSize < oTail['offset'] and self.oSketch != None:
+                self.oSketch = nelsketch.sketchset()
+                self.iGeneration += 1
+            if oTail == None or iSize < oTail['offset'] or oTail['generation'] != self.iGeneration:
+                # First time, or the file has been truncated/rewritten: start again
+                oTail = {'offset': 0, 'stats': self.newStats(), 'state': self.newState(), 'new': 0,
+                         'generation': self.iGeneration}
+            oTail['new'] = 0
+            with open(fInput, "rb") as fIn:
+                fIn.seek(oTail['offset'])
+                bRest = b""
+                while True:
+                    bChunk = fIn.read(TAIL_CHUNK)
+                    if not bChunk: break
+                    bData = bRest + bChunk
+                    # Only take complete lines
+                    iEnd = bData.rfind(b"\n")
+                    if iEnd < 0:
+                        bRest = bData
+                        continue
+                    bRest = bData[iEnd+1:]
+                    oTail['offset'] += iEnd + 1
+                    # Split on "\n" only: csv.reader reads characters like \x85 as text
+                    lLines = bData[:iEnd].decode('utf-8').split("\n")
+                    oTail['new'] += len(lLines)
+                    rdCsv = csv.reader(lLines, delimiter="\t")
+                    self.treatRows(rdCsv, oTail['stats'], oTail['state'], self.oSketch)
+            return oTail
+        except:
+            # Show the user what is wrong
+            self.errHandle.DoError('Could not get statistics: {}\n'.format(
+                fInput))
+            # Return failure
+            return None
+
+    # ----------------------------------------------------------------------------------
+    # Name :    newStats, newState
+    # Goal :    Initial statistics object and initial duplicate-detection state
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def newStats(self):
+        # Initialise the statistics with the number of named entities set to 0
+        return {'ne': 0}
+
+    def newState(self):
+        return {'file': "", 'sent': "", 'entity': "", 'service': "", 'method': "", 'first': ""}
+
+    # ----------------------------------------------------------------------------------
+    # Name :    treatRows
+    # Goal :    Add the counts of the rows in [rdCsv] to [oStats]
+    #           [oState] holds the previous row, which is needed to skip doubles; 
+    #           it is updated, so that a next call can continue where this one stopped
+    #           Counted rows are also added to [oSketch], if there is one
+    # History:
+    # 22/dec/2016    ERK Created (as part of treat)
+    # 19/oct/2026    ERK Separate function with an explicit state
+    # ----------------------------------------------------------------------------------
+    def treatRows(self, rdCsv, oStats, oState, oSketch = None):
+        # Row division:
+        # 0  File
+        # 1  sentId
+        # 2  type of named-entity: 'per', 'loc', 'misc', 'org', 'pro' and so forth
+        # 3  Named-Entity
+        # 4  hit
+        # 5  Service
+        # 6  Method
+        # 7  Result URI
+        # 8  NER-form
+        # 9  ClassMatch
+        # 10 Support
+        # 11 Offset
+        # 12 Similarity
+        # 13 2ndOfRank
+        bMakeLst = ('lst' in oStats)
+
+        sFileId = oState['file']
+        sSentId = oState['sent']
+        sEntity = oState['entity']
+        sService = oState['service']
+        sMethod = oState['method']
+        sFirstService = oState['first']
+
+        for row in rdCsv:
+            # Sanity check: number of columns
+            if len(row) == 14:
+                # Make sure we do not count doubles
+                if not(sSentId == row[1] and sFileId == row[0] and sEntity == row[3] and sService == row[5] and sMethod == row[6]):
+                    # Check for changes in the entity
+                    if sSentId != row[1] or sFileId != row[0] or sEntity != row[3] or row[5] == sFirstService:
+                        # New entity
+                        oStats['ne'] += 1
+                        sFirstService = row[5]
+                        if bMakeLst:
+                            oStats['lst'].append({'sent': row[1], 'entity': row[3]})
+
+                    # Make sure this service is in the 'oHits'
+                    sThisService = row[5]
+                    if sThisService == "":
+                        # Do not account for 'empty' services
+                        iStop = 1
+                    else:
+                        # Make sure the 'overall' counting elements are there
+                        if not sThisService in oStats: oStats[sThisService] = {'hit': 0, 'fail': 0}
+                        # Make sure the 'NE-type-specific' counting elements are there
+                        sNEtype = row[2]
+                        if not sNEtype in oStats[sThisService]: oStats[sThisService][sNEtype] =  {'hit': 0, 'fail': 0}
+                        # Keep track of the frequencies for this service
+                        bHit = (row[4] == 'true')
+                        if bHit:
+                            # Add to the 'overall' count of hits for this service
+                            oStats[sThisService]['hit'] += 1
+                            # Add to the NE-type-specific count of hits for this service
+                            oStats[sThisService][sNEtype]['hit'] += 1
+                        else:
+                            # Add to the 'overall' count of fails for this service
+                            oStats[sThisService]['fail'] += 1
+                            # Add to the NE-type-specific count of fails for this service
+                            oStats[sThisService][sNEtype]['fail'] += 1
+                        if oSketch != None:
+                            oSketch.add(sThisService, sNEtype, row[3], bHit, row[7])
+
+                # Bookkeeping
+                sFileId = row[0]
+                sSentId = row[1]
+                sEntity = row[3]
+                sService = row[5]
+                sMethod = row[6]
+
+        # Keep the state for a next call
+        oState['file'] = sFileId
+        oState['sent'] = sSentId
+        oState['entity'] = sEntity
+        oState['service'] = sService
+        oState['method'] = sMethod
+        oState['first'] = sFirstService
+        return oStats
@@ -0,0 +1,185 @@
+#! /usr/bin/env python3
+# -*- coding: utf8 -*-
+
+import util
+import sys
+import os.path
+import sqlite3
+
+# ----------------------------------------------------------------------------------
+# Filter keys that may be used in a query, and the column they refer to
+QUERY_FILTERS = {"set": "setname", "gather": "gather", "genre": "genre", "start": "start",
+                 "service": "service", "ne": "netype"}
+
+# ----------------------------------------------------------------------------------
+# Name :    nelstore
+# Goal :    Indexed SQLite store of the aggregated counts made by ne-stat
+#           Table [gathers]: one row per set/gather with the genre, years, docs and ne
+#           Table [counts]:  one row per set/gather/service/NE-type with hit and fail
+#                            (NE-type "" holds the overall counts of the service)
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class nelstore:
+    """Indexed store of named-entity linking statistics"""
+
+    # ======================= CLASS INITIALIZER ========================================
+    def __init__(self, oErr, flDbase):
+        # Set the error handler
+        self.errHandle = oErr
+        self.flDbase = flDbase
+        self.conn = sqlite3.connect(flDbase)
+        self.create()
+
+    # ----------------------------------------------------------------------------------
+    # Name :    create
+    # Goal :    Make sure the tables and indexes exist
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def create(self):
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS gathers (
+                    setname TEXT, gather INTEGER, genre TEXT, start INTEGER, end INTEGER,
+                    docs INTEGER, ne INTEGER,
+                    PRIMARY KEY (setname, gather));
+                CREATE TABLE IF NOT EXISTS counts (
+                    setname TEXT, gather INTEGER, genre TEXT, start INTEGER,
+                    service TEXT, netype TEXT, hit INTEGER, fail INTEGER,
+                    PRIMARY KEY (setname, gather, service, netype));
+                CREATE INDEX IF NOT EXISTS idx_gathers_genre ON gathers (genre, start);
+                CREATE INDEX IF NOT EXISTS idx_gathers_start ON gathers (start);
+                CREATE INDEX IF NOT EXISTS idx_counts_set ON counts (setname);
+                CREATE INDEX IF NOT EXISTS idx_counts_genre ON counts (genre, start);
+                CREATE INDEX IF NOT EXISTS idx_counts_start ON counts (start);
+                CREATE INDEX IF NOT EXISTS idx_counts_service ON counts (service, netype);
+                CREATE INDEX IF NOT EXISTS idx_counts_netype ON counts (netype, service);
+                """)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    store
+    # Goal :    Persist the [oLogTotal] object made by ne-stat
+    #           Existing rows for the same set/gather are replaced
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def store(self, oLogTotal):
+        try:
+            iRows = 0
+            with self.conn:
+                for (sSet, oSet) in oLogTotal.items():
+                    for (sKey, oItem) in oSet.items():
+                        if str(sKey) == 'services' or str(sKey) == 'ptc': continue
+                        iGat = int(sKey)
+                        sGenre = oItem.get('genre', '')
+                        iStart = oItem.get('start', None)
+                        iEnd = oItem.get('end', None)
+                        if iEnd == None and iStart != None: iEnd = iStart + 1
+                        self.conn.execute("DELETE FROM counts WHERE setname=? AND gather=?", (sSet, iGat))
+                        self.conn.execute("INSERT OR REPLACE INTO gathers VALUES (?,?,?,?,?,?,?)",
+                                          (sSet, iGat, sGenre, iStart, iEnd, oItem.get('docs', 0), oItem.get('ne', 0)))
+                        lRows = []
+                        for (sService, oService) in oItem.items():
+                            if not isinstance(oService, dict) or not 'hit' in oService: continue
+                            # The overall count for this service
+                            lRows.append((sSet, iGat, sGenre, iStart, sService, '', oService['hit'], oService['fail']))
+                            # The NE-type-specific counts
+                            for (sNEtype, oNE) in oService.items():
+                                if isinstance(oNE, dict):
+                                    lRows.append((sSet, iGat, sGenre, iStart, sService, sNEtype, oNE['hit'], oNE['fail']))
+                        self.conn.executemany("INSERT INTO counts VALUES (?,?,?,?,?,?,?,?)", lRows)
+                        iRows += len(lRows)
+            self.errHandle.Status("Stored {} count rows in {}".format(iRows, self.flDbase))
+            return True
+        except:
+            self.errHandle.DoError("nelstore/store")
+            return False
+
+    # ----------------------------------------------------------------------------------
+    # Name :    parse
+    # Goal :    Parse a query specification like:
+    #             "ne=org;genre=roman;start=1850-1900;service=spotlight;by=set,start"
+    #           Every filter may have several values separated by commas
+    #           Returns a tuple (oFilter, lBy) or None if the query is not valid
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def parse(self, sQuery):
+        oFilter = {}
+        lBy = []
+        for sPart in sQuery.split(";"):
+            sPart = sPart.strip()
+            if sPart == "": continue
+            if not "=" in sPart:
+                self.errHandle.DoError("Query part without '=': {}".format(sPart))
+                return None
+            (sKey, sValue) = [x.strip() for x in sPart.split("=", 1)]
+            if sKey == "by":
+                lBy = [x.strip() for x in sValue.split(",") if x.strip() != ""]
+                for sBy in lBy:
+                    if not sBy in QUERY_FILTERS:
+                        self.errHandle.DoError("Cannot group by: {}".format(sBy))
+                        return None
+            elif sKey in QUERY_FILTERS:
+                oFilter[sKey] = sValue
+            else:
+                self.errHandle.DoError("Unknown query key: {}".format(sKey))
+                return None
+        return (oFilter, lBy)
+
+    # ----------------------------------------------------------------------------------
+    # Name :    query
+    # Goal :    Slice and aggregate the stored counts
+    #           Without an 'ne' filter or grouping, only the overall service counts are
+    #           used; grouped by 'ne', only the NE-type-specific ones
+    #           The column 'hitrate' is hit / (hit + fail) of the result items; this is
+    #           not the _ptc of ne-stat, which divides the hits by the number of entities
+    #           Returns a list of rows; the first row contains the column names
+    # History:
+    # 19/oct/2026    ERK Created
+    # 19/oct/2026    ERK Grouping by 'ne', column 'hitrate'
+    # ----------------------------------------------------------------------------------
+    def query(self, sQuery):
+        try:
+            oParsed = self.parse(sQuery)
+            if oParsed == None: return None
+            (oFilter, lBy) = oParsed
+            lWhere = []
+            lArgs = []
+            for (sKey, sValue) in oFilter.items():
+                sCol = QUERY_FILTERS[sKey]
+                if sKey == "start" and "-" in sValue:
+                    # A range of years: start <= year < end
+                    (sFrom, sUntil) = sValue.split("-", 1)
+                    lWhere.append("start >= ? AND start < ?")
+                    lArgs.extend([int(sFrom), int(sUntil)])
+                else:
+                    lValues = [x.strip() for x in sValue.split(",")]
+                    if sKey in ("start", "gather"): lValues = [int(x) for x in lValues]
+                    lWhere.append("{} IN ({})".format(sCol, ",".join("?" * len(lValues))))
+                    lArgs.extend(lValues)
+            if not "ne" in oFilter:
+                # The overall count of a service is stored with NE-type ""
+                lWhere.append("netype != ''" if "ne" in lBy else "netype = ''")
+            lCols = [QUERY_FILTERS[x] for x in lBy]
+            sSql = "SELECT {} SUM(hit), SUM(fail) FROM counts".format(
+                "".join(x + ", " for x in lCols))
+            if len(lWhere) > 0:
+                sSql += " WHERE " + " AND ".join(lWhere)
+            if len(lCols) > 0:
+                sSql += " GROUP BY {0} ORDER BY {0}".format(", ".join(lCols))
+            lRows = [lBy + ['hit', 'fail', 'hitrate']]
+            for oRow in self.conn.execute(sSql, lArgs):
+                iHit = oRow[-2] or 0
+                iFail = oRow[-1] or 0
+                fRate = 0.0
+                if iHit + iFail > 0: fRate = iHit / (iHit + iFail)
+                lRows.append(list(oRow[:-2]) + [iHit, iFail, round(fRate, 4)])
+            return lRows
+        except:
+            self.errHandle.DoError("nelstore/query")
+            return None
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,383 @@
+# ==========================================================================================================
+# Name :    pipeline
+# Goal :    Select, download, link and count FoLiA documents in one streaming run
+#           The stages are connected by bounded queues, so that a document goes on to the next
+#           stage as soon as it is ready, and a fast stage waits when a slow one lags behind:
+#             select   - broker queries, page by page          (foliaselect/broker.py)
+#             download - FoLiA documents from the archive      (foliaselect/download.py)
+#             link     - named-entity linking, with the log rows and their counts
+#                                                              (ne-link/convert.py, nellog.py)
+#             stats    - collecting the counts per document    (ne-stat/ne-stat.py)
+#           The results are the same as those of foliaselect + ne-link + ne-stat
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK Log rows and counts come straight from ne-link
+# ==========================================================================================================
+import sys, getopt, os.path, importlib
+import util
+import json
+import gzip
+import shutil
+import queue
+import threading
+import time
+
+# The stages are in the sibling directories
+sBase = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for sSub in ("foliaselect", "ne-link", "ne-stat"):
+    if not os.path.join(sBase, sSub) in sys.path: sys.path.append(os.path.join(sBase, sSub))
+import broker
+import download
+import convert
+import nellog
+import nelstrategy
+import endpoints
+import nelarchive
+import negcache
+import nelbudget
+nestat = importlib.import_module("ne-stat")
+
+# ============================= LOCAL VARIABLES ====================================
+errHandle = util.ErrHandle()
+
+# ----------------------------------------------------------------------------------
+# Name :    main
+# Goal :    Main body of the function
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+def main(prgName, argv) :
+    flInput = ''        # input file name: the selection specification (as for foliaselect)
+    sDirOut = ''        # output directory
+    kwargs = {}
+
+    try:
+        # Adapt the program name to exclude the directory (for windows)
+        index = prgName.rfind("\\")
+        if (index > 0) :
+            prgName = prgName[index+1:]
+        sSyntax = prgName + ' [-q <queries>] [-n <downloads>] [-l <linkers>] [-b <queue size>] [-p <page size>] ' + \
+                  '[-r <retries>] [-a <annotator>] [-t <rates.json>] [-e <spotlight urls>] [-c <archive.db> [-m <archive mode>]] [-g <negcache.db>] [-k <budgets> [-d <retry.jsonl>]] [-w <parts per document>] [-u <broker url>] [-f <folia url>] -i <inputfile> -o <outputdir>'
+        # get all the arguments
+        try:
+            # Get arguments and options
+            opts, args = getopt.getopt(argv, "hi:o:q:n:l:b:p:r:a:t:e:c:m:g:k:d:w:u:f:",
+                ["-inputfile=", "-outputdir=", "-queries=", "-downloads=", "-linkers=", "-queue=", "-page=",
+                 "-retries=", "-annotator=", "-rates=", "-endpoints=", "-archive=", "-mode=", "-negcache=", "-budget=", "-retry=", "-parts=", "-broker=", "-folia="])
+        except getopt.GetoptError:
+              print(sSyntax)
+              sys.exit(2)
+        # Walk all the arguments
+        for opt, arg in opts:
+            if opt == '-h':
+                print(sSyntax)
+                sys.exit(0)
+            elif opt in ("-i", "--inputfile"):
+                flInput = arg
+            elif opt in ("-o", "--outputdir"):
+                sDirOut = arg
+            elif opt in ("-q", "--queries"):
+                kwargs['queries'] = int(arg)
+            elif opt in ("-n", "--downloads"):
+                kwargs['downloads'] = int(arg)
+            elif opt in ("-l", "--linkers"):
+                kwargs['linkers'] = int(arg)
+            elif opt in ("-b", "--queue"):
+                kwargs['queue'] = int(arg)
+            elif opt in ("-p", "--page"):
+                kwargs['page'] = int(arg)
+            elif opt in ("-r", "--retries"):
+                kwargs['retries'] = int(arg)
+            elif opt in ("-a", "--annotator"):
+                kwargs['annotator'] = arg
+            elif opt in ("-t", "--rates"):
+                kwargs['rates'] = arg
+            elif opt in ("-e", "--endpoints"):
+                kwargs['endpoints'] = arg
+            elif opt in ("-c", "--archive"):
+                kwargs['archive'] = arg
+            elif opt in ("-m", "--mode"):
+                kwargs['mode'] = arg
+            elif opt in ("-g", "--negcache"):
+                kwargs['negcache'] = arg
+            elif opt in ("-k", "--budget"):
+                kwargs['budget'] = arg
+            elif opt in ("-d", "--retry"):
+                kwargs['retry'] = arg
+            elif opt in ("-w", "--parts"):
+                kwargs['parts'] = int(arg)
+            elif opt in ("-u", "--broker"):
+                kwargs['broker'] = arg
+            elif opt in ("-f", "--folia"):
+                kwargs['openskos'] = arg
+        # Check if all arguments are there
+        if (flInput == '' or sDirOut == ''):
+            errHandle.DoError(sSyntax)
+            return False
+        # Continue with the program
+        errHandle.Status('Input is "' + flInput + '"')
+        errHandle.Status('Output is "' + sDirOut + '"')
+        if (pipeline(flInput, sDirOut, **kwargs)) :
+            errHandle.Status("Ready")
+        else :
+            errHandle.DoError("Could not complete")
+    except SystemExit:
+        raise
+    except:
+        # act
+        errHandle.DoError("main")
+        return False
+
+# ----------------------------------------------------------------------------------
+# Name :    stage
+# Goal :    One stage of the pipeline: [iWorkers] threads that take items from a bounded
+#           queue, and pass what [fnWork] makes of them on to the next stage
+#           [fnWork] returns (or yields) zero or more items for the next stage
+#           A failing item is counted and reported; it does not stop the stage
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class stage:
+    """One stage of the pipeline"""
+
+    def __init__(self, sName, fnWork, iWorkers = 1, iQueue = 100, oNext = None):
+        self.sName = sName
+        self.fnWork = fnWork
+        self.iWorkers = max(1, iWorkers)
+        self.oNext = oNext
+        self.oQueue = queue.Queue(maxsize=max(1, iQueue))
+        self.lThreads = []
+        self.oLock = threading.Lock()
+        # Statistics
+        self.iItems = 0
+        self.iFailed = 0
+        self.fBusy = 0.0
+
+    def start(self):
+        for i in range(self.iWorkers):
+            oThread = threading.Thread(target=self.work, name="{}-{}".format(self.sName, i), daemon=True)
+            oThread.start()
+            self.lThreads.append(oThread)
+        if self.oNext != None: self.oNext.start()
+        return self
+
+    # Hand over one item; waits while the queue is full
+    def put(self, oItem):
+        self.oQueue.put(oItem)
+
+    def work(self):
+        while True:
+            oItem = self.oQueue.get()
+            if oItem == None: break
+            fStart = time.perf_counter()
+            bOkay = True
+            try:
+                for oOut in self.fnWork(oItem) or []:
+                    if self.oNext != None:
+                        # Do not count the time spent waiting for the next stage
+                        fPut = time.perf_counter()
+                        self.oNext.put(oOut)
+                        fStart += time.perf_counter() - fPut
+            except:
+                errHandle.DoError("pipeline/" + self.sName)
+                bOkay = False
+            with self.oLock:
+                self.iItems += 1
+                if not bOkay: self.iFailed += 1
+                self.fBusy += time.perf_counter() - fStart
+
+    # ----------------------------------------------------------------------------------
+    # Name :    finish
+    # Goal :    No more items will come: let the workers finish, then finish the next stage
+    # History:
+    # 19/oct/2026    ERK Created
+    # ----------------------------------------------------------------------------------
+    def finish(self):
+        for oThread in self.lThreads:
+            self.oQueue.put(None)
+        for oThread in self.lThreads:
+            oThread.join()
+        if self.oNext != None: self.oNext.finish()
+
+    def report(self):
+        return "{}: workers={} items={} failed={} busy={:.1f}s".format(
+            self.sName, self.iWorkers, self.iItems, self.iFailed, self.fBusy)
+
+# ----------------------------------------------------------------------------------
+# Name :    pipeline
+# Goal :    Run the whole pipeline for the selection in [flInput]
+#           The output directory gets:
+#             folia/<dir>/<gather>/<num>.folia.xml.gz   - the downloaded documents
+#             linked/<dir>/<gather>/<num>.folia.xml     - the documents with the links
+#             linked/<dir>/<gather>/<num>.folia.log     - the rows that ne-stat reads
+#             selected.json                             - the selection with its numbers
+#             ne-stat.json (and the other ne-stat output files)
+# History:
+# 19/oct/2026    ERK Created
+# 19/oct/2026    ERK The linkers share one request strategy (ne-link/nelstrategy.py)
+# 19/oct/2026    ERK The linkers share one pool of Spotlight replicas (ne-link/endpoints.py)
+# 19/oct/2026    ERK The linkers share one archive of remote requests (ne-link/nelarchive.py)
+# 19/oct/2026    ERK The linkers share one negative cache (ne-link/negcache.py)
+# 19/oct/2026    ERK Time and request budgets (ne-link/nelbudget.py)
+# 19/oct/2026    ERK Parts of large documents at the same time (ne-link/sentindex.py)
+# 19/oct/2026    ERK Close and save the shared objects also after an error
+# ----------------------------------------------------------------------------------
+def pipeline(flInput, sDirOut, **kwargs):
+    lstLogStat = []         # (logfile, statistics) of every document, as for ne-stat
+    oThread = threading.local()
+    info = {}               # What every linker gets
+    oEndpoints = None       # Shared by the linkers: the pool of Spotlight replicas,
+    oArchive = None         #   the archive of remote requests
+    oNegative = None        #   and the negative cache
+
+    try:
+        if not os.path.isfile(flInput):
+            errHandle.DoError("Could not find input [{}]".format(flInput))
+            return False
+        with open(flInput, "r") as fIn:
+            oInput = json.load(fIn)
+        sDirOut = os.path.abspath(sDirOut)
+        os.makedirs(sDirOut, exist_ok=True)
+        iPage = kwargs.get('page', 100)
+        if 'annotator' in kwargs: info['annotator'] = kwargs['annotator']
+        # Each linker may divide a large document into parts of whole sentences
+        info['parts'] = kwargs.get('parts', 1)
+        # The linkers share the success rates of the request types
+        info['strategy'] = nelstrategy.nelstrategy(errHandle, kwargs.get('rates'))
+        # ... and the pool of Spotlight replicas
+        if kwargs.get('endpoints', '') != '':
+            oEndpoints = endpoints.endpoints.fromSpec(errHandle, kwargs['endpoints'])
+        # ... and the archive of remote requests
+        if kwargs.get('archive', '') != '':
+            oArchive = nelarchive.nelarchive(errHandle, kwargs['archive'], kwargs.get('mode', 'record'))
+        # ... and the negative cache
+        if kwargs.get('negcache', '') != '':
+            oNegative = negcache.negcache(errHandle, kwargs['negcache'])
+        # ... and the time and request budgets
+        if kwargs.get('budget', '') != '':
+            info['budget'] = nelbudget.nelbudget.fromSpec(errHandle, kwargs['budget'], kwargs.get('retry'))
+
+        oBroker = broker.broker(errHandle, kwargs.get('broker'), kwargs.get('openskos'))
+        # The downloader is only used for its retries; the download stage has its own threads
+        oDown = download.downloader(errHandle, oBroker, 1, kwargs.get('retries', 3))
+
+        # ============ The work of each stage ============
+        def doSelect(oTask):
+            (oCol, iGather, oGather) = oTask
+            iWanted = oGather['number']
+            iStart = 0
+            iResults = 0
+            while iStart < iWanted:
+                oResponse = oBroker.request(oBroker.task2request(oGather, iStart, min(iPage, iWanted - iStart)))
+                if oResponse == None or oResponse.get('status') != 'ok':
+                    errHandle.DoError("No valid broker response for {}/{}".format(oCol['dir'], iGather))
+                    break
+                iResults = oResponse['stats']['total']
+                lDocuments = oResponse['documents']
+                for iNum, oRes in enumerate(lDocuments, iStart):
+                    yield {'dir': oCol['dir'], 'gather': iGather, 'num': iNum,
+                           'id': oRes['NLCore_NLIdentification_nederlabID']}
+                iStart += len(lDocuments)
+                if len(lDocuments) == 0 or iStart >= iResults: break
+            oGather['results'] = iResults
+            oGather['documents'] = iStart
+
+        def doDownload(oItem):
+            sPart = os.path.join(oItem['dir'], str(oItem['gather']), str(oItem['num']))
+            flFolia = os.path.join(sDirOut, "folia", sPart + ".folia.xml")
+            os.makedirs(os.path.dirname(flFolia), exist_ok=True)
+            oResult = oDown.fetch(oItem['id'], flFolia)
+            if oResult['status'] != 'ok':
+                errHandle.Status("Download failed: {} ({})".format(flFolia, oResult['error']))
+                return []
+            # ne-link reads plain .folia.xml
+            flWork = os.path.join(sDirOut, "work", sPart + ".folia.xml")
+            os.makedirs(os.path.dirname(flWork), exist_ok=True)
+            with gzip.open(flFolia + ".gz", "rb") as fIn, open(flWork, "wb") as fOut:
+                shutil.copyfileobj(fIn, fOut)
+            oItem['input'] = flWork
+            oItem['output'] = os.path.join(sDirOut, "linked", sPart + ".folia.xml")
+            return [oItem]
+
+        def doLink(oItem):
+            # Every thread has its own converter (with its own schema)
+            if not hasattr(oThread, 'conv'):
+                oThread.conv = convert.broker(errHandle)
+                if oEndpoints != None: oThread.conv.endpoints = oEndpoints
+                oThread.conv.archive = oArchive
+                oThread.conv.negcache = oNegative
+            os.makedirs(os.path.dirname(oItem['output']), exist_ok=True)
+            # The log rows are written and counted while the entities are being resolved;
+            #   the log is kept, so that ne-stat can be run on the output later on
+            oItem['log'] = os.path.splitext(oItem['output'])[0] + ".log"
+            with open(oItem['log'], "w", encoding="utf-8") as fLog:
+                oBack = oThread.conv.addOneNelToFolia(oItem['input'], oItem['output'], False,
+                                                      log=nellog.nellog(errHandle, fLog), **info)
+            if oBack == None:
+                errHandle.DoError("Linking failed: " + oItem['input'])
+                return []
+            if not oThread.conv.doValidate(oItem['output']):
+                errHandle.DoError("Validation failed: " + oItem['output'])
+                return []
+            os.remove(oItem['input'])
+            oItem['stats'] = oBack['stats']
+            return [oItem]
+
+        def doStats(oItem):
+            lstLogStat.append((oItem['log'], oItem['stats']))
+            return []
+
+        # ============ Connect the stages ============
+        iQueue = kwargs.get('queue', 100)
+        oStats = stage("stats", doStats, 1, iQueue)
+        oLink = stage("link", doLink, kwargs.get('linkers', 4), iQueue, oStats)
+        oDownload = stage("download", doDownload, kwargs.get('downloads', 8), iQueue, oLink)
+        oSelect = stage("select", doSelect, kwargs.get('queries', 4), iQueue, oDownload)
+
+        fStart = time.perf_counter()
+        oSelect.start()
+        for oCol in oInput['collection']:
+            for iGather, oGather in enumerate(oCol['gather']):
+                oSelect.put((oCol, iGather, oGather))
+        # Wait until everything has gone through all the stages
+        oSelect.finish()
+        fTotal = time.perf_counter() - fStart
+
+        for oStage in (oSelect, oDownload, oLink, oStats):
+            errHandle.Status(oStage.report())
+        errHandle.Status("pipeline: {:.1f}s".format(fTotal))
+        shutil.rmtree(os.path.join(sDirOut, "work"), ignore_errors=True)
+
+        # Save the selection with the numbers that were found
+        with open(os.path.join(sDirOut, "selected.json"), "w") as fOut:
+            json.dump(oInput, fOut, indent=2)
+        # The statistics, as ne-stat makes them (the selection is the 'gather' file)
+        lstLogStat.sort(key=lambda x: x[0])
+        return nestat.summarize(lstLogStat, output=os.path.join(sDirOut, "ne-stat.json"), gather=flInput)
+    except:
+        errHandle.DoError("pipeline")
+        return False
+    finally:
+        # Also after an error: what was recorded and learned so far is kept
+        try:
+            if 'strategy' in info:
+                errHandle.Status(info['strategy'].report())
+                info['strategy'].save()
+            if oEndpoints != None: errHandle.Status(oEndpoints.report())
+            if oArchive != None:
+                oArchive.close()
+                errHandle.Status(oArchive.report())
+            if oNegative != None:
+                oNegative.close()
+                errHandle.Status(oNegative.report())
+            if 'budget' in info: errHandle.Status(info['budget'].report())
+        except:
+            errHandle.DoError("pipeline: closing")
+
+
+# ----------------------------------------------------------------------------------
+# Goal :  If user calls this as main, then follow up on it
+# ----------------------------------------------------------------------------------
+if __name__ == "__main__":
+    # Call the main function with two arguments: program name + remainder
+    main(sys.argv[0], sys.argv[1:])
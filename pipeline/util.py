@@ -0,0 +1,252 @@
+import sys, traceback
+import os
+import time
+import json
+import queue
+import threading
+import atexit
+import collections
+
+# Message levels
+LEVEL_DEBUG = 10
+LEVEL_INFO = 20
+LEVEL_WARNING = 30
+LEVEL_ERROR = 40
+LEVEL_NAMES = {LEVEL_DEBUG: "debug", LEVEL_INFO: "info", LEVEL_WARNING: "warning", LEVEL_ERROR: "error"}
+
+# ----------------------------------------------------------------------------------
+# Name :    logsink
+# Goal :    Write messages from a background thread, so that the callers do not wait
+#           for stderr or the disk. Messages go to stderr as text, and optionally to a
+#           file as JSON lines. There is one sink per process, shared by all ErrHandles,
+#           so that the order of the messages is kept.
+# History:
+# 19/oct/2026    ERK Created
+# ----------------------------------------------------------------------------------
+class logsink:
+  """Background writer of messages"""
+
+  def __init__(self):
+    self.oQueue = queue.Queue(maxsize=10000)
+    self.oLock = threading.Lock()
+    self.oThread = None
+    self.oFiles = {}
+
+  def put(self, sText, oRecord = None, flLog = None):
+    with self.oLock:
+      if self.oThread == None:
+        self.oThread = threading.Thread(target=self.run, name="logsink", daemon=True)
+        self.oThread.start()
+    # When the queue is full, the caller waits: messages are not lost
+    self.oQueue.put((sText, oRecord, flLog))
+
+  def run(self):
+    while True:
+      lBatch = [self.oQueue.get()]
+      # Take whatever else is waiting, and write it in one go
+      try:
+        while len(lBatch) < 1000:
+          lBatch.append(self.oQueue.get_nowait())
+      except queue.Empty:
+        pass
+      try:
+        lText = [x[0] for x in lBatch if x[0] != None]
+        if len(lText) > 0:
+          sys.stderr.write("\n".join(lText) + "\n")
+          sys.stderr.flush()
+        for (sText, oRecord, flLog) in lBatch:
+          if oRecord != None and flLog != None:
+            if not flLog in self.oFiles:
+              self.oFiles[flLog] = open(flLog, "a", encoding="utf-8")
+            self.oFiles[flLog].write(json.dumps(oRecord, ensure_ascii=False) + "\n")
+        for fLog in self.oFiles.values():
+          fLog.flush()
+      except:
+        # Logging must never stop the program
+        pass
+      for x in lBatch:
+        self.oQueue.task_done()
+
+  # Wait until everything that has been put has been written
+  def flush(self):
+    if self.oThread != None and self.oThread.is_alive():
+      self.oQueue.join()
+
+oSink = logsink()
+lHandles = []
+
+# At the end of the program: say what has been suppressed, and write everything
+def finish():
+  for oErr in lHandles:
+    oErr.Suppressed()
+  oSink.flush()
+
+atexit.register(finish)
+
+def levelOf(sLevel):
+  for (iLevel, sName) in LEVEL_NAMES.items():
+    if sName == str(sLevel).lower(): return iLevel
+  return LEVEL_INFO
+
+class ErrHandle:
+  """Error handling"""
+
+  # ======================= CLASS INITIALIZER ========================================
+  # iLevel     - lowest level that is shown (default: environment NEL_LOG_LEVEL, or info)
+  # flLog      - file that gets every message as a JSON line (default: NEL_LOG_FILE)
+  # iRate      - maximum number of messages of one type per [iWindow] seconds (default: NEL_LOG_RATE, or 20)
+  # iMaxErrors - number of recent errors that are kept in [loc_errStack]
+  def __init__(self, iLevel = None, flLog = None, iRate = None, iWindow = 60, iMaxErrors = 1000):
+    # Keep the most recent errors only, so that a long run does not keep growing
+    self.loc_errStack = collections.deque(maxlen=iMaxErrors)
+    self.iLevel = iLevel if iLevel != None else levelOf(os.environ.get("NEL_LOG_LEVEL", "info"))
+    self.flLog = flLog if flLog != None else os.environ.get("NEL_LOG_FILE", None)
+    self.iRate = iRate if iRate != None else int(os.environ.get("NEL_LOG_RATE", "20"))
+    self.iWindow = iWindow
+    self.oLock = threading.Lock()
+    # Per message type: [start of the window, messages in the window, messages suppressed]
+    self.oTypes = {}
+    lHandles.append(self)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    Log
+  # Goal :    Pass on one message of level [iLevel]
+  #           Messages with a type [sType] are rate-limited per type: after [iRate]
+  #           messages in a window, the rest of the window is only counted, and the
+  #           next message of that type says how many were suppressed
+  # Return:   True if the message was passed on
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def Log(self, iLevel, msg, sType = "", sDetail = ""):
+    if iLevel < self.iLevel: return False
+    msg = str(msg)
+    if sType != "" and self.iRate > 0:
+      fNow = time.time()
+      with self.oLock:
+        oType = self.oTypes.get(sType)
+        if oType == None or fNow - oType[0] >= self.iWindow:
+          iSuppressed = 0 if oType == None else oType[2]
+          oType = [fNow, 0, 0]
+          self.oTypes[sType] = oType
+          if iSuppressed > 0:
+            msg += " [{} more '{}' messages suppressed]".format(iSuppressed, sType)
+        oType[1] += 1
+        if oType[1] > self.iRate:
+          oType[2] += 1
+          return False
+    sText = msg if sDetail == "" else msg + "\n" + sDetail
+    oRecord = None
+    if self.flLog != None:
+      oRecord = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "level": LEVEL_NAMES.get(iLevel, str(iLevel)),
+                 "type": sType, "msg": msg, "pid": os.getpid(), "thread": threading.current_thread().name}
+      if sDetail != "": oRecord["detail"] = sDetail
+    oSink.put(sText, oRecord, self.flLog)
+    return True
+
+  # Report the messages that have been suppressed in the current windows
+  def Suppressed(self):
+    with self.oLock:
+      lTypes = [(k, v[2]) for (k, v) in self.oTypes.items() if v[2] > 0]
+      for (sType, iCount) in lTypes:
+        self.oTypes[sType][2] = 0
+    for (sType, iCount) in lTypes:
+      self.Log(LEVEL_WARNING, "[{} more '{}' messages suppressed]".format(iCount, sType))
+
+  def Debug(self, msg, sType = ""):
+    return self.Log(LEVEL_DEBUG, msg, sType)
+
+  def Warning(self, msg, sType = ""):
+    return self.Log(LEVEL_WARNING, msg, sType)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    Flush
+  # Goal :    Wait until all messages have been written
+  # History:
+  # 19/oct/2026    ERK Created
+  # ----------------------------------------------------------------------------------
+  def Flush(self):
+    oSink.flush()
+
+  # ----------------------------------------------------------------------------------
+  # Name :    Status
+  # Goal :    Just give a status message
+  # History:
+  # 6/apr/2016    ERK Created
+  # 19/oct/2026    ERK Levels, types and the background sink
+  # ----------------------------------------------------------------------------------
+  def Status(self, msg, sType = "", iLevel = LEVEL_INFO):
+    # Pass the message on
+    self.Log(iLevel, msg, sType)
+
+  # ----------------------------------------------------------------------------------
+  # Name :    DoError
+  # Goal :    Process an error
+  # History:
+  # 6/apr/2016    ERK Created
+  # 19/oct/2026    ERK Bounded error stack, types and the background sink
+  # ----------------------------------------------------------------------------------
+  def DoError(self, msg, bExit = False, sType = ""):
+    # Append the error message to the stack we have
+    self.loc_errStack.append(str(msg))
+    # The exception (if any) must be taken now, in the thread of the caller
+    lDetail = []
+    try:
+        # Do we actually have a real error?
+        if sys.exc_info() != None and traceback != None:
+            for nErr in sys.exc_info():
+              if (nErr != None):
+                lDetail.append(str(nErr))
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            lDetail.append("".join(traceback.format_exception(exc_type, exc_value, exc_traceback,
+                                                              limit=2)).rstrip("\n"))
+    except:
+        lDetail.append("  (no traceback)")
+    # Show the error message to the user
+    self.Log(LEVEL_ERROR, "Error: " + str(msg) + "\nSystem:", sType, "\n".join(lDetail))
+    # Is this a fatal error that requires exiting?
+    if (bExit):
+      sys.exit(2)
+
+class interaction:
+  """User-interation"""
+
+  # ----------------------------------------------------------------------------------
+  # Name :    query_yes_no
+  # Goal :    Elicit confirmation from user
+  # Source:   http://stackoverflow.com/questions/3041986/python-command-line-yes-no-input
+  # History:
+  # 6/apr/2016    ERK Created
+  # ----------------------------------------------------------------------------------
+  def query_yes_no(question, default="yes"):
+    """Ask a yes/no question via raw_input() and return their answer.
+
+    "question" is a string that is presented to the user.
+    "default" is the presumed answer if the user just hits <Enter>.
+        It must be "yes" (the default), "no" or None (meaning
+        an answer is required of the user).
+
+    The "answer" return value is True for "yes" or False for "no".
+    """
+    valid = {"yes": True, "y": True, "ye": True, "true": True, "t": True, "1": True,
+             "no": False, "n": False, "false": False, "f": False, "0": False}
+    if default is None:
+      prompt = " [y/n] "
+    elif default == "yes":
+      prompt = " [Y/n] "
+    elif default == "no":
+      prompt = " [y/N] "
+    else:
+      raise ValueError("invalid default answer: '%s'" % default)
+
+    while True:
+      sys.stdout.write(question + prompt)
+      choice = raw_input().lower()
+      if default is not None and choice == '':
+        return valid[default]
+      elif choice in valid:
+        return valid[choice]
+      else:
+        sys.stdout.write("Please respond with 'yes' or 'no' "
+                            "(or 'y' or 'n').\n")
+